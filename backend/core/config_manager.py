@@ -19,6 +19,22 @@ CONFIGURACOES_PADRAO = {
         "valor": "false",
         "descricao": "Adicionar extensão .fv ao buscar arquivos no vault"
     },
+    "restauracao_workers": {
+        "valor": "16",
+        "descricao": "Cópias simultâneas na restauração de arquivos do vault"
+    },
+    "restauracao_limite_por_dispositivo": {
+        "valor": "4",
+        "descricao": "Cópias simultâneas por disco ou compartilhamento de rede de origem na restauração"
+    },
+    "restauracao_modo": {
+        "valor": "auto",
+        "descricao": "Modo de cópia na restauração: auto, copia, kernel, reflink, hardlink ou symlink (links só no mesmo volume do vault)"
+    },
+    "raizes_importacao": {
+        "valor": "",
+        "descricao": "Pastas do servidor permitidas em POST /import/caminho, separadas por ';' (vazio: desabilitado)"
+    },
 }
 
 
@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker, declarative_base
 import os
 from dotenv import load_dotenv
@@ -20,6 +20,33 @@ engine = create_engine(
     connect_args=connect_args
 )
 
+# Perfil de desempenho do SQLite (SQLITE_ALTO_DESEMPENHO=0 volta ao padrão do SQLite)
+SQLITE_ALTO_DESEMPENHO = os.getenv("SQLITE_ALTO_DESEMPENHO", "1") != "0"
+SQLITE_CACHE_MB = int(os.getenv("SQLITE_CACHE_MB", "64"))
+SQLITE_MMAP_MB = int(os.getenv("SQLITE_MMAP_MB", "256"))
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+
+
+if engine.dialect.name == "sqlite" and SQLITE_ALTO_DESEMPENHO:
+    @event.listens_for(engine, "connect")
+    def _configurar_sqlite(dbapi_connection, connection_record):
+        """
+        Pragmas aplicados a cada conexão nova.
+
+        WAL deixa as leituras da API rodando durante uma importação (só
+        escritores se bloqueiam) e, com synchronous=NORMAL, o commit não
+        espera o fsync (o banco continua íntegro numa queda de energia;
+        só os últimos commits podem se perder).
+        """
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_MB * 1024}")
+        cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_MB * 1024 * 1024}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.close()
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
@@ -0,0 +1,195 @@
+import pandas as pd
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Iterator
+
+from pyarrow.lib import ArrowException
+
+from .transformer import VERSAO_TRANSFORMER
+
+# Pasta do cache de uploads já transformados (Parquet, um arquivo por lote)
+CACHE_DIR = Path(os.getenv("ETL_CACHE_DIR", os.path.join(tempfile.gettempdir(), "etl_manager_cache")))
+
+# Tamanho máximo do cache; as entradas menos usadas são removidas primeiro
+CACHE_MAX_BYTES = int(os.getenv("ETL_CACHE_MAX_MB", "2048")) * 1024 * 1024
+
+_ARQUIVO_META = "meta.json"
+
+# Formato das chaves (ver `chave_cache`): também impede caminhos fora de CACHE_DIR
+_PADRAO_CHAVE = re.compile(r"[0-9a-f]{64}-v\d+")
+
+
+def calcular_sha256(file_path: str, tamanho_bloco: int = 1 << 20) -> str:
+    """Calcula o SHA-256 de um arquivo lendo em blocos."""
+    h = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for bloco in iter(lambda: f.read(tamanho_bloco), b""):
+            h.update(bloco)
+    return h.hexdigest()
+
+
+def chave_cache(sha256: str) -> str:
+    """Chave da entrada: hash do conteúdo enviado + versão do transformer."""
+    return f"{sha256}-v{VERSAO_TRANSFORMER}"
+
+
+def obter_entrada(chave: str) -> Optional[Dict[str, Any]]:
+    """
+    Retorna os metadados de uma entrada do cache, ou None se não existir.
+
+    Marca a entrada como usada agora (ordem do LRU).
+    """
+    meta_path = CACHE_DIR / chave / _ARQUIVO_META
+    try:
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+    os.utime(meta_path)
+    return meta
+
+
+def ler_lotes(chave: str) -> Iterator[pd.DataFrame]:
+    """Lê os lotes transformados de uma entrada, na ordem em que foram gravados."""
+    entrada = CACHE_DIR / chave
+    meta = obter_entrada(chave)
+    if meta is None:
+        raise KeyError(f"Entrada não encontrada no cache: {chave}")
+
+    for i, bytes_lidos in enumerate(meta["partes"]):
+        df = pd.read_parquet(entrada / f"parte_{i:05d}.parquet")
+        df.attrs["bytes_lidos"] = bytes_lidos
+        yield df
+
+
+def gravar_lotes(chave: str, lotes: Iterator[pd.DataFrame], meta: Dict[str, Any]) -> Iterator[pd.DataFrame]:
+    """
+    Repassa os lotes transformados, gravando cada um no cache.
+
+    A entrada só é publicada quando todos os lotes forem consumidos; se a
+    importação falhar no meio, a gravação parcial é descartada.
+
+    Args:
+        chave: Chave da entrada (ver `chave_cache`)
+        lotes: Lotes já transformados
+        meta: Metadados da importação (tipo, formato, filename...)
+    """
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    pasta_tmp = CACHE_DIR / f".tmp-{uuid.uuid4().hex}"
+    pasta_tmp.mkdir()
+
+    partes: List[int] = []
+    linhas = 0
+    concluido = False
+
+    try:
+        for df in lotes:
+            gravar_parquet(df, pasta_tmp / f"parte_{len(partes):05d}.parquet")
+            partes.append(df.attrs.get("bytes_lidos", 0))
+            linhas += len(df)
+            yield df
+
+        meta = {
+            **meta,
+            "chave": chave,
+            "versao_transformer": VERSAO_TRANSFORMER,
+            "linhas": linhas,
+            "partes": partes,
+            "bytes": _tamanho_pasta(pasta_tmp),
+            "criado_em": datetime.now().isoformat(),
+        }
+        with open(pasta_tmp / _ARQUIVO_META, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+
+        try:
+            os.rename(pasta_tmp, CACHE_DIR / chave)
+        except OSError:
+            # Outra importação do mesmo conteúdo publicou a entrada antes
+            pass
+        concluido = True
+
+    finally:
+        if pasta_tmp.exists():
+            shutil.rmtree(pasta_tmp, ignore_errors=True)
+
+    if concluido:
+        _aplicar_limite()
+
+
+def gravar_parquet(df: pd.DataFrame, caminho: Path):
+    """Grava o lote em Parquet, convertendo para texto colunas com tipos mistos."""
+    try:
+        df.to_parquet(caminho, index=False)
+    except (ArrowException, TypeError, ValueError):
+        df = df.copy()
+        for col in df.columns:
+            if df[col].dtype == object and pd.api.types.infer_dtype(df[col], skipna=True).startswith("mixed"):
+                df[col] = df[col].map(lambda x: None if x is None or x is pd.NA else str(x))
+        df.to_parquet(caminho, index=False)
+
+
+def _tamanho_pasta(pasta: Path) -> int:
+    return sum(p.stat().st_size for p in pasta.iterdir() if p.is_file())
+
+
+def listar_entradas() -> List[Dict[str, Any]]:
+    """Lista as entradas do cache, da mais para a menos recentemente usada."""
+    if not CACHE_DIR.exists():
+        return []
+
+    entradas = []
+    for pasta in CACHE_DIR.iterdir():
+        meta_path = pasta / _ARQUIVO_META
+        if pasta.name.startswith(".") or not meta_path.exists():
+            continue
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        meta.pop("partes", None)
+        meta["ultimo_acesso"] = datetime.fromtimestamp(meta_path.stat().st_mtime).isoformat()
+        entradas.append(meta)
+
+    return sorted(entradas, key=lambda e: e["ultimo_acesso"], reverse=True)
+
+
+def remover_entrada(chave: str) -> bool:
+    """
+    Remove uma entrada do cache. Retorna False se ela não existir.
+
+    Raises:
+        ValueError: Se a chave não tiver o formato `<sha256>-v<versão>`
+    """
+    if not _PADRAO_CHAVE.fullmatch(chave):
+        raise ValueError(f"Chave de cache inválida: {chave}")
+
+    pasta = CACHE_DIR / chave
+    if not (pasta / _ARQUIVO_META).exists():
+        return False
+    shutil.rmtree(pasta, ignore_errors=True)
+    return True
+
+
+def limpar_cache() -> int:
+    """Remove todas as entradas do cache e retorna quantas foram removidas."""
+    entradas = listar_entradas()
+    for entrada in entradas:
+        remover_entrada(entrada["chave"])
+    return len(entradas)
+
+
+def _aplicar_limite():
+    """Remove as entradas menos usadas até o cache caber em CACHE_MAX_BYTES."""
+    entradas = listar_entradas()
+    total = sum(e["bytes"] for e in entradas)
+
+    while entradas and total > CACHE_MAX_BYTES:
+        entrada = entradas.pop()
+        remover_entrada(entrada["chave"])
+        total -= entrada["bytes"]
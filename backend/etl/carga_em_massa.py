@@ -0,0 +1,119 @@
+"""
+Modo de carga em massa: índices secundários suspensos durante a importação.
+
+Manter cada índice a cada INSERT custa mais do que recriá-lo de uma vez
+ao fim de uma carga grande. Os índices únicos (chave natural) continuam:
+são eles que deduplicam a importação. Se o processo cair no meio da
+carga, os índices ficam removidos até o próximo início da aplicação,
+que os recria (`recriar_indices_ausentes`).
+"""
+import os
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterable, List
+
+from sqlalchemy import Index, inspect
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from sqlalchemy.schema import CreateIndex, DropIndex
+
+from database import Base
+
+# Importações a partir deste tamanho usam a carga em massa no SQLite (0 desliga)
+CARGA_EM_MASSA_MIN_MB = int(os.getenv("ETL_CARGA_EM_MASSA_MB", "100"))
+
+# Tabelas gravadas por tipo de dados
+TABELAS_POR_TIPO = {
+    "documentos": ("documentos", "arquivos"),
+    "arquivos": ("arquivos",),
+}
+
+# Importações em carga em massa em andamento por tabela: os índices só
+# voltam quando a última termina
+_trava = threading.Lock()
+_em_andamento: Dict[str, int] = {}
+
+
+def usar_carga_em_massa(db: Session, tamanho_bytes: int) -> bool:
+    """
+    Indica se a importação deve suspender os índices secundários.
+
+    Só no SQLite, onde a API continua lendo pelo índice único da chave.
+    Um job prioritário (ou ETL_MAX_IMPORTACOES > 1) pode gravar junto com
+    outra importação: importações paralelas nas mesmas tabelas compartilham
+    a suspensão (ver `indices_suspensos`).
+    """
+    return (
+        CARGA_EM_MASSA_MIN_MB > 0
+        and db.get_bind().dialect.name == "sqlite"
+        and tamanho_bytes >= CARGA_EM_MASSA_MIN_MB * 1024 * 1024
+    )
+
+
+def indices_secundarios(tabela: str) -> List[Index]:
+    """Índices não únicos da tabela, conforme os modelos."""
+    return [indice for indice in Base.metadata.tables[tabela].indexes if not indice.unique]
+
+
+@contextmanager
+def indices_suspensos(db: Session, tabelas: Iterable[str]):
+    """
+    Remove os índices secundários das tabelas e os recria ao sair, mesmo em caso de erro.
+
+    Args:
+        db: Sessão da importação (o DDL roda nela, sem disputar o lock de
+            escrita do SQLite com outra conexão)
+        tabelas: Tabelas que a importação vai gravar
+    """
+    tabelas = list(tabelas)
+
+    with _trava:
+        for tabela in tabelas:
+            _em_andamento[tabela] = _em_andamento.get(tabela, 0) + 1
+            if _em_andamento[tabela] == 1:
+                for indice in indices_secundarios(tabela):
+                    db.execute(DropIndex(indice, if_exists=True))
+        db.commit()
+
+    try:
+        yield
+    finally:
+        # Descarta o que a importação deixou pendente (em caso de erro) antes do DDL
+        db.rollback()
+        with _trava:
+            for tabela in tabelas:
+                _em_andamento[tabela] -= 1
+                if _em_andamento[tabela] == 0:
+                    for indice in indices_secundarios(tabela):
+                        db.execute(CreateIndex(indice, if_not_exists=True))
+            db.commit()
+
+
+def recriar_indices_ausentes(engine: Engine) -> List[str]:
+    """
+    Cria os índices secundários dos modelos que não existem no banco.
+
+    Chamada no início da aplicação, antes dos workers: recupera os índices
+    que `indices_suspensos` removeu numa importação interrompida por queda
+    do processo (o `finally` não chegou a rodar). Os índices únicos ficam
+    com scripts/create_unique_indexes.py, que remove as duplicatas antes:
+    num banco antigo com chaves repetidas, criá-los aqui impediria o início.
+
+    Returns:
+        Nomes dos índices recriados
+    """
+    inspetor = inspect(engine)
+    tabelas_existentes = set(inspetor.get_table_names())
+    recriados = []
+
+    with engine.begin() as conn:
+        for tabela in Base.metadata.sorted_tables:
+            if tabela.name not in tabelas_existentes:
+                continue
+            existentes = {indice["name"] for indice in inspetor.get_indexes(tabela.name)}
+            for indice in indices_secundarios(tabela.name):
+                if indice.name not in existentes:
+                    conn.execute(CreateIndex(indice, if_not_exists=True))
+                    recriados.append(indice.name)
+
+    return recriados
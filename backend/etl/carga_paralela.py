@@ -0,0 +1,213 @@
+"""
+Carga paralela particionada pela chave natural (PostgreSQL).
+
+Os lotes transformados são divididos pelo hash da chave natural entre N
+processos de carga, cada um com a própria conexão e o próprio carregador
+(`criar_carregador`: COPY + merge no PostgreSQL). Como uma chave sempre
+cai no mesmo processo, a deduplicação de cada partição é independente e
+os processos nunca disputam a mesma linha.
+"""
+import multiprocessing
+import os
+import queue
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from sqlalchemy.orm import Session
+
+from .incremental import hash_chave
+
+# Processos de carga por importação (0 ou 1 desliga a carga paralela)
+PROCESSOS_CARGA = int(os.getenv("ETL_PROCESSOS_CARGA", str(min(4, os.cpu_count() or 1))))
+
+# Arquivos a partir deste tamanho usam a carga paralela
+CARGA_PARALELA_MIN_MB = int(os.getenv("ETL_CARGA_PARALELA_MIN_MB", "200"))
+
+# Partições em espera por processo (cada uma é um pedaço de um lote)
+TAMANHO_FILA = 4
+
+# Intervalo para conferir se os processos continuam vivos enquanto espera
+_INTERVALO_ESPERA = 0.5
+
+
+def processos_carga_paralela(db: Session, tamanho_bytes: int) -> int:
+    """
+    Quantidade de processos de carga para a importação (0 = carga em um único escritor).
+
+    Só no PostgreSQL: o SQLite aceita um único escritor por vez.
+    """
+    if (
+        PROCESSOS_CARGA > 1
+        and db.get_bind().dialect.name == "postgresql"
+        and tamanho_bytes >= CARGA_PARALELA_MIN_MB * 1024 * 1024
+    ):
+        return PROCESSOS_CARGA
+    return 0
+
+
+def _executar_processo(indice: int, tipo: str, fila, resultados):
+    """
+    Processo de carga: grava as partições recebidas até o sentinela (None).
+
+    Envia {"processo", "registros", "inseridos", "segundos", "erro"} em
+    `resultados` ao terminar; `segundos` é o tempo gasto gravando (sem a
+    espera por partições).
+    """
+    from database import SessionLocal
+    from .loader import criar_carregador
+
+    db = SessionLocal()
+    resultado = {"processo": indice, "registros": 0, "inseridos": 0, "segundos": 0.0, "erro": None}
+
+    try:
+        carregador = criar_carregador(db, tipo)
+        while (df := fila.get()) is not None:
+            inicio = time.perf_counter()
+            resultado["inseridos"] += carregador.carregar(df)
+            resultado["registros"] += len(df)
+            resultado["segundos"] += time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        resultado["inseridos"] += carregador.finalizar()
+        resultado["segundos"] += time.perf_counter() - inicio
+    except BaseException as e:
+        db.rollback()
+        resultado["erro"] = f"{type(e).__name__}: {e}"
+    finally:
+        db.close()
+        resultados.put(resultado)
+
+
+class CarregadorParalelo:
+    """
+    Carregador que distribui cada lote entre processos de carga.
+
+    `carregar` só particiona e envia (retorna 0); cada processo grava a
+    sua partição com o carregador do banco, e `finalizar` espera todos e
+    retorna o total inserido.
+    """
+
+    # Cada processo confirma a sua partição no seu ritmo: não há um lote
+    # gravado por todos que sirva de checkpoint, a importação só pode ser
+    # retomada do início
+    confirma_por_lote = False
+
+    def __init__(self, tipo: str, num_processos: int):
+        self.tipo = tipo
+        self.num_processos = num_processos
+        self.inicio: Optional[float] = None
+        self.segundos_total: Optional[float] = None
+        self.resultados_processos: List[Dict[str, Any]] = []
+
+        # spawn: o processo da API tem threads (workers, pipeline) e conexões abertas
+        contexto = multiprocessing.get_context("spawn")
+        self.resultados = contexto.Queue()
+        self.filas = [contexto.Queue(TAMANHO_FILA) for _ in range(num_processos)]
+        self.processos = [
+            contexto.Process(
+                target=_executar_processo,
+                args=(i, tipo, self.filas[i], self.resultados),
+                name=f"importacao-carga-{i}",
+                daemon=True,
+            )
+            for i in range(num_processos)
+        ]
+        for processo in self.processos:
+            processo.start()
+
+    def _verificar_processos(self):
+        mortos = [i for i, processo in enumerate(self.processos) if not processo.is_alive()]
+        if not mortos:
+            return
+
+        erros = []
+        while True:
+            try:
+                resultado = self.resultados.get_nowait()
+            except queue.Empty:
+                break
+            if resultado["erro"]:
+                erros.append(f"processo {resultado['processo']}: {resultado['erro']}")
+        raise RuntimeError(
+            "Carga paralela interrompida: " + ("; ".join(erros) or f"processos {mortos} terminaram sem resultado")
+        )
+
+    def _enviar(self, indice: int, item):
+        while True:
+            try:
+                self.filas[indice].put(item, timeout=_INTERVALO_ESPERA)
+                return
+            except queue.Full:
+                self._verificar_processos()
+
+    def carregar(self, df_transformado: pd.DataFrame) -> int:
+        """Particiona o lote pela chave natural e envia cada parte ao seu processo."""
+        if df_transformado.empty:
+            return 0
+        if self.inicio is None:
+            self.inicio = time.perf_counter()
+
+        particoes = hash_chave(df_transformado, self.tipo).view(np.uint64) % np.uint64(self.num_processos)
+        for indice in range(self.num_processos):
+            parte = df_transformado[particoes == indice]
+            if not parte.empty:
+                self._enviar(indice, parte)
+        return 0
+
+    def finalizar(self) -> int:
+        """Espera cada processo gravar a sua partição e retorna o total inserido."""
+        for indice in range(self.num_processos):
+            self._enviar(indice, None)
+
+        while len(self.resultados_processos) < self.num_processos:
+            try:
+                self.resultados_processos.append(self.resultados.get(timeout=_INTERVALO_ESPERA))
+            except queue.Empty:
+                if not any(processo.is_alive() for processo in self.processos):
+                    break
+        for processo in self.processos:
+            processo.join()
+
+        self.segundos_total = time.perf_counter() - (self.inicio or time.perf_counter())
+        self.resultados_processos.sort(key=lambda r: r["processo"])
+
+        erros = [f"processo {r['processo']}: {r['erro']}" for r in self.resultados_processos if r["erro"]]
+        if len(self.resultados_processos) < self.num_processos:
+            erros.append("processo de carga terminou sem resultado")
+        if erros:
+            raise RuntimeError("Carga paralela com erro (partições dos demais processos já gravadas): " + "; ".join(erros))
+
+        return sum(r["inseridos"] for r in self.resultados_processos)
+
+    def fechar(self):
+        """Encerra os processos que ainda estiverem rodando (erro ou cancelamento)."""
+        for processo in self.processos:
+            if processo.is_alive():
+                processo.terminate()
+            processo.join()
+        for fila in self.filas:
+            fila.cancel_join_thread()
+            fila.close()
+
+    def metricas(self) -> Dict[str, Any]:
+        """Vazão de cada processo e total (registros/s pelo tempo de parede)."""
+        if self.segundos_total is None:
+            return {"processos_carga": self.num_processos}
+
+        registros = sum(r["registros"] for r in self.resultados_processos)
+        return {
+            "processos_carga": self.num_processos,
+            "registros_por_s": round(registros / self.segundos_total, 1) if self.segundos_total else None,
+            "processos": [
+                {
+                    "processo": r["processo"],
+                    "registros": r["registros"],
+                    "inseridos": r["inseridos"],
+                    "segundos": round(r["segundos"], 2),
+                    "registros_por_s": round(r["registros"] / r["segundos"], 1) if r["segundos"] else None,
+                }
+                for r in self.resultados_processos
+            ],
+        }
@@ -0,0 +1,188 @@
+"""
+Modos de cópia usados na restauração de arquivos do vault.
+
+- copia: cópia comum (`shutil.copyfile`, que já usa sendfile no Linux)
+- kernel: cópia dentro do kernel, sem passar os dados pelo processo
+  (`os.copy_file_range`, com `os.sendfile` como alternativa)
+- reflink: clone copy-on-write (Btrfs, XFS, ...): instantâneo e sem
+  duplicar dados, mas um arquivo independente
+- hardlink / symlink: "restauração virtual", só com destino no mesmo
+  volume do vault. Nada é copiado; com hardlink, alterar o arquivo
+  restaurado altera o arquivo do vault.
+- auto: reflink, depois kernel, depois cópia comum
+
+Cada modo, quando não é suportado (sistema operacional, sistema de
+arquivos ou volumes diferentes), cai para o seguinte até a cópia comum.
+"""
+import errno
+import os
+import shutil
+from typing import Callable, Dict
+
+MODOS_COPIA = ("auto", "copia", "kernel", "reflink", "hardlink", "symlink")
+
+# ioctl FICLONE do Linux (_IOW(0x94, 9, int))
+_FICLONE = 0x40049409
+
+# Bytes por chamada de copy_file_range/sendfile
+_TAMANHO_BLOCO_KERNEL = 64 << 20
+
+# Erros que indicam "não suportado aqui", e não uma falha da cópia
+_ERROS_NAO_SUPORTADO = {
+    errno.ENOSYS, errno.EXDEV, errno.EINVAL, errno.EOPNOTSUPP, errno.ENOTTY,
+    errno.EPERM, errno.EBADF, getattr(errno, "ENOTSUP", errno.EOPNOTSUPP),
+}
+
+
+class ModoNaoSuportado(Exception):
+    """O modo de cópia não funciona para este par origem/destino."""
+
+
+def _nao_suportado(erro: OSError) -> bool:
+    return erro.errno in _ERROS_NAO_SUPORTADO
+
+
+def mesmo_volume(origem: str, destino: str) -> bool:
+    """Indica se `destino` (arquivo a criar) fica no mesmo volume que `origem`."""
+    try:
+        pasta_destino = os.path.dirname(os.path.abspath(destino))
+        return os.stat(origem).st_dev == os.stat(pasta_destino).st_dev
+    except OSError:
+        return False
+
+
+def _copiar_comum(origem: str, destino: str):
+    shutil.copyfile(origem, destino)
+
+
+def _copiar_kernel(origem: str, destino: str):
+    """copy_file_range (ou sendfile) até o fim do arquivo."""
+    copiar_bloco = getattr(os, "copy_file_range", None)
+    if copiar_bloco is None and not hasattr(os, "sendfile"):
+        raise ModoNaoSuportado("cópia no kernel indisponível neste sistema")
+
+    with open(origem, "rb") as entrada, open(destino, "wb") as saida:
+        fd_entrada, fd_saida = entrada.fileno(), saida.fileno()
+        tamanho = os.fstat(fd_entrada).st_size
+        copiados = 0
+
+        while copiados < tamanho:
+            try:
+                if copiar_bloco is not None:
+                    n = copiar_bloco(fd_entrada, fd_saida, _TAMANHO_BLOCO_KERNEL)
+                else:
+                    n = os.sendfile(fd_saida, fd_entrada, copiados, _TAMANHO_BLOCO_KERNEL)
+            except OSError as e:
+                if not _nao_suportado(e):
+                    raise
+                if copiar_bloco is None or not hasattr(os, "sendfile"):
+                    raise ModoNaoSuportado(str(e)) from e
+                # copy_file_range recusado (ex: volumes diferentes em kernels antigos): recomeça com sendfile
+                copiar_bloco = None
+                entrada.seek(0)
+                saida.seek(0)
+                saida.truncate()
+                copiados = 0
+                continue
+            if n == 0:
+                break
+            copiados += n
+
+        if copiados != tamanho:
+            # Fim antecipado (arquivo truncado durante a cópia, ou sistema de
+            # arquivos que devolve 0 sem copiar): cai para a cópia comum
+            raise ModoNaoSuportado(f"cópia no kernel parou em {copiados} de {tamanho} bytes")
+
+
+def _copiar_reflink(origem: str, destino: str):
+    try:
+        import fcntl
+    except ImportError:
+        raise ModoNaoSuportado("reflink indisponível neste sistema")
+
+    with open(origem, "rb") as entrada, open(destino, "wb") as saida:
+        try:
+            fcntl.ioctl(saida.fileno(), _FICLONE, entrada.fileno())
+        except OSError as e:
+            if _nao_suportado(e):
+                raise ModoNaoSuportado(str(e)) from e
+            raise
+
+
+def _criar_hardlink(origem: str, destino: str):
+    if not mesmo_volume(origem, destino):
+        raise ModoNaoSuportado("destino fora do volume do vault")
+    try:
+        os.link(origem, destino)
+    except OSError as e:
+        if _nao_suportado(e):
+            raise ModoNaoSuportado(str(e)) from e
+        raise
+
+
+def _criar_symlink(origem: str, destino: str):
+    if not mesmo_volume(origem, destino):
+        raise ModoNaoSuportado("destino fora do volume do vault")
+    try:
+        os.symlink(os.path.abspath(origem), destino)
+    except (OSError, NotImplementedError) as e:
+        # No Windows, criar symlink exige privilégio
+        if isinstance(e, NotImplementedError) or _nao_suportado(e) or getattr(e, "winerror", None) == 1314:
+            raise ModoNaoSuportado(str(e)) from e
+        raise
+
+
+_EXECUTORES: Dict[str, Callable[[str, str], None]] = {
+    "copia": _copiar_comum,
+    "kernel": _copiar_kernel,
+    "reflink": _copiar_reflink,
+    "hardlink": _criar_hardlink,
+    "symlink": _criar_symlink,
+}
+
+# Ordem de tentativa de cada modo
+_SEQUENCIAS = {
+    "auto": ("reflink", "kernel", "copia"),
+    "copia": ("copia",),
+    "kernel": ("kernel", "copia"),
+    "reflink": ("reflink", "kernel", "copia"),
+    "hardlink": ("hardlink", "reflink", "kernel", "copia"),
+    "symlink": ("symlink", "reflink", "kernel", "copia"),
+}
+
+
+def copiar_arquivo(origem: str, destino: str, modo: str = "auto") -> str:
+    """
+    Copia (ou liga) `origem` em `destino` no modo pedido, com as alternativas do modo.
+
+    `destino` não pode existir. Cópias mantêm datas e permissões da origem
+    (`shutil.copystat`); links compartilham os metadados do vault.
+
+    Args:
+        origem: Arquivo no vault
+        destino: Arquivo a criar
+        modo: Um de MODOS_COPIA
+
+    Returns:
+        Modo efetivamente usado ('copia', 'kernel', 'reflink', 'hardlink' ou 'symlink')
+
+    Raises:
+        ValueError: Modo desconhecido
+        OSError: Falha na cópia (não relacionada a suporte do modo)
+    """
+    if modo not in _SEQUENCIAS:
+        raise ValueError(f"Modo de cópia inválido: {modo}. Use um de: {', '.join(MODOS_COPIA)}")
+
+    for tentativa in _SEQUENCIAS[modo]:
+        try:
+            _EXECUTORES[tentativa](origem, destino)
+        except ModoNaoSuportado:
+            if os.path.lexists(destino):
+                os.unlink(destino)
+            continue
+
+        if tentativa not in ("hardlink", "symlink"):
+            shutil.copystat(origem, destino)
+        return tentativa
+
+    raise ModoNaoSuportado(f"Nenhum modo de cópia disponível para {origem}")
@@ -1,10 +1,27 @@
 import pandas as pd
-import shutil
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait
 from pathlib import Path
-from typing import List, Dict, Any, Tuple
+from typing import List, Dict, Any, Tuple, Callable, Optional
 from sqlalchemy.orm import Session
 import os
 
+from .copia import MODOS_COPIA, copiar_arquivo
+from .manifesto import VERIFICACOES, ManifestoRestauracao
+from .indice_vault import stat_vault
+
+# Cópias simultâneas na restauração: no total e por dispositivo/compartilhamento de origem
+RESTAURACAO_WORKERS = 16
+RESTAURACAO_LIMITE_POR_DISPOSITIVO = 4
+
+# Intervalo entre os avisos de progresso da restauração (segundos)
+_INTERVALO_PROGRESSO = 1.0
+
+# Peso da última medida na vazão atual (suaviza oscilações pontuais)
+_PESO_MEDIDA = 0.5
+
 
 def exportar_para_csv(dados: List[Dict[str, Any]], caminho_saida: str) -> str:
     """
@@ -93,10 +110,390 @@ def construir_caminho_real_vault(caminho_raiz: str, nome_hex: str) -> str:
     return os.path.join(caminho_raiz, hex_padded)
 
 
+def chave_dispositivo(caminho: str) -> str:
+    """
+    Identifica o dispositivo (ou compartilhamento de rede) de um caminho,
+    para limitar as cópias simultâneas de cada origem.
+
+    Caminhos UNC usam o compartilhamento (\\\\servidor\\share); os demais, o
+    st_dev da pasta ou, se ela não puder ser lida, o drive/primeira pasta.
+    """
+    normalizado = caminho.replace("\\", "/")
+    if normalizado.startswith("//"):
+        return "//" + "/".join(normalizado.lstrip("/").split("/")[:2]).lower()
+
+    try:
+        return f"dev:{os.stat(caminho).st_dev}"
+    except OSError:
+        drive = os.path.splitdrive(caminho)[0]
+        return drive or "/" + normalizado.lstrip("/").split("/")[0]
+
+
+def _planejar_arquivo(arq: Dict[str, Any], destino_path: Path) -> Dict[str, Any]:
+    """
+    Monta origem e destino da cópia de um arquivo.
+
+    Raises:
+        ValueError: Se faltar algum dado para localizar ou nomear o arquivo
+    """
+    # Obtém dados do arquivo
+    nome_hex = arq.get("nome_hex", "")
+    caminho_raiz = arq.get("caminho_raiz_vault", "")
+    caminho_estimado = arq.get("caminho_completo_estimado", "")
+
+    # Se não tem nome_hex mas tem caminho_estimado, extrai o hex do caminho
+    if not nome_hex and caminho_estimado:
+        nome_hex = extrair_nome_hex(caminho_estimado)
+
+    # Se não tem caminho_raiz mas tem caminho_estimado, extrai a raiz
+    if not caminho_raiz and caminho_estimado:
+        caminho_raiz = os.path.dirname(caminho_estimado)
+
+    # Valida dados necessários
+    if not nome_hex:
+        raise ValueError(f"Nome hex não definido para arquivo ID {arq.get('id', '?')}")
+
+    if not caminho_raiz:
+        raise ValueError(f"Caminho raiz do vault não definido para arquivo ID {arq.get('id', '?')}")
+
+    # Constrói o caminho REAL do arquivo no vault (14 chars, sem extensão)
+    caminho_origem = construir_caminho_real_vault(caminho_raiz, nome_hex)
+
+    # Determina nome de destino
+    # Lógica: Se nome_interno_app existe e é diferente de {$CAD_NAME}, usa ele.
+    # Caso contrário, usa nome_original.
+    nome_interno = arq.get("nome_interno_app")
+    nome_original = arq.get("nome_original") or arq.get("nome_arquivo")
+
+    if nome_interno and nome_interno != "{$CAD_NAME}":
+        nome_destino = nome_interno
+    else:
+        nome_destino = nome_original
+
+    if not nome_destino:
+        raise ValueError(f"Nome de destino não definido para {caminho_origem}")
+
+    return {
+        "nome_hex": nome_hex,
+        "caminho_raiz": caminho_raiz,
+        "origem": caminho_origem,
+        "destino": str(destino_path / nome_destino),
+    }
+
+
+def _copiar_arquivo(
+    plano: Dict[str, Any],
+    modo: str = "auto",
+    manifesto: Optional[ManifestoRestauracao] = None,
+    stat: Callable[[str], Any] = os.stat,
+) -> Dict[str, Any]:
+    """
+    Copia um arquivo planejado e preenche o resultado (status, erro, modo, bytes, segundos).
+
+    A cópia (ou o link) é criada com um nome temporário e renomeada no fim:
+    uma cópia interrompida ou com tamanho diferente da origem não deixa
+    um arquivo truncado com o nome final. Com `manifesto`, um arquivo que
+    já está correto no destino não é copiado (status 'inalterado') e o
+    resultado de cada cópia é registrado.
+    A origem é consultada por `stat` (ver `etl.indice_vault.stat_vault`).
+    """
+    inicio = time.perf_counter()
+    temporario = None
+    stat_origem = None
+
+    try:
+        # Verifica se origem existe
+        try:
+            stat_origem = stat(plano["origem"])
+        except FileNotFoundError:
+            raise FileNotFoundError(
+                f"Arquivo não encontrado no vault: {plano['origem']} "
+                f"(hex original: {plano['nome_hex']})"
+            )
+
+        if manifesto is not None and manifesto.em_dia(plano, stat_origem):
+            plano["status"] = "inalterado"
+            plano["_tamanho_origem"] = stat_origem.st_size
+            plano["segundos"] = round(time.perf_counter() - inicio, 4)
+            return plano
+
+        destino = Path(plano["destino"])
+        temporario = destino.with_name(f".{destino.name}.restaurando")
+        if os.path.lexists(temporario):
+            temporario.unlink()
+        plano["modo"] = copiar_arquivo(plano["origem"], str(temporario), modo)
+        tamanho_copiado = os.stat(temporario).st_size
+        if tamanho_copiado != stat_origem.st_size:
+            raise OSError(f"cópia incompleta ({tamanho_copiado} de {stat_origem.st_size} bytes)")
+        os.replace(temporario, destino)
+        temporario = None
+
+        plano["status"] = "copiado"
+        plano["bytes"] = tamanho_copiado
+    except FileNotFoundError as e:
+        plano["status"] = "erro"
+        plano["erro"] = str(e)
+    except Exception as e:
+        plano["status"] = "erro"
+        plano["erro"] = f"Erro ao copiar {plano['nome_arquivo']}: {str(e)}"
+    finally:
+        if temporario is not None and os.path.lexists(temporario):
+            temporario.unlink()
+
+    if manifesto is not None:
+        try:
+            manifesto.registrar(plano, stat_origem)
+        except OSError as e:
+            plano["status"] = "erro"
+            plano["erro"] = f"Erro ao registrar {plano['nome_arquivo']} no manifesto: {e}"
+
+    plano["segundos"] = round(time.perf_counter() - inicio, 4)
+    return plano
+
+
+class ProgressoRestauracao:
+    """
+    Contadores de uma restauração em andamento, com vazão atual e ETA.
+
+    `registrar` é chamado pelas threads de cópia a cada arquivo concluído;
+    `instantaneo` mede a vazão desde a medida anterior.
+    """
+
+    def __init__(self, total: int, bytes_estimados: Optional[int] = None):
+        self.total = total
+        self.bytes_estimados = bytes_estimados
+        self.concluidos = 0
+        self.copiados = 0
+        self.inalterados = 0
+        self.erros = 0
+        self.bytes = 0
+        self.bytes_inalterados = 0
+        self.inicio = time.perf_counter()
+        self.bytes_por_s: Optional[float] = None
+        self.arquivos_por_s: Optional[float] = None
+        self._trava = threading.Lock()
+        self._ultima_medida = (self.inicio, 0, 0)
+
+    def registrar(self, plano: Dict[str, Any]):
+        with self._trava:
+            self.concluidos += 1
+            if plano["status"] == "copiado":
+                self.copiados += 1
+                self.bytes += plano["bytes"]
+            elif plano["status"] == "inalterado":
+                self.inalterados += 1
+                self.bytes_inalterados += plano.get("_tamanho_origem", 0)
+            else:
+                self.erros += 1
+
+    def _media(self, anterior: Optional[float], medida: float) -> float:
+        return medida if anterior is None else _PESO_MEDIDA * medida + (1 - _PESO_MEDIDA) * anterior
+
+    def instantaneo(self) -> Dict[str, Any]:
+        """
+        Progresso atual.
+
+        Returns:
+            Dict com total, concluidos, copiados, inalterados, erros, bytes_copiados,
+            bytes_estimados, progresso (%), segundos, bytes_por_s,
+            arquivos_por_s e eta_s (None enquanto não há medida)
+        """
+        with self._trava:
+            concluidos, copiados, erros, bytes_copiados = self.concluidos, self.copiados, self.erros, self.bytes
+            inalterados, bytes_inalterados = self.inalterados, self.bytes_inalterados
+
+        agora = time.perf_counter()
+        instante, bytes_antes, concluidos_antes = self._ultima_medida
+        if agora - instante > 0 and concluidos > concluidos_antes:
+            self.bytes_por_s = self._media(self.bytes_por_s, (bytes_copiados - bytes_antes) / (agora - instante))
+            self.arquivos_por_s = self._media(self.arquivos_por_s, (concluidos - concluidos_antes) / (agora - instante))
+            self._ultima_medida = (agora, bytes_copiados, concluidos)
+
+        # ETA pelos bytes quando o tamanho de todos os arquivos é conhecido; senão, pela quantidade
+        eta_s = None
+        if self.bytes_estimados and self.bytes_por_s:
+            eta_s = max(self.bytes_estimados - bytes_copiados - bytes_inalterados, 0) / self.bytes_por_s
+        elif self.arquivos_por_s:
+            eta_s = (self.total - concluidos) / self.arquivos_por_s
+        if concluidos >= self.total:
+            eta_s = 0
+
+        return {
+            "total": self.total,
+            "concluidos": concluidos,
+            "copiados": copiados,
+            "inalterados": inalterados,
+            "erros": erros,
+            "bytes_copiados": bytes_copiados,
+            "bytes_estimados": self.bytes_estimados,
+            "progresso": round(concluidos / self.total * 100, 1) if self.total else 100.0,
+            "segundos": round(agora - self.inicio, 2),
+            "bytes_por_s": round(self.bytes_por_s, 1) if self.bytes_por_s is not None else None,
+            "arquivos_por_s": round(self.arquivos_por_s, 2) if self.arquivos_por_s is not None else None,
+            "eta_s": round(eta_s, 1) if eta_s is not None else None,
+        }
+
+
+def executar_restauracao(
+    arquivos: List[Dict[str, Any]],
+    destino: str,
+    max_workers: int = RESTAURACAO_WORKERS,
+    limite_por_dispositivo: int = RESTAURACAO_LIMITE_POR_DISPOSITIVO,
+    modo: str = "auto",
+    ao_progredir: Optional[Callable[[Dict[str, Any]], None]] = None,
+    verificacao: str = "tamanho",
+    usar_indice: bool = True,
+) -> List[Dict[str, Any]]:
+    """
+    Copia os arquivos do vault para `destino` com várias cópias simultâneas.
+
+    Cada dispositivo/compartilhamento de origem (`chave_dispositivo`) tem
+    até `limite_por_dispositivo` cópias ao mesmo tempo e todas juntas não
+    passam de `max_workers`: num vault em rede, a cópia passa a ser
+    limitada pela banda e não pela latência de cada arquivo. Arquivos com o
+    mesmo nome de destino são copiados em sequência, na ordem recebida
+    (prevalece o último, como numa cópia um a um).
+
+    A restauração é retomável: o manifesto da pasta de destino (ver
+    `etl.manifesto`) registra cada cópia, e ao repetir a restauração os
+    arquivos que continuam corretos no destino são pulados.
+
+    Args:
+        arquivos: Mesmo formato de `restaurar_arquivos`
+        destino: Pasta de destino
+        max_workers: Cópias simultâneas no total
+        limite_por_dispositivo: Cópias simultâneas por dispositivo de origem
+        modo: Modo de cópia (ver `etl.copia`): 'auto', 'copia', 'kernel',
+            'reflink', 'hardlink' ou 'symlink'
+        ao_progredir: Callback chamado na thread de quem chamou, a cada
+            segundo e no fim, com `ProgressoRestauracao.instantaneo()`. Se
+            ele levantar uma exceção (ex: cancelamento), as cópias ainda não
+            iniciadas são abandonadas e a exceção é propagada
+        verificacao: Como confirmar que um arquivo já restaurado está em
+            dia: 'tamanho' (tamanho e mtime), 'checksum' (também SHA-256)
+            ou 'nenhuma' (copia tudo de novo)
+        usar_indice: Consultar a existência, o tamanho e o mtime das
+            origens no índice do vault (`etl.indice_vault`), quando a raiz
+            já foi indexada, em vez de um stat por arquivo
+
+    Returns:
+        Um resultado por arquivo, na ordem recebida, com arquivo_id,
+        nome_arquivo, origem, destino, dispositivo, status ('copiado',
+        'inalterado' ou 'erro'), erro, modo (o efetivamente usado), bytes e segundos
+
+    Raises:
+        ValueError: Modo de cópia ou verificação inválidos
+    """
+    if modo not in MODOS_COPIA:
+        raise ValueError(f"Modo de cópia inválido: {modo}. Use um de: {', '.join(MODOS_COPIA)}")
+    if verificacao not in VERIFICACOES:
+        raise ValueError(f"Verificação inválida: {verificacao}. Use uma de: {', '.join(VERIFICACOES)}")
+
+    destino_path = Path(destino)
+    destino_path.mkdir(parents=True, exist_ok=True)
+
+    resultados: List[Dict[str, Any]] = []
+    unidades: Dict[str, List[Dict[str, Any]]] = {}
+    dispositivos: Dict[str, str] = {}
+
+    for arq in arquivos:
+        resultado = {
+            "arquivo_id": arq.get("id"),
+            "nome_arquivo": arq.get("nome_arquivo", "?"),
+            "origem": None,
+            "destino": None,
+            "dispositivo": None,
+            "status": "pendente",
+            "erro": None,
+            "modo": None,
+            "bytes": 0,
+            "segundos": 0.0,
+        }
+        resultados.append(resultado)
+
+        try:
+            resultado.update(_planejar_arquivo(arq, destino_path))
+        except ValueError as e:
+            resultado["status"] = "erro"
+            resultado["erro"] = str(e)
+            continue
+
+        # Uma consulta ao sistema de arquivos por raiz do vault, não por arquivo
+        raiz = resultado.pop("caminho_raiz")
+        if raiz not in dispositivos:
+            dispositivos[raiz] = chave_dispositivo(raiz)
+        resultado["dispositivo"] = dispositivos[raiz]
+        unidades.setdefault(resultado["destino"], []).append(resultado)
+
+    # Fila de unidades (mesmo destino) por dispositivo
+    filas: Dict[str, deque] = {}
+    for unidade in unidades.values():
+        filas.setdefault(unidade[0]["dispositivo"], deque()).append(unidade)
+
+    # Tamanho total (para o ETA) só quando o cadastro informa o de todos os arquivos
+    tamanhos = [arq.get("tamanho_mb") for arq in arquivos]
+    bytes_estimados = int(sum(tamanhos) * 1024 * 1024) if tamanhos and None not in tamanhos else None
+    progresso = ProgressoRestauracao(len(resultados), bytes_estimados)
+    for resultado in resultados:
+        if resultado["status"] == "erro":
+            progresso.registrar(resultado)
+
+    stat = stat_vault(dispositivos) if usar_indice else os.stat
+
+    copias_simultaneas = threading.BoundedSemaphore(max(1, max_workers))
+    interromper = threading.Event()
+
+    def drenar(fila: deque):
+        while not interromper.is_set():
+            try:
+                unidade = fila.popleft()
+            except IndexError:
+                return
+            for plano in unidade:
+                with copias_simultaneas:
+                    _copiar_arquivo(plano, modo, manifesto, stat)
+                progresso.registrar(plano)
+
+    tarefas = [
+        fila
+        for fila in filas.values()
+        for _ in range(min(max(1, limite_por_dispositivo), len(fila)))
+    ]
+    if tarefas:
+        with ManifestoRestauracao(str(destino_path), verificacao) as manifesto, \
+                ThreadPoolExecutor(max_workers=len(tarefas), thread_name_prefix="restauracao") as pool:
+            futuros = [pool.submit(drenar, fila) for fila in tarefas]
+            try:
+                pendentes = futuros
+                while pendentes:
+                    pendentes = wait(pendentes, timeout=_INTERVALO_PROGRESSO).not_done
+                    if pendentes and ao_progredir:
+                        ao_progredir(progresso.instantaneo())
+            except BaseException:
+                # As cópias em andamento terminam; as demais não começam
+                interromper.set()
+                raise
+            for futuro in futuros:
+                futuro.result()
+
+    if ao_progredir:
+        ao_progredir(progresso.instantaneo())
+
+    for resultado in resultados:
+        resultado.pop("nome_hex", None)
+        resultado.pop("_tamanho_origem", None)
+
+    return resultados
+
+
 def restaurar_arquivos(
     arquivos: List[Dict[str, Any]],
     destino: str,
-    usar_padding: bool = True
+    usar_padding: bool = True,
+    max_workers: int = RESTAURACAO_WORKERS,
+    limite_por_dispositivo: int = RESTAURACAO_LIMITE_POR_DISPOSITIVO,
+    modo: str = "auto",
+    verificacao: str = "tamanho",
 ) -> Tuple[int, List[str]]:
     """
     Copia arquivos do vault Windchill para pasta destino com nomes originais.
@@ -109,6 +506,9 @@ def restaurar_arquivos(
         Origem: E:\\PTC\\Windchill\\vaults\\defaultcachevault\\00000000C97E80
         Destino: C:\\Export\\005-21-0005-1-1.prt
 
+    As cópias rodam em paralelo (ver `executar_restauracao`, que também
+    devolve o resultado de cada arquivo).
+
     Args:
         arquivos: Lista de dicts com campos:
             - nome_hex: código hexadecimal do arquivo
@@ -116,78 +516,21 @@ def restaurar_arquivos(
             - nome_arquivo ou nome_original: nome de destino
         destino: Pasta de destino
         usar_padding: Se True, aplica zero-padding de 14 dígitos (padrão: True)
+        max_workers: Cópias simultâneas no total
+        limite_por_dispositivo: Cópias simultâneas por dispositivo de origem
+        modo: Modo de cópia (ver `etl.copia`); hardlink e symlink só valem
+            com o destino no mesmo volume do vault
+        verificacao: Ver `executar_restauracao`; arquivos já em dia no
+            destino não são copiados nem contados
 
     Returns:
         Tuple de (quantidade_copiados, lista_erros)
     """
-    destino_path = Path(destino)
-    destino_path.mkdir(parents=True, exist_ok=True)
-
-    copiados = 0
-    erros: List[str] = []
-
-    for arq in arquivos:
-        try:
-            # Obtém dados do arquivo
-            nome_hex = arq.get("nome_hex", "")
-            caminho_raiz = arq.get("caminho_raiz_vault", "")
-            caminho_estimado = arq.get("caminho_completo_estimado", "")
-
-            # Se não tem nome_hex mas tem caminho_estimado, extrai o hex do caminho
-            if not nome_hex and caminho_estimado:
-                nome_hex = extrair_nome_hex(caminho_estimado)
-
-            # Se não tem caminho_raiz mas tem caminho_estimado, extrai a raiz
-            if not caminho_raiz and caminho_estimado:
-                caminho_raiz = os.path.dirname(caminho_estimado)
-
-            # Valida dados necessários
-            if not nome_hex:
-                erros.append(f"Nome hex não definido para arquivo ID {arq.get('id', '?')}")
-                continue
-
-            if not caminho_raiz:
-                erros.append(f"Caminho raiz do vault não definido para arquivo ID {arq.get('id', '?')}")
-                continue
-
-            # Constrói o caminho REAL do arquivo no vault (14 chars, sem extensão)
-            caminho_origem = construir_caminho_real_vault(caminho_raiz, nome_hex)
-
-            # Determina nome de destino
-            # Lógica: Se nome_interno_app existe e é diferente de {$CAD_NAME}, usa ele.
-            # Caso contrário, usa nome_original.
-            nome_interno = arq.get("nome_interno_app")
-            nome_original = arq.get("nome_original") or arq.get("nome_arquivo")
-
-            if nome_interno and nome_interno != "{$CAD_NAME}":
-                nome_destino = nome_interno
-            else:
-                nome_destino = nome_original
-
-            if not nome_destino:
-                erros.append(f"Nome de destino não definido para {caminho_origem}")
-                continue
-
-            # Caminho completo de destino
-            caminho_destino = destino_path / nome_destino
-
-            # Verifica se origem existe
-            origem_path = Path(caminho_origem)
-
-            if not origem_path.exists():
-                erros.append(
-                    f"Arquivo não encontrado no vault: {caminho_origem} "
-                    f"(hex original: {nome_hex})"
-                )
-                continue
-
-            # Copia o arquivo
-            shutil.copy2(str(origem_path), str(caminho_destino))
-            copiados += 1
-
-        except Exception as e:
-            erros.append(f"Erro ao copiar {arq.get('nome_arquivo', '?')}: {str(e)}")
-
+    resultados = executar_restauracao(
+        arquivos, destino, max_workers, limite_por_dispositivo, modo, verificacao=verificacao
+    )
+    copiados = sum(1 for r in resultados if r["status"] == "copiado")
+    erros = [r["erro"] for r in resultados if r["erro"]]
     return copiados, erros
 
 
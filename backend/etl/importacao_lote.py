@@ -0,0 +1,241 @@
+import pandas as pd
+import multiprocessing
+import os
+import re
+import tempfile
+import uuid
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import ExitStack
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Callable, Tuple, Iterable, Iterator
+from sqlalchemy.orm import Session
+
+from .cache import gravar_parquet
+from .importer import importar_arquivo_em_lotes, detectar_formato, identificar_tipo_dados
+from .transformer import transformar_dados, MemoTransformacao
+from .loader import criar_carregador
+from .carga_em_massa import TABELAS_POR_TIPO, usar_carga_em_massa, indices_suspensos
+
+# Sufixo numérico das partes extras de um dump (ex: WTDOCUMENTMASTER_202601080605-1767881112653)
+_PADRAO_SUFIXO_PARTE = re.compile(r"-\d+$")
+
+
+def listar_arquivos_importacao(origem: str, pasta_extracao: Optional[str] = None) -> List[str]:
+    """
+    Lista os arquivos importáveis de uma pasta ou arquivo zip.
+
+    Args:
+        origem: Pasta com os dumps ou arquivo .zip
+        pasta_extracao: Pasta onde o zip é extraído (default: pasta temporária nova)
+
+    Returns:
+        Caminhos dos arquivos CSV, JSON e MD encontrados, em ordem alfabética
+        (links simbólicos para fora da origem são ignorados)
+
+    Raises:
+        ValueError: Se a origem não for uma pasta nem um zip
+    """
+    origem_path = Path(origem)
+
+    if origem_path.is_file() and zipfile.is_zipfile(origem_path):
+        pasta = Path(pasta_extracao or tempfile.mkdtemp(prefix="etl_lote_"))
+        _extrair_zip(origem_path, pasta)
+        origem_path = pasta
+    elif not origem_path.is_dir():
+        raise ValueError(f"Origem deve ser uma pasta ou arquivo .zip: {origem}")
+
+    # Links que apontam para fora da pasta de origem são ignorados
+    origem_real = origem_path.resolve()
+    return sorted(
+        str(p) for p in origem_path.rglob("*")
+        if p.is_file() and detectar_formato(str(p)) != "unknown"
+        and origem_real in p.resolve().parents
+    )
+
+
+def _extrair_zip(zip_path: Path, destino: Path):
+    """Extrai o zip recusando entradas que escapem da pasta de destino."""
+    destino = destino.resolve()
+
+    with zipfile.ZipFile(zip_path) as zf:
+        for membro in zf.infolist():
+            alvo = (destino / membro.filename).resolve()
+            if destino not in alvo.parents and alvo != destino:
+                raise ValueError(f"Entrada inválida no zip: {membro.filename}")
+        zf.extractall(destino)
+
+
+def nome_tabela_logica(file_path: str) -> str:
+    """
+    Retorna o nome da tabela lógica de um dump, agrupando arquivos multi-partes.
+
+    Exemplo:
+        'WTDOCUMENTMASTER_202601080605-1767881112653.json' -> 'WTDOCUMENTMASTER_202601080605'
+    """
+    return _PADRAO_SUFIXO_PARTE.sub("", Path(file_path).stem)
+
+
+def agrupar_por_tabela(caminhos: List[str]) -> Dict[str, List[str]]:
+    """Agrupa os arquivos pelas respectivas tabelas lógicas."""
+    grupos: Dict[str, List[str]] = {}
+    for caminho in caminhos:
+        grupos.setdefault(nome_tabela_logica(caminho), []).append(caminho)
+    return grupos
+
+
+def _ler_e_transformar(file_path: str, pasta_lotes: str) -> Tuple[str, str, List[str]]:
+    """
+    Lê e transforma um arquivo lote a lote. Executado nos processos do pool.
+
+    Cada lote transformado é gravado em Parquet em `pasta_lotes`: o processo
+    principal lê um lote por vez, sem receber o arquivo inteiro em memória.
+
+    Returns:
+        Tuple de (formato, tipo, caminhos dos lotes em ordem)
+    """
+    lotes, formato = importar_arquivo_em_lotes(file_path)
+    memo = MemoTransformacao()
+    prefixo = os.path.join(pasta_lotes, uuid.uuid4().hex)
+    tipo = "desconhecido"
+    caminhos: List[str] = []
+
+    for i, df in enumerate(lotes):
+        if i == 0:
+            tipo = identificar_tipo_dados(df)
+        caminho = f"{prefixo}_{i:05d}.parquet"
+        gravar_parquet(transformar_dados(df, tipo, memo), Path(caminho))
+        caminhos.append(caminho)
+
+    return formato, tipo, caminhos
+
+
+def _ler_lotes_gravados(caminhos: List[str]) -> Iterator[pd.DataFrame]:
+    """Lê os lotes gravados pelos processos do pool, apagando cada um depois de lido."""
+    for caminho in caminhos:
+        df = pd.read_parquet(caminho)
+        os.unlink(caminho)
+        yield df
+
+
+def importar_lote(
+    origem: str,
+    db: Session,
+    max_workers: Optional[int] = None,
+    ao_progredir: Optional[Callable[[Dict[str, Any]], None]] = None,
+    ao_gravar_tabela: Optional[Callable[[Dict[str, Any]], None]] = None,
+    ignorar_tabelas: Optional[Iterable[str]] = None,
+    incremental: bool = False,
+) -> List[Dict[str, Any]]:
+    """
+    Importa todos os dumps de uma pasta ou zip.
+
+    Leitura e transformação rodam em um pool de processos (um por núcleo por
+    padrão), que gravam os lotes transformados em Parquet numa pasta
+    temporária. A gravação no banco acontece neste processo, uma tabela
+    por vez, lendo um lote por vez das partes da tabela: a memória fica
+    limitada ao tamanho de lote também em arquivos grandes. Registros
+    repetidos entre as partes são descartados pela chave natural, pelo
+    carregador.
+
+    Args:
+        origem: Pasta com os dumps ou arquivo .zip
+        db: Sessão do banco usada na gravação
+        max_workers: Quantidade de processos (default: os.cpu_count())
+        ao_progredir: Callback chamado com o progresso a cada arquivo lido
+        ao_gravar_tabela: Callback chamado com o resultado de cada tabela gravada sem erro
+        ignorar_tabelas: Tabelas lógicas já gravadas (retomada de um job), não lidas de novo
+        incremental: Gravar só registros novos e alterados; o resultado de
+            cada tabela ganha `atualizados` e `inalterados`
+
+    Returns:
+        Lista com o resultado de cada tabela lógica
+    """
+    with tempfile.TemporaryDirectory(prefix="etl_lote_") as pasta_extracao:
+        grupos = agrupar_por_tabela(listar_arquivos_importacao(origem, pasta_extracao))
+        for tabela in ignorar_tabelas or ():
+            grupos.pop(tabela, None)
+        total_arquivos = sum(len(arquivos) for arquivos in grupos.values())
+
+        pasta_lotes = os.path.join(pasta_extracao, ".lotes")
+        os.makedirs(pasta_lotes)
+        partes: Dict[str, List[str]] = {tabela: [] for tabela in grupos}
+        pendentes: Dict[str, int] = {tabela: len(arquivos) for tabela, arquivos in grupos.items()}
+        resultados: Dict[str, Dict[str, Any]] = {
+            tabela: {"tabela": tabela, "arquivos": [Path(a).name for a in arquivos], "tipo": None,
+                     "formato": None, "registros_lidos": 0, "inseridos": 0, "erro": None}
+            for tabela, arquivos in grupos.items()
+        }
+        arquivos_processados = 0
+
+        tamanho_total = sum(os.path.getsize(a) for arquivos in grupos.values() for a in arquivos)
+        suspender_indices = not incremental and usar_carga_em_massa(db, tamanho_total)
+
+        with ExitStack() as pilha:
+            if suspender_indices:
+                pilha.enter_context(indices_suspensos(db, TABELAS_POR_TIPO["documentos"]))
+            # spawn: o processo da API tem threads (workers, pipeline) e conexões abertas
+            pool = pilha.enter_context(ProcessPoolExecutor(
+                max_workers=max_workers or os.cpu_count(),
+                mp_context=multiprocessing.get_context("spawn"),
+            ))
+
+            futuros = {
+                pool.submit(_ler_e_transformar, caminho, pasta_lotes): tabela
+                for tabela, arquivos in grupos.items()
+                for caminho in arquivos
+            }
+
+            for futuro in as_completed(futuros):
+                tabela = futuros[futuro]
+                resultado = resultados[tabela]
+                arquivos_processados += 1
+                pendentes[tabela] -= 1
+
+                try:
+                    formato, tipo, caminhos = futuro.result()
+                    resultado["formato"] = formato
+                    resultado["tipo"] = resultado["tipo"] or tipo
+                    partes[tabela].extend(caminhos)
+                except Exception as e:
+                    resultado["erro"] = str(e)
+
+                if pendentes[tabela] == 0:
+                    _gravar_tabela(resultado, partes.pop(tabela), db, incremental)
+                    if ao_gravar_tabela and not resultado["erro"]:
+                        ao_gravar_tabela(resultado)
+
+                if ao_progredir:
+                    ao_progredir({
+                        "arquivos_total": total_arquivos,
+                        "arquivos_processados": arquivos_processados,
+                        "progress": round(arquivos_processados / total_arquivos * 100, 1),
+                    })
+
+    return list(resultados.values())
+
+
+def _gravar_tabela(resultado: Dict[str, Any], partes: List[str], db: Session, incremental: bool = False):
+    """Grava no banco os lotes de uma tabela lógica, um por vez."""
+    if resultado["erro"] or not partes:
+        return
+
+    if resultado["tipo"] not in ("documentos", "arquivos"):
+        resultado["erro"] = "Tipo de dados não reconhecido; tabela ignorada"
+        return
+
+    try:
+        carregador = criar_carregador(db, resultado["tipo"], incremental=incremental)
+        try:
+            for df in _ler_lotes_gravados(partes):
+                resultado["registros_lidos"] += len(df)
+                resultado["inseridos"] += carregador.carregar(df)
+            resultado["inseridos"] += carregador.finalizar()
+        finally:
+            carregador.fechar()
+        if incremental:
+            resultado["atualizados"] = carregador.atualizados
+            resultado["inalterados"] = carregador.inalterados
+    except Exception as e:
+        db.rollback()
+        resultado["erro"] = str(e)
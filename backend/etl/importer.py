@@ -1,7 +1,24 @@
 import pandas as pd
+import codecs
+import csv
 import json
+import mmap
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Tuple, List, Dict, Any
+from typing import Tuple, List, Dict, Any, Iterable, Iterator, Union
+
+# Quantidade de registros por lote no modo de leitura incremental
+TAMANHO_LOTE_PADRAO = 50_000
+
+# Tamanho do bloco lido do disco pelo parser JSON incremental
+_TAMANHO_BLOCO_LEITURA = 1 << 20
+
+# Amostra inicial usada para detectar encoding e separador de CSVs
+_TAMANHO_AMOSTRA_CSV = 64 * 1024
+
+# Encodings tentados na amostra e, se um byte inválido aparecer depois
+# dela, na leitura, em ordem (latin-1 aceita qualquer byte)
+ENCODINGS_CSV = ["utf-8", "cp1252", "latin-1"]
 
 
 def detectar_formato(file_path: str) -> str:
@@ -42,56 +59,358 @@ def importar_arquivo(file_path: str) -> Tuple[pd.DataFrame, str]:
     if formato == "csv":
         df = _importar_csv(file_path)
     elif formato == "json":
-        df = _importar_json(file_path)
+        lotes = list(_iterar_json_em_lotes(file_path, TAMANHO_LOTE_PADRAO))
+        df = pd.concat(lotes, ignore_index=True) if lotes else pd.DataFrame()
     elif formato == "md":
         df = _importar_markdown(file_path)
     else:
         raise ValueError(f"Formato não suportado: {formato}")
 
-    # Normaliza nomes das colunas
-    df.columns = [col.strip().upper() for col in df.columns]
+    df = _normalizar_lote(df)
+
+    return df, formato
+
+
+def importar_arquivo_em_lotes(
+    file_path: str,
+    tamanho_lote: int = TAMANHO_LOTE_PADRAO
+) -> Tuple[Iterator[pd.DataFrame], str]:
+    """
+    Importa arquivo CSV, JSON ou MD de forma incremental.
+
+    Cada lote é um DataFrame com no máximo `tamanho_lote` registros, com as
+    colunas já normalizadas. Em `lote.attrs["bytes_lidos"]` fica a posição
+    aproximada no arquivo, usada para calcular o progresso.
+
+    Args:
+        file_path: Caminho do arquivo
+        tamanho_lote: Quantidade máxima de registros por lote
+
+    Returns:
+        Tuple de (iterador de DataFrames, tipo_formato)
+
+    Raises:
+        ValueError: Se formato não suportado
+    """
+    formato = detectar_formato(file_path)
+
+    if formato == "json":
+        lotes = _iterar_json_em_lotes(file_path, tamanho_lote)
+    elif formato == "csv":
+        lotes = _iterar_csv_em_lotes(file_path, tamanho_lote)
+    elif formato == "md":
+        lotes = _iterar_markdown_em_lotes(file_path, tamanho_lote)
+    else:
+        raise ValueError(f"Formato não suportado: {formato}")
 
-    # Remove duplicatas
+    return (_normalizar_lote(lote) for lote in lotes), formato
+
+
+def _normalizar_lote(df: pd.DataFrame) -> pd.DataFrame:
+    """Normaliza nomes das colunas e remove duplicatas do lote."""
+    attrs = dict(df.attrs)
+
+    df.columns = [str(col).strip().upper() for col in df.columns]
     df = df.drop_duplicates()
 
-    return df, formato
+    df.attrs.update(attrs)
+    return df
+
+
+def _detectar_parametros_csv(file_path: str) -> Tuple[str, str]:
+    """
+    Detecta encoding e separador de um CSV a partir de uma amostra inicial.
+
+    Apenas os primeiros `_TAMANHO_AMOSTRA_CSV` bytes são lidos, de modo que o
+    arquivo completo seja percorrido uma única vez pelo parser.
+
+    Returns:
+        Tuple de (encoding, separador)
+    """
+    with open(file_path, "rb") as f:
+        amostra = f.read(_TAMANHO_AMOSTRA_CSV)
+
+    if amostra.startswith(codecs.BOM_UTF8):
+        encoding = "utf-8-sig"
+        texto = amostra[len(codecs.BOM_UTF8):].decode("utf-8", errors="ignore")
+    else:
+        encoding, texto = None, ""
+        for candidato in ENCODINGS_CSV:
+            try:
+                # final=False: a amostra pode cortar um caractere multibyte no fim
+                texto = codecs.getincrementaldecoder(candidato)().decode(amostra, final=False)
+            except UnicodeDecodeError:
+                continue
+            encoding = candidato
+            break
+
+    # Considera apenas linhas completas da amostra
+    if len(amostra) == _TAMANHO_AMOSTRA_CSV and "\n" in texto:
+        texto = texto[:texto.rindex("\n")]
+
+    try:
+        separador = csv.Sniffer().sniff(texto, delimiters=",;\t|").delimiter
+    except csv.Error:
+        separador = ","
+
+    return encoding, separador
+
+
+@contextmanager
+def _abrir_mapeado(file_path: str):
+    """
+    Abre o arquivo mapeado em memória (somente leitura), lido direto do cache
+    de páginas do sistema. O mmap oferece read/tell/seek como um arquivo
+    binário; quando o mapeamento não é possível (arquivo vazio, pipe, alguns
+    compartilhamentos de rede), usa o próprio arquivo.
+    """
+    with open(file_path, "rb") as f:
+        try:
+            mapa = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, OSError):
+            yield f
+            return
+
+        with mapa:
+            yield mapa
+
+
+def _proximo_encoding(encoding: str) -> str:
+    """
+    Encoding seguinte de `ENCODINGS_CSV`, para quando aparece um byte
+    inválido depois da amostra (latin-1, o último, aceita qualquer byte).
+    """
+    return ENCODINGS_CSV[ENCODINGS_CSV.index(encoding) + 1]
+
+
+def _parametros_leitura_csv(file_path: str) -> Tuple[str, str, int]:
+    """
+    Encoding, separador e byte inicial da leitura de um CSV.
+
+    O BOM do UTF-8 é pulado pela posição inicial, e não pelo encoding
+    'utf-8-sig', para continuar pulado se a leitura trocar de encoding.
+    """
+    encoding, separador = _detectar_parametros_csv(file_path)
+    if encoding == "utf-8-sig":
+        return "utf-8", separador, len(codecs.BOM_UTF8)
+    return encoding, separador, 0
 
 
 def _importar_csv(file_path: str) -> pd.DataFrame:
-    """Importa arquivo CSV."""
-    # Tenta diferentes encodings comuns
-    encodings = ["utf-8", "latin-1", "cp1252"]
+    """Importa arquivo CSV, trocando de encoding se aparecer um byte inválido depois da amostra."""
+    encoding, separador, inicio = _parametros_leitura_csv(file_path)
 
-    for encoding in encodings:
+    while True:
         try:
-            return pd.read_csv(file_path, encoding=encoding)
+            with open(file_path, "rb") as f:
+                f.seek(inicio)
+                return pd.read_csv(f, encoding=encoding, sep=separador)
         except UnicodeDecodeError:
-            continue
+            encoding = _proximo_encoding(encoding)
+
+
+def _iterar_csv_em_lotes(file_path: str, tamanho_lote: int) -> Iterator[pd.DataFrame]:
+    """
+    Importa arquivo CSV em lotes de até `tamanho_lote` linhas.
 
-    raise ValueError(f"Não foi possível ler o arquivo CSV com encodings: {encodings}")
+    Encoding e separador são detectados pela amostra inicial e o arquivo é
+    decodificado sem tolerar erros. Se um byte inválido aparecer depois da
+    amostra, a leitura recomeça com o encoding seguinte de `ENCODINGS_CSV`,
+    descartando as linhas já entregues em vez de repeti-las.
+    """
+    encoding, separador, inicio = _parametros_leitura_csv(file_path)
+    entregues = 0
 
+    while True:
+        try:
+            for df in _ler_csv_em_lotes(file_path, encoding, separador, tamanho_lote, inicio, entregues):
+                entregues += len(df)
+                yield df
+            return
+        except UnicodeDecodeError:
+            encoding = _proximo_encoding(encoding)
+
+
+def _ler_csv_em_lotes(
+    file_path: str, encoding: str, separador: str, tamanho_lote: int, inicio: int, pular: int
+) -> Iterator[pd.DataFrame]:
+    """Lotes do CSV a partir do byte `inicio`, sem as `pular` primeiras linhas de dados."""
+    # Arquivo comum, não o mmap: com um mmap o pandas ignora `encoding` e
+    # decodifica como UTF-8, corrompendo os CSV em cp1252/latin-1
+    with open(file_path, "rb") as f:
+        f.seek(inicio)
+        leitor = pd.read_csv(f, encoding=encoding, sep=separador, chunksize=tamanho_lote)
+        with leitor:
+            for df in leitor:
+                if pular >= len(df):
+                    pular -= len(df)
+                    continue
+                if pular:
+                    df, pular = df.iloc[pular:], 0
+                df.attrs["bytes_lidos"] = f.tell()
+                yield df
+
+
+class _LeitorJsonIncremental:
+    """
+    Percorre um arquivo JSON sem carregá-lo inteiro na memória.
 
-def _importar_json(file_path: str) -> pd.DataFrame:
+    Mantém apenas um buffer de texto com o trecho ainda não consumido e usa
+    `json.JSONDecoder.raw_decode` para decodificar um valor de cada vez.
     """
-    Importa arquivo JSON.
 
-    Suporta estruturas:
+    def __init__(self, arquivo):
+        self._arquivo = arquivo
+        self._decoder = json.JSONDecoder()
+        self._decodificador_texto = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        self._pos = 0
+        self._fim = False
+        self.bytes_lidos = 0
+
+    def _ler_bloco(self) -> bool:
+        """Acrescenta um bloco do arquivo ao buffer. Retorna False no fim do arquivo."""
+        if self._fim:
+            return False
+
+        bloco = self._arquivo.read(_TAMANHO_BLOCO_LEITURA)
+        self.bytes_lidos += len(bloco)
+        self._fim = not bloco
+
+        # Descarta o trecho já consumido antes de crescer o buffer
+        self._buffer = self._buffer[self._pos:] + self._decodificador_texto.decode(bloco, final=self._fim)
+        self._pos = 0
+        return not self._fim
+
+    def espiar(self) -> str:
+        """Retorna o próximo caractere significativo sem consumi-lo ('' no fim)."""
+        while True:
+            while self._pos < len(self._buffer) and self._buffer[self._pos] in " \t\r\n":
+                self._pos += 1
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._ler_bloco():
+                return ""
+
+    def consumir(self, esperado: str):
+        """Consome o próximo caractere significativo, validando o valor."""
+        caractere = self.espiar()
+        if caractere != esperado:
+            raise ValueError(f"JSON inválido: esperado '{esperado}', encontrado '{caractere or 'EOF'}'")
+        self._pos += 1
+
+    def ler_valor(self) -> Any:
+        """Decodifica o próximo valor JSON completo, lendo mais blocos se necessário."""
+        self.espiar()
+        while True:
+            try:
+                valor, fim = self._decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                # Valor cortado no fim do buffer: lê mais um bloco e tenta de novo
+                if not self._ler_bloco():
+                    raise
+                continue
+
+            # Números podem estar cortados no fim do buffer ('12' de '1234')
+            if fim == len(self._buffer) and not self._fim:
+                self._ler_bloco()
+                continue
+
+            self._pos = fim
+            return valor
+
+    def iterar_lista(self) -> Iterator[Any]:
+        """Itera os elementos de uma lista JSON, a partir do '['."""
+        self.consumir("[")
+        if self.espiar() == "]":
+            self._pos += 1
+            return
+
+        while True:
+            yield self.ler_valor()
+            if self.espiar() == ",":
+                self._pos += 1
+                continue
+            self.consumir("]")
+            return
+
+
+def _iterar_registros_json(leitor: _LeitorJsonIncremental) -> Iterator[Dict[str, Any]]:
+    """
+    Itera os registros de um JSON nos formatos suportados:
     - Lista de objetos: [{"campo": "valor"}, ...]
     - Objeto com query como chave (formato Windchill export)
+    - Um único objeto (vira um registro)
+
+    O envelope do export Windchill ({"SELECT ...": [ ... ]}) é percorrido de
+    forma incremental, sem materializar a lista de registros.
+    """
+    inicio = leitor.espiar()
+
+    if inicio == "[":
+        yield from leitor.iterar_lista()
+        return
+
+    if inicio != "{":
+        raise ValueError("JSON inválido: esperado objeto ou lista na raiz")
+
+    leitor.consumir("{")
+    if leitor.espiar() == "}":
+        return
+
+    chave = leitor.ler_valor()
+    leitor.consumir(":")
+
+    if leitor.espiar() == "[":
+        # Envelope com a query como chave: os registros estão na lista
+        yield from leitor.iterar_lista()
+        if leitor.espiar() != "}":
+            raise ValueError("JSON com múltiplas chaves na raiz não é suportado")
+        return
+
+    valor = leitor.ler_valor()
+    if leitor.espiar() == "}":
+        # Objeto com uma única chave: o valor é o registro
+        yield valor
+        return
+
+    # Objeto com várias chaves: o próprio objeto é o único registro
+    registro = {chave: valor}
+    while leitor.espiar() == ",":
+        leitor.consumir(",")
+        chave = leitor.ler_valor()
+        leitor.consumir(":")
+        registro[chave] = leitor.ler_valor()
+    leitor.consumir("}")
+    yield registro
+
+
+def _iterar_json_em_lotes(file_path: str, tamanho_lote: int) -> Iterator[pd.DataFrame]:
+    """
+    Importa arquivo JSON em lotes de até `tamanho_lote` registros.
+
+    Suporta as estruturas de `_iterar_registros_json` e mantém em memória
+    apenas um lote de registros por vez.
     """
-    with open(file_path, "r", encoding="utf-8") as f:
-        data = json.load(f)
+    with _abrir_mapeado(file_path) as f:
+        leitor = _LeitorJsonIncremental(f)
+        registros: List[Any] = []
 
-    # Se é um dict com uma única chave (query SQL), pega o valor
-    if isinstance(data, dict) and len(data) == 1:
-        key = list(data.keys())[0]
-        data = data[key]
+        for registro in _iterar_registros_json(leitor):
+            registros.append(registro)
+            if len(registros) >= tamanho_lote:
+                yield _registros_para_dataframe(registros, leitor.bytes_lidos)
+                registros = []
 
-    # Normaliza para lista se necessário
-    if isinstance(data, dict):
-        data = [data]
+        if registros:
+            yield _registros_para_dataframe(registros, leitor.bytes_lidos)
 
-    return pd.json_normalize(data)
+
+def _registros_para_dataframe(registros: List[Any], bytes_lidos: int) -> pd.DataFrame:
+    """Converte um lote de registros JSON em DataFrame."""
+    df = pd.json_normalize(registros)
+    df.attrs["bytes_lidos"] = bytes_lidos
+    return df
 
 
 def _importar_markdown(file_path: str) -> pd.DataFrame:
@@ -103,49 +422,73 @@ def _importar_markdown(file_path: str) -> pd.DataFrame:
     |-------|-------|
     |valor1 |valor2 |
     """
-    linhas: List[List[str]] = []
-    cabecalho: List[str] = []
+    lotes = list(_iterar_markdown_em_lotes(file_path, TAMANHO_LOTE_PADRAO))
+    return pd.concat(lotes, ignore_index=True)
 
-    with open(file_path, "r", encoding="utf-8") as f:
-        for i, linha in enumerate(f):
-            linha = linha.strip()
 
-            # Ignora linhas vazias
-            if not linha:
-                continue
+def _iterar_markdown_em_lotes(file_path: str, tamanho_lote: int) -> Iterator[pd.DataFrame]:
+    """
+    Importa tabela Markdown em lotes de até `tamanho_lote` linhas.
 
-            # Ignora linha separadora (---|---)
-            if linha.replace("|", "").replace("-", "").strip() == "":
-                continue
+    Cada linha do arquivo é lida e dividida em células uma única vez.
+    Linhas com mais ou menos células que o cabeçalho são ajustadas à
+    quantidade de colunas do cabeçalho.
+    """
+    cabecalho: List[str] = []
+    linhas: List[List[str]] = []
+    bytes_lidos = 0
+    lotes_emitidos = 0
 
-            # Processa células
-            celulas = [c.strip() for c in linha.split("|")]
-            # Remove células vazias das bordas
-            celulas = [c for c in celulas if c or celulas.index(c) not in [0, len(celulas)-1]]
-            celulas = celulas[1:-1] if linha.startswith("|") and linha.endswith("|") else celulas
+    with open(file_path, "rb") as f:
+        for linha_bytes in f:
+            bytes_lidos += len(linha_bytes)
+            linha = linha_bytes.decode("utf-8").strip()
+
+            # Ignora linhas vazias e a linha separadora (---|---)
+            if not linha.strip("|-: "):
+                continue
 
-            # Reprocessa para garantir
             celulas = [c.strip() for c in linha.strip("|").split("|")]
 
             if not cabecalho:
                 cabecalho = celulas
-            else:
-                linhas.append(celulas)
+                continue
+
+            if len(celulas) != len(cabecalho):
+                celulas = (celulas + [""] * len(cabecalho))[:len(cabecalho)]
+            linhas.append(celulas)
+
+            if len(linhas) >= tamanho_lote:
+                yield _linhas_para_dataframe(linhas, cabecalho, bytes_lidos)
+                lotes_emitidos += 1
+                linhas = []
 
     if not cabecalho:
         raise ValueError("Não foi possível encontrar cabeçalho na tabela Markdown")
 
-    return pd.DataFrame(linhas, columns=cabecalho)
+    # Sempre emite ao menos um lote, mesmo sem linhas, para preservar as colunas
+    if linhas or not lotes_emitidos:
+        yield _linhas_para_dataframe(linhas, cabecalho, bytes_lidos)
+
 
+def _linhas_para_dataframe(linhas: List[List[str]], cabecalho: List[str], bytes_lidos: int) -> pd.DataFrame:
+    """Converte um lote de linhas da tabela Markdown em DataFrame."""
+    df = pd.DataFrame(linhas, columns=cabecalho)
+    df.attrs["bytes_lidos"] = bytes_lidos
+    return df
 
-def identificar_tipo_dados(df: pd.DataFrame) -> str:
+
+def identificar_tipo_dados(df: Union[pd.DataFrame, Iterable[str]]) -> str:
     """
     Identifica se os dados são de Documentos ou Arquivos CAD.
 
+    Basta o primeiro lote (ou apenas a lista de colunas) de uma importação
+    incremental: a detecção usa somente os nomes das colunas.
+
     Returns:
         'documentos' ou 'arquivos'
     """
-    colunas = set(df.columns)
+    colunas = set(df.columns) if isinstance(df, pd.DataFrame) else set(df)
 
     # Colunas típicas de documentos
     colunas_doc = {"NUMERO_DOC", "NOME_DOC", "ESTADO_LIFECYCLE"}
@@ -0,0 +1,282 @@
+"""
+Importação incremental por impressão digital dos registros.
+
+Para cada registro gravado fica guardado, pela chave natural, um hash do
+conteúdo (tabela `impressoes_registros`). Ao reimportar o mesmo dump, cada
+lote é classificado de forma vetorizada em novos, alterados e inalterados:
+só os novos são inseridos e só os alterados são atualizados, então a
+recarga de uma tabela inteira custa proporcional ao que mudou.
+
+As impressões refletem o que a última importação incremental gravou;
+alterações feitas direto no banco não são detectadas.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import select, update, delete, insert, bindparam
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from models import Documento, Arquivo, ImpressaoRegistro
+from .loader import (
+    CarregadorORM,
+    CHAVE_DOCUMENTO,
+    CHAVE_ARQUIVO,
+    _MAX_CHAVES_POR_CONSULTA,
+    _buscar_chaves,
+    _inserir_em_massa,
+    _normalizar_chave,
+    processar_lote_documentos,
+    processar_lote_arquivos,
+)
+from .transformer import (
+    CAMPOS_DOCUMENTO,
+    CAMPOS_ARQUIVO_DOCUMENTO,
+    CAMPOS_ARQUIVO,
+    preparar_para_insercao_documentos,
+    preparar_para_insercao_arquivos,
+)
+
+
+def _colunas_como_texto(df: pd.DataFrame, colunas) -> pd.DataFrame:
+    """
+    Colunas convertidas para texto antes do hash.
+
+    O mesmo valor precisa gerar o mesmo hash em qualquer lote e em qualquer
+    noite, mesmo que o dtype inferido mude (ex: int64 num lote, float64 em
+    outro por causa de um nulo).
+    """
+    dados = {}
+    for coluna in colunas:
+        if coluna not in df.columns:
+            dados[coluna] = pd.Series(pd.NA, index=df.index, dtype="string")
+            continue
+
+        serie = df[coluna]
+        if pd.api.types.is_numeric_dtype(serie) and not pd.api.types.is_bool_dtype(serie):
+            serie = serie.astype("Float64")
+        dados[coluna] = serie.astype("string")
+
+    return pd.DataFrame(dados, index=df.index)
+
+
+def hash_chave(df: pd.DataFrame, tipo: str) -> np.ndarray:
+    """Hash (int64) da chave natural de cada linha; a mesma chave gera o mesmo hash em qualquer lote."""
+    chave = CHAVE_DOCUMENTO if tipo == "documentos" else CHAVE_ARQUIVO
+    return pd.util.hash_pandas_object(_colunas_como_texto(df, chave), index=False).to_numpy().view(np.int64)
+
+
+def calcular_impressoes(df: pd.DataFrame, tipo: str) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Calcula, por linha, o hash da chave natural e o hash das colunas gravadas.
+
+    Args:
+        df: Saída de `transformar_dados`
+        tipo: 'documentos' ou 'arquivos'
+
+    Returns:
+        Tuple de (chaves, impressoes), arrays int64 com uma posição por linha
+    """
+    campos = CAMPOS_DOCUMENTO + CAMPOS_ARQUIVO_DOCUMENTO if tipo == "documentos" else CAMPOS_ARQUIVO
+
+    impressoes = pd.util.hash_pandas_object(_colunas_como_texto(df, campos), index=False)
+    return hash_chave(df, tipo), impressoes.to_numpy().view(np.int64)
+
+
+class CarregadorIncremental(CarregadorORM):
+    """
+    Carregador do modo incremental: grava só os registros novos e alterados.
+
+    Na primeira importação incremental de uma tabela ainda não há
+    impressões: os registros que já existem no banco são atualizados uma
+    vez e as impressões de todos são gravadas. Dentro de uma importação vale
+    a primeira ocorrência de cada chave, como no carregador padrão.
+    """
+
+    def __init__(self, db: Session, tipo: str, tamanho_inicial: Optional[int] = None):
+        super().__init__(db, tipo, tamanho_inicial)
+        self.atualizados = 0
+        self.inalterados = 0
+
+        # Impressões gravadas, ordenadas pela chave (carregadas no primeiro lote)
+        self._chaves: Optional[np.ndarray] = None
+        self._impressoes: Optional[np.ndarray] = None
+        self._ids: Optional[np.ndarray] = None
+        self._vistas: Optional[np.ndarray] = None
+
+        # Chaves sem impressão já vistas nesta importação
+        self._novas: set = set()
+
+    def metricas(self) -> Dict[str, Any]:
+        return {**super().metricas(), "atualizados": self.atualizados, "inalterados": self.inalterados}
+
+    def _carregar_impressoes(self):
+        tabela = ImpressaoRegistro.__table__
+        linhas = self.db.execute(
+            select(tabela.c.chave, tabela.c.impressao, tabela.c.registro_id)
+            .where(tabela.c.tabela == self.tipo)
+        ).all()
+
+        dados = np.array(linhas, dtype=np.int64).reshape(-1, 3)
+        ordem = np.argsort(dados[:, 0], kind="stable")
+        self._chaves = dados[ordem, 0]
+        self._impressoes = dados[ordem, 1]
+        self._ids = dados[ordem, 2]
+        self._vistas = np.zeros(len(dados), dtype=bool)
+
+    def _classificar(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Separa as linhas a gravar (novas e alteradas), com as colunas auxiliares
+        `_chave`, `_impressao` e `_registro_id` (-1 quando não há impressão).
+        """
+        chaves, impressoes = calcular_impressoes(df, self.tipo)
+
+        posicoes = np.searchsorted(self._chaves, chaves)
+        dentro = posicoes < len(self._chaves)
+        encontrada = np.zeros(len(chaves), dtype=bool)
+        encontrada[dentro] = self._chaves[posicoes[dentro]] == chaves[dentro]
+
+        # Chave repetida no lote ou em um lote anterior desta importação
+        repetida = pd.Series(chaves).duplicated().to_numpy(copy=True)
+        repetida[encontrada] |= self._vistas[posicoes[encontrada]]
+        fora = ~encontrada
+        repetida[fora] |= np.fromiter(
+            (chave in self._novas for chave in chaves[fora].tolist()), dtype=bool, count=int(fora.sum())
+        )
+
+        na_base = encontrada & ~repetida
+        alterada = np.zeros(len(chaves), dtype=bool)
+        alterada[na_base] = self._impressoes[posicoes[na_base]] != impressoes[na_base]
+        nova = fora & ~repetida
+
+        self._vistas[posicoes[na_base]] = True
+        self._novas.update(chaves[nova].tolist())
+        self.inalterados += int((na_base & ~alterada).sum())
+
+        registro_ids = np.full(len(chaves), -1, dtype=np.int64)
+        registro_ids[alterada] = self._ids[posicoes[alterada]]
+
+        gravar = alterada | nova
+        saida = df[gravar].copy()
+        saida["_chave"] = chaves[gravar]
+        saida["_impressao"] = impressoes[gravar]
+        saida["_registro_id"] = registro_ids[gravar]
+        return saida
+
+    def carregar(self, df_transformado: pd.DataFrame) -> int:
+        """Grava os registros novos e alterados do lote e retorna a quantidade inserida."""
+        if self.tipo not in ("documentos", "arquivos") or df_transformado.empty:
+            return 0
+        if self._chaves is None:
+            self._carregar_impressoes()
+
+        return super().carregar(self._classificar(df_transformado))
+
+    def _chave_de(self, registro: Dict) -> Tuple:
+        if self.tipo == "documentos":
+            return tuple(registro["documento"].get(c) for c in CHAVE_DOCUMENTO)
+        return tuple(registro.get(c) for c in CHAVE_ARQUIVO)
+
+    def _gravar_parte(self, parte: pd.DataFrame) -> int:
+        if self.tipo == "documentos":
+            registros = next(preparar_para_insercao_documentos(parte, len(parte)), [])
+            tabela, colunas_chave, processar_lote = Documento.__table__, CHAVE_DOCUMENTO, processar_lote_documentos
+        else:
+            registros = next(preparar_para_insercao_arquivos(parte, len(parte)), [])
+            tabela, colunas_chave, processar_lote = Arquivo.__table__, CHAVE_ARQUIVO, processar_lote_arquivos
+
+        impressoes = parte["_impressao"].tolist()
+        registro_ids = parte["_registro_id"].tolist()
+
+        # Com impressão (alterados): atualizados pelo id
+        atualizar = [(id_, reg) for id_, reg in zip(registro_ids, registros) if id_ >= 0]
+
+        # Sem impressão: podem já existir no banco (importados antes do modo incremental)
+        sem_impressao = [reg for id_, reg in zip(registro_ids, registros) if id_ < 0]
+        existentes = _buscar_chaves(self.db, tabela, colunas_chave, {self._chave_de(r) for r in sem_impressao})
+        inserir = []
+        for registro in sem_impressao:
+            id_existente = existentes.get(_normalizar_chave(self._chave_de(registro)))
+            if id_existente is None:
+                inserir.append(registro)
+            else:
+                atualizar.append((id_existente, registro))
+
+        self._atualizar(atualizar)
+        inseridos = processar_lote(inserir, self.db) if inserir else 0
+
+        if inserir:
+            existentes.update(_buscar_chaves(self.db, tabela, colunas_chave, {self._chave_de(r) for r in inserir}))
+
+        linhas = []
+        for chave, impressao, id_, registro in zip(parte["_chave"].tolist(), impressoes, registro_ids, registros):
+            if id_ < 0:
+                id_ = existentes.get(_normalizar_chave(self._chave_de(registro)))
+            if id_ is not None:
+                linhas.append({"tabela": self.tipo, "chave": chave, "impressao": impressao, "registro_id": id_})
+        self._gravar_impressoes(linhas)
+
+        return inseridos
+
+    def _atualizar(self, pares: List[Tuple[int, Dict]]):
+        """Atualiza os registros alterados pelo id (e o arquivo ligado a cada documento)."""
+        if not pares:
+            return
+        self.atualizados += len(pares)
+
+        if self.tipo == "arquivos":
+            self.db.execute(update(Arquivo), [{"id": id_, **registro} for id_, registro in pares])
+            return
+
+        self.db.execute(update(Documento), [{"id": id_, **item["documento"]} for id_, item in pares])
+
+        tabela = Arquivo.__table__
+        com_arquivo = [(id_, item["arquivo"]) for id_, item in pares if item["arquivo"]["nome_arquivo"]]
+        ids = [id_ for id_, _ in com_arquivo]
+        ligados = set()
+        for i in range(0, len(ids), _MAX_CHAVES_POR_CONSULTA):
+            ligados.update(self.db.scalars(
+                select(tabela.c.documento_id).where(tabela.c.documento_id.in_(ids[i:i + _MAX_CHAVES_POR_CONSULTA]))
+            ))
+
+        atualizar = [
+            {"b_documento_id": id_, **{f"b_{c}": arquivo[c] for c in CAMPOS_ARQUIVO_DOCUMENTO}}
+            for id_, arquivo in com_arquivo if id_ in ligados
+        ]
+        if atualizar:
+            self.db.execute(
+                update(tabela)
+                .where(tabela.c.documento_id == bindparam("b_documento_id"))
+                .values({c: bindparam(f"b_{c}") for c in CAMPOS_ARQUIVO_DOCUMENTO}),
+                atualizar,
+            )
+
+        # Documento que passou a ter arquivo
+        _inserir_em_massa(self.db, tabela, [
+            {"documento_id": id_, **arquivo} for id_, arquivo in com_arquivo if id_ not in ligados
+        ])
+
+    def _gravar_impressoes(self, linhas: List[Dict]):
+        if not linhas:
+            return
+
+        tabela = ImpressaoRegistro.__table__
+        dialeto = self.db.get_bind().dialect.name
+
+        if dialeto in ("postgresql", "sqlite"):
+            stmt = (postgresql_insert if dialeto == "postgresql" else sqlite_insert)(tabela)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[tabela.c.tabela, tabela.c.chave],
+                set_={"impressao": stmt.excluded.impressao, "registro_id": stmt.excluded.registro_id},
+            )
+            self.db.execute(stmt, linhas)
+            return
+
+        chaves = [linha["chave"] for linha in linhas]
+        for i in range(0, len(chaves), _MAX_CHAVES_POR_CONSULTA):
+            self.db.execute(delete(tabela).where(
+                tabela.c.tabela == self.tipo, tabela.c.chave.in_(chaves[i:i + _MAX_CHAVES_POR_CONSULTA])
+            ))
+        self.db.execute(insert(tabela), linhas)
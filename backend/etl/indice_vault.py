@@ -0,0 +1,375 @@
+"""
+Índice persistente das pastas do vault.
+
+Verificar ou restaurar arquivos consultava o vault arquivo a arquivo
+(`os.path.exists` / `os.stat`): num compartilhamento de rede, uma ida e
+volta ao servidor por arquivo. O índice varre cada raiz do vault uma vez
+com `os.scandir` (subpastas em paralelo), guarda nome → tamanho e mtime
+de cada arquivo num arquivo binário compacto (arrays numpy ordenados por
+pasta) e responde às consultas em memória.
+
+A atualização é incremental pelo mtime das pastas: só as pastas que
+mudaram (arquivos criados, removidos ou renomeados) são lidas de novo; as
+demais custam um stat cada. Alterar o conteúdo de um arquivo não muda o
+mtime da pasta, mas os arquivos do vault não são alterados no lugar.
+"""
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+# Pasta dos arquivos de índice (um por raiz do vault)
+INDICE_VAULT_DIR = Path(os.getenv(
+    "ETL_INDICE_VAULT_DIR", os.path.join(tempfile.gettempdir(), "etl_manager_indice_vault")
+))
+
+# Pastas lidas em paralelo na varredura
+INDICE_VAULT_WORKERS = int(os.getenv("ETL_INDICE_VAULT_WORKERS", "16"))
+
+# Índice mais velho que isto é atualizado (incrementalmente) antes de ser consultado
+INDICE_VAULT_IDADE_MAX_S = int(os.getenv("ETL_INDICE_VAULT_IDADE_MAX_S", "60"))
+
+_VERSAO_FORMATO = 1
+
+_trava = threading.Lock()
+_indices: Dict[str, "IndiceVault"] = {}
+
+
+class EntradaIndice(NamedTuple):
+    """Tamanho e mtime de um arquivo indexado (mesmos nomes de `os.stat_result`)."""
+    st_size: int
+    st_mtime_ns: int
+
+
+class _Pasta(NamedTuple):
+    mtime_ns: int
+    nomes: np.ndarray  # bytes, ordenados
+    tamanhos: np.ndarray
+    mtimes: np.ndarray
+    subpastas: Tuple[str, ...]
+
+
+def _normalizar(caminho: str) -> str:
+    return os.path.normcase(os.path.normpath(caminho))
+
+
+def _ler_pasta(caminho: str) -> _Pasta:
+    """
+    Lista uma pasta com `os.scandir`.
+
+    No Windows o tamanho e o mtime vêm da própria listagem, sem um stat por
+    arquivo. O mtime da pasta é lido antes da listagem: uma alteração durante
+    a leitura faz a pasta ser lida de novo na próxima atualização.
+    """
+    mtime_ns = os.stat(caminho).st_mtime_ns
+    arquivos: List[Tuple[bytes, int, int]] = []
+    subpastas = []
+
+    with os.scandir(caminho) as entradas:
+        for entrada in entradas:
+            try:
+                if entrada.is_dir(follow_symlinks=False):
+                    subpastas.append(_normalizar(entrada.path))
+                elif entrada.is_file():
+                    stat = entrada.stat()
+                    arquivos.append((os.fsencode(os.path.normcase(entrada.name)), stat.st_size, stat.st_mtime_ns))
+            except OSError:
+                # Removido durante a listagem
+                continue
+
+    arquivos.sort()
+    return _Pasta(
+        mtime_ns,
+        np.array([a[0] for a in arquivos], dtype=bytes),
+        np.array([a[1] for a in arquivos], dtype=np.int64),
+        np.array([a[2] for a in arquivos], dtype=np.int64),
+        tuple(subpastas),
+    )
+
+
+class IndiceVault:
+    """
+    Índice de uma raiz do vault (a raiz e todas as subpastas).
+
+    As consultas leem um retrato imutável das pastas: uma atualização monta
+    um novo e o troca de uma vez, então consultas e atualização podem
+    acontecer ao mesmo tempo.
+    """
+
+    def __init__(self, raiz: str):
+        self.raiz = _normalizar(raiz)
+        self.pastas: Dict[str, _Pasta] = {}
+        self.atualizado_em: Optional[datetime] = None
+        self.ultima_atualizacao: Dict[str, Any] = {}
+        self._trava_atualizacao = threading.Lock()
+
+    @property
+    def caminho_arquivo(self) -> Path:
+        nome = hashlib.sha256(self.raiz.encode("utf-8")).hexdigest()[:24]
+        return INDICE_VAULT_DIR / f"{nome}.npz"
+
+    def atualizar(self, completo: bool = False) -> Dict[str, Any]:
+        """
+        Atualiza o índice: relê só as pastas cujo mtime mudou (ou todas, com `completo`).
+
+        Raises:
+            OSError: Se a raiz não existir ou não puder ser lida
+
+        Returns:
+            `estatisticas()`, com pastas_lidas (listadas de novo) e segundos em ultima_atualizacao
+        """
+        with self._trava_atualizacao:
+            inicio = time.perf_counter()
+            anteriores = {} if completo else self.pastas
+            novas: Dict[str, _Pasta] = {}
+            lidas = 0
+
+            def visitar(caminho: str) -> Optional[_Pasta]:
+                anterior = anteriores.get(caminho)
+                try:
+                    if anterior is not None and os.stat(caminho).st_mtime_ns == anterior.mtime_ns:
+                        return anterior
+                    return _ler_pasta(caminho)
+                except OSError:
+                    # Subpasta removida ou sem permissão: fica fora do índice (consulta direta)
+                    if caminho == self.raiz:
+                        raise
+                    return None
+
+            with ThreadPoolExecutor(max_workers=max(1, INDICE_VAULT_WORKERS), thread_name_prefix="indice-vault") as pool:
+                pendentes = {pool.submit(visitar, self.raiz): self.raiz}
+                while pendentes:
+                    prontos, _ = wait(pendentes, return_when=FIRST_COMPLETED)
+                    for futuro in prontos:
+                        caminho = pendentes.pop(futuro)
+                        pasta = futuro.result()
+                        if pasta is None:
+                            continue
+                        if pasta is not anteriores.get(caminho):
+                            lidas += 1
+                        novas[caminho] = pasta
+                        for subpasta in pasta.subpastas:
+                            pendentes[pool.submit(visitar, subpasta)] = subpasta
+
+            self.pastas = novas
+            self.atualizado_em = datetime.utcnow()
+            self.ultima_atualizacao = {
+                "pastas_lidas": lidas,
+                "completa": completo or not anteriores,
+                "segundos": round(time.perf_counter() - inicio, 3),
+            }
+            self.salvar()
+            return self.estatisticas()
+
+    def consultar(self, caminho: str) -> Tuple[bool, Optional[EntradaIndice]]:
+        """
+        Procura um arquivo no índice, sem acessar o vault.
+
+        Returns:
+            Tuple de (pasta_indexada, entrada). Se a pasta do arquivo não
+            faz parte do índice, (False, None); se faz e o arquivo não
+            existe, (True, None)
+        """
+        caminho = _normalizar(caminho)
+        pasta = self.pastas.get(os.path.dirname(caminho))
+        if pasta is None:
+            return False, None
+
+        nome = os.fsencode(os.path.basename(caminho))
+        if len(nome) > pasta.nomes.dtype.itemsize:
+            # Maior que todos os nomes da pasta (e seria truncado na comparação)
+            return True, None
+        posicao = int(np.searchsorted(pasta.nomes, nome))
+        if posicao < len(pasta.nomes) and pasta.nomes[posicao] == nome:
+            return True, EntradaIndice(int(pasta.tamanhos[posicao]), int(pasta.mtimes[posicao]))
+        return True, None
+
+    def estatisticas(self) -> Dict[str, Any]:
+        pastas = list(self.pastas.values())
+        return {
+            "raiz": self.raiz,
+            "pastas": len(pastas),
+            "arquivos": sum(len(p.nomes) for p in pastas),
+            "bytes": int(sum(int(p.tamanhos.sum()) for p in pastas)),
+            "atualizado_em": self.atualizado_em.isoformat() if self.atualizado_em else None,
+            "ultima_atualizacao": self.ultima_atualizacao,
+            "arquivo_indice": str(self.caminho_arquivo),
+        }
+
+    def salvar(self):
+        """Grava o índice (arquivo .npz compactado, trocado de uma vez)."""
+        caminhos = list(self.pastas)
+        pastas = [self.pastas[c] for c in caminhos]
+        posicao = {c: i for i, c in enumerate(caminhos)}
+        pais = np.full(len(caminhos), -1, dtype=np.int64)
+        for i, pasta in enumerate(pastas):
+            for subpasta in pasta.subpastas:
+                if subpasta in posicao:
+                    pais[posicao[subpasta]] = i
+
+        INDICE_VAULT_DIR.mkdir(parents=True, exist_ok=True)
+        temporario = self.caminho_arquivo.with_suffix(".tmp.npz")
+        np.savez_compressed(
+            temporario,
+            versao=np.array(_VERSAO_FORMATO),
+            raiz=np.array(self.raiz),
+            atualizado_em=np.array(self.atualizado_em.isoformat() if self.atualizado_em else ""),
+            pastas=np.array(caminhos, dtype=str),
+            pastas_mtime=np.array([p.mtime_ns for p in pastas], dtype=np.int64),
+            pastas_pai=pais,
+            pastas_qtd=np.array([len(p.nomes) for p in pastas], dtype=np.int64),
+            nomes=np.concatenate([p.nomes for p in pastas]) if pastas else np.array([], dtype=bytes),
+            tamanhos=np.concatenate([p.tamanhos for p in pastas]) if pastas else np.array([], dtype=np.int64),
+            mtimes=np.concatenate([p.mtimes for p in pastas]) if pastas else np.array([], dtype=np.int64),
+        )
+        os.replace(temporario, self.caminho_arquivo)
+
+    def carregar(self) -> bool:
+        """Lê o índice gravado; retorna False se não existir ou for de outro formato/raiz."""
+        try:
+            with np.load(self.caminho_arquivo) as dados:
+                if int(dados["versao"]) != _VERSAO_FORMATO or str(dados["raiz"]) != self.raiz:
+                    return False
+                caminhos = [str(c) for c in dados["pastas"]]
+                mtimes_pastas, pais, quantidades = dados["pastas_mtime"], dados["pastas_pai"], dados["pastas_qtd"]
+                nomes, tamanhos, mtimes = dados["nomes"], dados["tamanhos"], dados["mtimes"]
+                atualizado_em = str(dados["atualizado_em"])
+        except (OSError, KeyError, ValueError):
+            return False
+
+        subpastas: List[List[str]] = [[] for _ in caminhos]
+        for i, pai in enumerate(pais.tolist()):
+            if pai >= 0:
+                subpastas[pai].append(caminhos[i])
+
+        fins = np.cumsum(quantidades)
+        pastas = {}
+        for i, caminho in enumerate(caminhos):
+            inicio, fim = int(fins[i] - quantidades[i]), int(fins[i])
+            pastas[caminho] = _Pasta(
+                int(mtimes_pastas[i]), nomes[inicio:fim], tamanhos[inicio:fim], mtimes[inicio:fim], tuple(subpastas[i])
+            )
+
+        self.pastas = pastas
+        self.atualizado_em = datetime.fromisoformat(atualizado_em) if atualizado_em else None
+        return True
+
+
+def obter_indice(raiz: str) -> Optional[IndiceVault]:
+    """Índice da raiz em memória (ou lido do disco), ou None se ela ainda não foi indexada."""
+    chave = _normalizar(raiz)
+    with _trava:
+        if chave not in _indices:
+            indice = IndiceVault(raiz)
+            if not indice.carregar():
+                return None
+            _indices[chave] = indice
+        return _indices[chave]
+
+
+def atualizar_indice(raiz: str, completo: bool = False) -> Dict[str, Any]:
+    """
+    Cria ou atualiza o índice de uma raiz do vault.
+
+    Raises:
+        OSError: Se a raiz não existir ou não puder ser lida
+    """
+    indice = obter_indice(raiz)
+    if indice is None:
+        indice = IndiceVault(raiz)
+        with _trava:
+            indice = _indices.setdefault(indice.raiz, indice)
+    return indice.atualizar(completo)
+
+
+def listar_indices() -> List[Dict[str, Any]]:
+    """Estatísticas dos índices gravados."""
+    if INDICE_VAULT_DIR.exists():
+        for arquivo in INDICE_VAULT_DIR.glob("*.npz"):
+            if arquivo.name.endswith(".tmp.npz"):
+                continue
+            try:
+                with np.load(arquivo) as dados:
+                    obter_indice(str(dados["raiz"]))
+            except (OSError, KeyError, ValueError):
+                continue
+
+    with _trava:
+        return [indice.estatisticas() for indice in _indices.values()]
+
+
+def remover_indice(raiz: str) -> bool:
+    """Remove o índice de uma raiz (memória e disco)."""
+    indice = IndiceVault(raiz)
+    with _trava:
+        removido = _indices.pop(indice.raiz, None) is not None
+    if indice.caminho_arquivo.exists():
+        indice.caminho_arquivo.unlink()
+        removido = True
+    return removido
+
+
+def _indice_que_cobre(raiz: str) -> Optional[IndiceVault]:
+    """Índice da própria raiz ou da pasta indexada mais próxima acima dela."""
+    pasta = _normalizar(raiz)
+    while True:
+        indice = obter_indice(pasta)
+        if indice is not None:
+            return indice
+        pai = os.path.dirname(pasta)
+        if pai == pasta:
+            return None
+        pasta = pai
+
+
+def stat_vault(raizes: Iterable[str]) -> Callable[[str], Any]:
+    """
+    Função no lugar de `os.stat` para arquivos do vault.
+
+    Usa o índice das raízes que já foram indexadas, ou de uma pasta acima
+    delas (atualizado antes, se tiver mais de INDICE_VAULT_IDADE_MAX_S).
+    Só o que o índice encontra é respondido em memória: arquivos que não
+    estão nele (fora dos índices ou criados depois da última atualização)
+    são consultados no sistema de arquivos.
+
+    Args:
+        raizes: Raízes do vault dos arquivos a consultar
+
+    Returns:
+        Função que recebe o caminho e retorna um objeto com st_size e
+        st_mtime_ns, levantando FileNotFoundError se o arquivo não existir
+    """
+    indices = []
+    for raiz in set(raizes):
+        indice = _indice_que_cobre(raiz) if raiz else None
+        if indice is None or indice in indices:
+            continue
+        idade = (datetime.utcnow() - indice.atualizado_em).total_seconds() if indice.atualizado_em else None
+        if idade is None or idade > INDICE_VAULT_IDADE_MAX_S:
+            try:
+                indice.atualizar()
+            except OSError:
+                # Raiz inacessível agora: consulta direta
+                continue
+        indices.append(indice)
+
+    if not indices:
+        return os.stat
+
+    def stat(caminho: str):
+        for indice in indices:
+            entrada = indice.consultar(caminho)[1]
+            if entrada is not None:
+                return entrada
+        # Fora do índice ou criado depois da última atualização: só quem
+        # realmente falta paga a consulta ao vault
+        return os.stat(caminho)
+
+    return stat
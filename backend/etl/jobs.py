@@ -0,0 +1,414 @@
+"""
+Fila persistente de importações em background.
+
+Os jobs ficam na tabela `import_jobs` e são executados por um pool de
+threads iniciado com a aplicação, com limite de importações simultâneas.
+Cada job guarda um checkpoint do último lote gravado: um job com erro
+pode ser retomado e um job interrompido (queda ou reinício do servidor)
+volta para a fila, continuando do checkpoint em vez de refazer os lotes
+já gravados. Jobs na fila saem por prioridade (maior primeiro) e ordem
+de criação; há workers reservados para jobs prioritários, para que uma
+importação urgente não espere o fim de uma importação grande.
+
+Restaurações de arquivos do vault (`tipo_job` 'restore') usam a mesma
+fila, mas workers próprios: copiar arquivos não disputa o banco com as
+importações, e uma restauração não espera uma importação longa.
+"""
+import json
+import os
+import socket
+import tempfile
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from database import SessionLocal, SQLALCHEMY_DATABASE_URL
+from models import ImportJob
+
+# Pasta onde ficam os uploads até o job terminar
+JOBS_DIR = os.getenv("ETL_JOBS_DIR", os.path.join(tempfile.gettempdir(), "etl_manager_jobs"))
+
+# Importações simultâneas (no SQLite as escritas são serializadas pelo banco)
+MAX_IMPORTACOES = int(os.getenv(
+    "ETL_MAX_IMPORTACOES", "1" if SQLALCHEMY_DATABASE_URL.startswith("sqlite") else "2"
+))
+
+# Workers extras que só executam jobs com prioridade > 0, fora do limite de
+# MAX_IMPORTACOES: um job urgente não espera o fim de uma importação grande.
+# No SQLite é um escritor a mais; WAL e busy_timeout (ver `database`) fazem
+# cada um esperar só o commit de lote do outro
+WORKERS_PRIORITARIOS = int(os.getenv("ETL_WORKERS_PRIORITARIOS", "1"))
+
+# Restaurações simultâneas (cada uma já copia vários arquivos em paralelo)
+WORKERS_RESTAURACAO = int(os.getenv("ETL_WORKERS_RESTAURACAO", "1"))
+
+# Tipos de job de cada grupo de workers
+TIPOS_IMPORTACAO = ("arquivo", "lote")
+TIPOS_RESTAURACAO = ("restore",)
+
+# Sem sinal de vida por este tempo, um job em processamento volta para a fila
+JOB_TIMEOUT_S = int(os.getenv("ETL_JOB_TIMEOUT_S", "300"))
+
+_INTERVALO_HEARTBEAT = 30
+_INTERVALO_VERIFICACAO = 2.0
+
+# Identifica o processo dono de um job em processamento
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+# Campos de progresso aceitos em `atualizar_job`
+_CAMPOS_PROGRESSO = ("progress", "total", "processed", "inserted", "tipo", "formato")
+
+_parar = threading.Event()
+_novo_job = threading.Event()
+_workers: List[threading.Thread] = []
+
+
+class ImportacaoCancelada(Exception):
+    """Levantada no progresso de um job cujo cancelamento foi pedido."""
+
+
+def caminho_arquivo_job(job_id: str, filename: str) -> str:
+    """Caminho onde o upload de um job fica guardado até a importação terminar."""
+    os.makedirs(JOBS_DIR, exist_ok=True)
+    return os.path.join(JOBS_DIR, f"{job_id}{os.path.splitext(filename)[1]}")
+
+
+def _isoformat(valor: Optional[datetime]) -> Optional[str]:
+    return valor.isoformat() if valor else None
+
+
+def _carregar_json(valor: Optional[str]) -> Dict[str, Any]:
+    return json.loads(valor) if valor else {}
+
+
+def job_para_dict(job: ImportJob) -> Dict[str, Any]:
+    """Status do job no formato de GET /import/status/{job_id}."""
+    checkpoint = _carregar_json(job.checkpoint)
+    dados = {
+        "job_id": job.id,
+        "tipo_job": job.tipo_job,
+        "status": job.status,
+        "filename": job.filename,
+        "prioridade": job.prioridade,
+        "incremental": bool(job.incremental),
+        "progress": job.progress or 0,
+        "total": job.total or 0,
+        "processed": job.processed or 0,
+        "inserted": job.inserted or 0,
+        "tipo": job.tipo,
+        "formato": job.formato,
+        "checkpoint_lote": checkpoint.get("lote", 0),
+        "tamanho_lote": checkpoint.get("tamanho_lote"),
+        "registros_por_s": checkpoint.get("registros_por_s"),
+        "atualizados": checkpoint.get("atualizados", 0),
+        "inalterados": checkpoint.get("inalterados", 0),
+        "cancelamento_pedido": bool(job.cancelar),
+        "error": job.error,
+        "log_id": job.log_id,
+        "created_at": _isoformat(job.created_at),
+        "started_at": _isoformat(job.started_at),
+        "completed_at": _isoformat(job.completed_at),
+    }
+    if job.tipo_job == "restore":
+        # Bytes copiados, vazão atual e ETA (ver `etl.exporter.ProgressoRestauracao`)
+        dados["restauracao"] = checkpoint
+    if job.resultado:
+        # Lote: resultado de cada tabela; arquivo: métricas da carga paralela; restore: falhas e totais
+        chave = {"lote": "tabelas", "restore": "resultado"}.get(job.tipo_job, "carga")
+        dados[chave] = json.loads(job.resultado)
+    return dados
+
+
+def criar_job(
+    db: Session,
+    job_id: str,
+    filename: str,
+    caminho: str,
+    tipo_job: str = "arquivo",
+    sha256: Optional[str] = None,
+    prioridade: int = 0,
+    manter_arquivo: bool = False,
+    incremental: bool = False,
+) -> ImportJob:
+    """
+    Registra um job na fila e acorda os workers.
+
+    O arquivo em `caminho` passa a pertencer ao job e é removido quando ele
+    termina, a não ser com `manter_arquivo` (arquivo lido no próprio servidor).
+    Com `incremental`, o job grava só registros novos e alterados.
+    """
+    job = ImportJob(
+        id=job_id,
+        tipo_job=tipo_job,
+        filename=filename,
+        caminho=caminho,
+        manter_arquivo=manter_arquivo,
+        incremental=incremental,
+        sha256=sha256,
+        prioridade=prioridade,
+        status="queued",
+    )
+    db.add(job)
+    db.commit()
+    _novo_job.set()
+    return job
+
+
+def obter_job(db: Session, job_id: str) -> Optional[ImportJob]:
+    return db.get(ImportJob, job_id)
+
+
+def listar_jobs(db: Session, limite: int = 100) -> List[ImportJob]:
+    """Jobs mais recentes primeiro."""
+    return db.query(ImportJob).order_by(ImportJob.created_at.desc()).limit(limite).all()
+
+
+def cancelar_job(db: Session, job_id: str) -> Optional[ImportJob]:
+    """
+    Cancela um job. Na fila, é cancelado na hora; em processamento, o
+    cancelamento é pedido e acontece no próximo lote gravado (restauração:
+    no próximo aviso de progresso).
+    """
+    job = obter_job(db, job_id)
+    if not job:
+        return None
+
+    if job.status in ("queued", "error"):
+        job.status = "cancelled"
+        job.completed_at = datetime.utcnow()
+        _remover_arquivo(job)
+    elif job.status == "processing":
+        job.cancelar = True
+
+    db.commit()
+    return job
+
+
+def retomar_job(db: Session, job_id: str) -> Optional[ImportJob]:
+    """
+    Devolve para a fila um job que terminou com erro, para continuar do checkpoint.
+
+    Raises:
+        ValueError: Se o job não estiver com erro ou o arquivo não existir mais
+    """
+    job = obter_job(db, job_id)
+    if not job:
+        return None
+
+    if job.status != "error":
+        raise ValueError(f"Só jobs com erro podem ser retomados (status atual: {job.status})")
+    if not os.path.exists(job.caminho):
+        raise ValueError("Arquivo do job não existe mais; envie-o novamente")
+
+    job.status = "queued"
+    job.error = None
+    job.completed_at = None
+    db.commit()
+    _novo_job.set()
+    return job
+
+
+def alterar_prioridade(db: Session, job_id: str, prioridade: int) -> Optional[ImportJob]:
+    """Altera a prioridade de um job (vale para jobs ainda na fila)."""
+    job = obter_job(db, job_id)
+    if not job:
+        return None
+
+    job.prioridade = prioridade
+    db.commit()
+    _novo_job.set()
+    return job
+
+
+def atualizar_job(job_id: str, dados: Dict[str, Any]):
+    """
+    Grava o progresso de um job em processamento.
+
+    Aceita os campos de progresso e `checkpoint` (dict, gravado como JSON).
+
+    Raises:
+        ImportacaoCancelada: Se o cancelamento do job foi pedido
+    """
+    valores = {campo: dados[campo] for campo in _CAMPOS_PROGRESSO if campo in dados}
+    if "checkpoint" in dados:
+        valores["checkpoint"] = json.dumps(dados["checkpoint"])
+    valores["atualizado_em"] = datetime.utcnow()
+
+    with SessionLocal() as db:
+        db.execute(update(ImportJob).where(ImportJob.id == job_id).values(**valores))
+        db.commit()
+        cancelar = db.query(ImportJob.cancelar).filter(ImportJob.id == job_id).scalar()
+
+    if cancelar:
+        raise ImportacaoCancelada(job_id)
+
+
+def finalizar_job(job_id: str, status: str, **campos):
+    """
+    Encerra um job com o status final ('completed', 'error' ou 'cancelled').
+
+    O arquivo do job é removido, exceto em caso de erro (o job pode ser
+    retomado) ou se ele for um arquivo do servidor (`manter_arquivo`).
+    """
+    with SessionLocal() as db:
+        job = obter_job(db, job_id)
+        job.status = status
+        job.completed_at = datetime.utcnow()
+        job.atualizado_em = job.completed_at
+        job.worker = None
+        for campo, valor in campos.items():
+            setattr(job, campo, valor)
+        db.commit()
+
+        if status != "error":
+            _remover_arquivo(job)
+
+
+def _remover_arquivo(job: ImportJob):
+    if not job.manter_arquivo and job.caminho and os.path.exists(job.caminho):
+        os.unlink(job.caminho)
+
+
+def _recuperar_interrompidos(db: Session):
+    """Devolve para a fila os jobs em processamento sem sinal de vida recente."""
+    limite = datetime.utcnow() - timedelta(seconds=JOB_TIMEOUT_S)
+    resultado = db.execute(
+        update(ImportJob)
+        .where(ImportJob.status == "processing", ImportJob.atualizado_em < limite)
+        .values(status="queued", worker=None)
+    )
+    db.commit()
+    if resultado.rowcount:
+        _novo_job.set()
+
+
+def _reservar_proximo(prioridade_minima: Optional[int], tipos_job=TIPOS_IMPORTACAO) -> Optional[Dict[str, Any]]:
+    """
+    Reserva o próximo job da fila (dos tipos em `tipos_job`) para este worker.
+
+    A reserva é um UPDATE condicionado ao status 'queued', então dois
+    workers (ou processos) nunca pegam o mesmo job.
+
+    Returns:
+        Dados do job reservado, ou None se a fila estiver vazia
+    """
+    with SessionLocal() as db:
+        _recuperar_interrompidos(db)
+
+        consulta = db.query(ImportJob.id).filter(ImportJob.status == "queued", ImportJob.tipo_job.in_(tipos_job))
+        if prioridade_minima is not None:
+            consulta = consulta.filter(ImportJob.prioridade >= prioridade_minima)
+        candidatos = consulta.order_by(ImportJob.prioridade.desc(), ImportJob.created_at).limit(5).all()
+
+        for (job_id,) in candidatos:
+            agora = datetime.utcnow()
+            reservado = db.execute(
+                update(ImportJob)
+                .where(ImportJob.id == job_id, ImportJob.status == "queued")
+                .values(status="processing", worker=WORKER_ID, started_at=agora, atualizado_em=agora)
+            ).rowcount
+            db.commit()
+
+            if reservado:
+                job = obter_job(db, job_id)
+                return {
+                    "job_id": job.id,
+                    "tipo_job": job.tipo_job,
+                    "filename": job.filename,
+                    "caminho": job.caminho,
+                    "sha256": job.sha256,
+                    "incremental": bool(job.incremental),
+                    "checkpoint": _carregar_json(job.checkpoint),
+                }
+
+    return None
+
+
+def _manter_vivo(job_id: str, fim: threading.Event):
+    """Atualiza o sinal de vida do job enquanto ele executa (ex: merge longo no banco)."""
+    while not fim.wait(_INTERVALO_HEARTBEAT):
+        with SessionLocal() as db:
+            db.execute(
+                update(ImportJob)
+                .where(ImportJob.id == job_id, ImportJob.worker == WORKER_ID)
+                .values(atualizado_em=datetime.utcnow())
+            )
+            db.commit()
+
+
+def _loop_worker(executar: Callable[[Dict[str, Any]], None], prioridade_minima: Optional[int], tipos_job):
+    while not _parar.is_set():
+        try:
+            job = _reservar_proximo(prioridade_minima, tipos_job)
+        except Exception:
+            job = None
+
+        if job is None:
+            _novo_job.wait(_INTERVALO_VERIFICACAO)
+            _novo_job.clear()
+            continue
+
+        fim = threading.Event()
+        heartbeat = threading.Thread(target=_manter_vivo, args=(job["job_id"], fim), daemon=True)
+        heartbeat.start()
+        try:
+            executar(job)
+        except Exception as e:
+            finalizar_job(job["job_id"], "error", error=str(e))
+        finally:
+            fim.set()
+
+
+def iniciar_workers(
+    executar: Callable[[Dict[str, Any]], None],
+    quantidade: int = MAX_IMPORTACOES,
+    prioritarios: int = WORKERS_PRIORITARIOS,
+    restauracoes: int = WORKERS_RESTAURACAO,
+):
+    """
+    Inicia o pool de workers da fila.
+
+    Args:
+        executar: Função que executa um job reservado (de qualquer tipo). Deve
+            finalizar o job com `finalizar_job` e gravar o progresso com `atualizar_job`
+        quantidade: Workers para qualquer importação
+        prioritarios: Workers extras só para importações com prioridade > 0
+        restauracoes: Workers só para restaurações
+    """
+    _parar.clear()
+    for i in range(quantidade):
+        _workers.append(threading.Thread(
+            target=_loop_worker, args=(executar, None, TIPOS_IMPORTACAO), name=f"importacao-job-{i}", daemon=True
+        ))
+    for i in range(prioritarios):
+        _workers.append(threading.Thread(
+            target=_loop_worker, args=(executar, 1, TIPOS_IMPORTACAO), name=f"importacao-job-prioritario-{i}", daemon=True
+        ))
+    for i in range(restauracoes):
+        _workers.append(threading.Thread(
+            target=_loop_worker, args=(executar, None, TIPOS_RESTAURACAO), name=f"restauracao-job-{i}", daemon=True
+        ))
+    for worker in _workers:
+        worker.start()
+
+
+def parar_workers():
+    """
+    Para de reservar jobs e devolve para a fila os jobs deste processo,
+    que continuam do checkpoint no próximo início.
+    """
+    _parar.set()
+    _novo_job.set()
+
+    with SessionLocal() as db:
+        db.execute(
+            update(ImportJob)
+            .where(ImportJob.status == "processing", ImportJob.worker == WORKER_ID)
+            .values(status="queued", worker=None)
+        )
+        db.commit()
+
+    _workers.clear()
@@ -0,0 +1,310 @@
+import time
+import pandas as pd
+from typing import Any, List, Dict, Optional, Tuple, Sequence
+from sqlalchemy import select, insert, func, tuple_, and_, or_
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from models import Documento, Arquivo
+from .transformer import (
+    preparar_para_insercao_documentos,
+    preparar_para_insercao_arquivos,
+)
+from .lote_adaptativo import TamanhoLoteAdaptativo, limites_padrao
+
+# Tamanho do primeiro lote (os seguintes são ajustados por TamanhoLoteAdaptativo)
+BATCH_SIZE = 500
+
+
+# Máximo de chaves por consulta IN (limite de parâmetros do SQLite)
+_MAX_CHAVES_POR_CONSULTA = 900
+
+CHAVE_DOCUMENTO = ("numero_doc", "versao", "iteracao")
+CHAVE_ARQUIVO = ("nome_hex", "nome_original")
+
+
+def _normalizar_chave(valores) -> Tuple:
+    """
+    Chave comparável entre valores do lote e do banco.
+
+    O banco devolve as colunas com o próprio tipo (ex: numero_doc 4499 lido
+    de um CSV volta como '4499'), então as chaves são comparadas como texto.
+    """
+    return tuple(None if v is None else str(v) for v in valores)
+
+
+def _filtro_chaves(tabela, colunas: Sequence[str], chaves: Sequence[Tuple]):
+    """
+    Condição SQL que casa qualquer uma das chaves compostas.
+
+    Chaves completas usam um único IN de tuplas; chaves com algum valor
+    nulo são comparadas com IS NULL, como na consulta por registro.
+    """
+    cols = [tabela.c[c] for c in colunas]
+    completas = [k for k in chaves if None not in k]
+    parciais = [k for k in chaves if None in k]
+
+    condicoes = []
+    if completas:
+        condicoes.append(tuple_(*cols).in_(completas))
+    for chave in parciais:
+        condicoes.append(and_(*[
+            col.is_(None) if valor is None else col == valor
+            for col, valor in zip(cols, chave)
+        ]))
+
+    return or_(*condicoes)
+
+
+def _buscar_chaves(db: Session, tabela, colunas: Sequence[str], chaves: Sequence[Tuple]) -> Dict[Tuple, int]:
+    """Retorna {chave: id} das chaves que já existem na tabela."""
+    existentes: Dict[Tuple, int] = {}
+    chaves = list(chaves)
+
+    for i in range(0, len(chaves), _MAX_CHAVES_POR_CONSULTA):
+        parte = chaves[i:i + _MAX_CHAVES_POR_CONSULTA]
+        consulta = select(tabela.c.id, *[tabela.c[c] for c in colunas]).where(
+            _filtro_chaves(tabela, colunas, parte)
+        )
+        for row in db.execute(consulta):
+            existentes.setdefault(_normalizar_chave(row[1:]), row[0])
+
+    return existentes
+
+
+def _novos_por_chave(registros: List[Dict], colunas: Sequence[str], existentes: Dict[Tuple, int], chave_de=None) -> Dict[Tuple, Dict]:
+    """Filtra os registros cuja chave ainda não existe, mantendo o primeiro de cada chave no lote."""
+    chave_de = chave_de or (lambda r: r)
+    novos: Dict[Tuple, Dict] = {}
+
+    for registro in registros:
+        origem = chave_de(registro)
+        chave = _normalizar_chave(origem.get(c) for c in colunas)
+        if chave not in existentes and chave not in novos:
+            novos[chave] = registro
+
+    return novos
+
+
+def _insert_ignorando_duplicados(db: Session, tabela):
+    """INSERT que ignora violações dos índices únicos (SQLite e PostgreSQL)."""
+    dialeto = db.get_bind().dialect.name
+
+    if dialeto == "postgresql":
+        return postgresql_insert(tabela).on_conflict_do_nothing()
+    if dialeto == "sqlite":
+        return sqlite_insert(tabela).on_conflict_do_nothing()
+    return insert(tabela)
+
+
+def _inserir_em_massa(db: Session, tabela, registros: List[Dict]) -> int:
+    """Insere os registros em um executemany e retorna quantos foram de fato inseridos."""
+    if not registros:
+        return 0
+
+    dialect = db.get_bind().dialect
+    stmt = _insert_ignorando_duplicados(db, tabela)
+
+    if dialect.insert_executemany_returning:
+        return len(db.execute(stmt.returning(tabela.c.id), registros).all())
+
+    resultado = db.execute(stmt, registros)
+    return resultado.rowcount if dialect.supports_sane_multi_rowcount else len(registros)
+
+
+def _inserir_documentos(db: Session, novos: Dict[Tuple, Dict]) -> Dict[Tuple, int]:
+    """
+    Insere os documentos em um único statement e retorna {chave: id} dos inseridos.
+
+    Usa RETURNING quando o driver suporta executemany com retorno. Caso
+    contrário (SQLite < 3.35), reserva uma faixa de ids a partir do maior id
+    atual e confirma depois quais ids ficaram com cada chave.
+    """
+    tabela = Documento.__table__
+    colunas_chave = [tabela.c[c] for c in CHAVE_DOCUMENTO]
+    dialect = db.get_bind().dialect
+    stmt = _insert_ignorando_duplicados(db, tabela)
+
+    if dialect.insert_executemany_returning:
+        registros = [item["documento"] for item in novos.values()]
+        linhas = db.execute(stmt.returning(tabela.c.id, *colunas_chave), registros).all()
+        return {_normalizar_chave(linha[1:]): linha[0] for linha in linhas}
+
+    # Faixa de ids pré-alocada: o conflito de id com outra importação
+    # concorrente é ignorado pelo ON CONFLICT e filtrado na confirmação abaixo
+    primeiro_id = (db.execute(select(func.max(tabela.c.id))).scalar() or 0) + 1
+    esperados = {primeiro_id + i: chave for i, chave in enumerate(novos)}
+    registros = [
+        {"id": id_, **novos[chave]["documento"]}
+        for id_, chave in esperados.items()
+    ]
+    db.execute(stmt, registros)
+
+    linhas = db.execute(
+        select(tabela.c.id, *colunas_chave).where(
+            tabela.c.id.between(primeiro_id, primeiro_id + len(registros) - 1)
+        )
+    ).all()
+    return {
+        esperados[linha[0]]: linha[0]
+        for linha in linhas
+        if _normalizar_chave(linha[1:]) == esperados[linha[0]]
+    }
+
+
+def processar_lote_documentos(dados_lote: List[Dict], db: Session) -> int:
+    """Processa um lote de documentos e retorna quantidade inserida."""
+    chaves = {tuple(item["documento"].get(c) for c in CHAVE_DOCUMENTO) for item in dados_lote}
+    existentes = _buscar_chaves(db, Documento.__table__, CHAVE_DOCUMENTO, chaves)
+    novos = _novos_por_chave(dados_lote, CHAVE_DOCUMENTO, existentes, lambda item: item["documento"])
+
+    if not novos:
+        return 0
+
+    ids = _inserir_documentos(db, novos)
+
+    # Arquivos dos documentos inseridos, já com o documento_id, em um único executemany
+    arquivos = [
+        {"documento_id": ids[chave], **item["arquivo"]}
+        for chave, item in novos.items()
+        if item["arquivo"]["nome_arquivo"] and chave in ids
+    ]
+    _inserir_em_massa(db, Arquivo.__table__, arquivos)
+
+    return len(ids)
+
+
+def processar_lote_arquivos(dados_lote: List[Dict], db: Session) -> int:
+    """Processa um lote de arquivos e retorna quantidade inserida."""
+    tabela = Arquivo.__table__
+
+    chaves = {tuple(item.get(c) for c in CHAVE_ARQUIVO) for item in dados_lote}
+    existentes = _buscar_chaves(db, tabela, CHAVE_ARQUIVO, chaves)
+    novos = _novos_por_chave(dados_lote, CHAVE_ARQUIVO, existentes)
+
+    return _inserir_em_massa(db, tabela, list(novos.values()))
+
+
+class CarregadorORM:
+    """
+    Carregador padrão (SQLite e demais bancos): insere cada lote em
+    sub-lotes com commit a cada sub-lote. O tamanho do sub-lote começa em
+    BATCH_SIZE e é ajustado pela duração de cada transação
+    (`TamanhoLoteAdaptativo`).
+    """
+
+    # Cada `carregar` termina com os registros gravados (serve de checkpoint)
+    confirma_por_lote = True
+
+    def __init__(self, db: Session, tipo: str, tamanho_inicial: Optional[int] = None):
+        self.db = db
+        self.tipo = tipo
+        self.lote = TamanhoLoteAdaptativo(
+            **limites_padrao(db.get_bind().dialect.name),
+            inicial=tamanho_inicial or BATCH_SIZE,
+        )
+
+    @property
+    def tamanho_lote(self) -> int:
+        return self.lote.tamanho
+
+    def metricas(self) -> Dict[str, Any]:
+        return self.lote.metricas()
+
+    def _gravar_parte(self, parte: pd.DataFrame) -> int:
+        """Grava um sub-lote (sem commit) e retorna a quantidade inserida."""
+        if self.tipo == "documentos":
+            lotes = preparar_para_insercao_documentos(parte, len(parte))
+            return sum(processar_lote_documentos(lote, self.db) for lote in lotes)
+        lotes = preparar_para_insercao_arquivos(parte, len(parte))
+        return sum(processar_lote_arquivos(lote, self.db) for lote in lotes)
+
+    def carregar(self, df_transformado: pd.DataFrame) -> int:
+        """Insere um lote transformado e retorna a quantidade inserida."""
+        if self.tipo not in ("documentos", "arquivos"):
+            return 0
+
+        registros_inseridos = 0
+        inicio = 0
+
+        while inicio < len(df_transformado):
+            parte = df_transformado.iloc[inicio:inicio + self.lote.tamanho]
+            inicio += len(parte)
+
+            # Mede a transação inteira: é o tempo em que os locks ficam presos
+            inicio_transacao = time.perf_counter()
+            registros_inseridos += self._gravar_parte(parte)
+
+            # Commit do lote
+            self.db.commit()
+            self.lote.registrar(len(parte), time.perf_counter() - inicio_transacao)
+
+        return registros_inseridos
+
+    def finalizar(self) -> int:
+        """Nada pendente: cada lote já foi gravado em `carregar`."""
+        return 0
+
+    def fechar(self):
+        """Nada a liberar (a sessão é de quem criou o carregador)."""
+
+
+def criar_carregador(
+    db: Session,
+    tipo: str,
+    tamanho_lote: Optional[int] = None,
+    incremental: bool = False,
+    processos: int = 0,
+):
+    """
+    Escolhe o carregador da importação pelo banco da sessão.
+
+    PostgreSQL usa COPY + merge em staging (`CarregadorPostgresCopy`); os
+    demais bancos usam inserts em lote pelo SQLAlchemy (`CarregadorORM`).
+    Os dois expõem `carregar(df) -> int` por lote, `finalizar() -> int`
+    ao fim da importação, `fechar()` (sempre chamado, inclusive em caso de
+    erro), `confirma_por_lote`, que indica se cada lote já fica gravado ao
+    fim de `carregar`, e `metricas()` com o tamanho de lote e a vazão.
+
+    Com `incremental`, usa `CarregadorIncremental` em qualquer banco: só
+    os registros novos e alterados são gravados. Com `processos` > 1, usa
+    `CarregadorParalelo`: os lotes são particionados pela chave natural
+    entre processos de carga, cada um com o carregador do banco.
+
+    Args:
+        tamanho_lote: Tamanho inicial do lote adaptativo (ex: o último
+            usado, ao retomar um job)
+        incremental: Comparar com as impressões da última importação
+        processos: Processos de carga paralela (ver `processos_carga_paralela`)
+    """
+    if incremental:
+        from .incremental import CarregadorIncremental
+        return CarregadorIncremental(db, tipo, tamanho_lote)
+    if processos > 1 and tipo in ("documentos", "arquivos"):
+        from .carga_paralela import CarregadorParalelo
+        return CarregadorParalelo(tipo, processos)
+    if tipo in ("documentos", "arquivos") and db.get_bind().dialect.name == "postgresql":
+        from .loader_postgres import CarregadorPostgresCopy
+        return CarregadorPostgresCopy(db, tipo, tamanho_lote)
+    return CarregadorORM(db, tipo, tamanho_lote)
+
+
+def carregar_dataframe(df_transformado: pd.DataFrame, tipo: str, db: Session, incremental: bool = False) -> int:
+    """
+    Insere um DataFrame já transformado com o carregador adequado ao banco.
+
+    Args:
+        df_transformado: Saída de `transformar_dados`
+        tipo: 'documentos' ou 'arquivos' (outros tipos são ignorados)
+        db: Sessão do banco
+        incremental: Gravar só registros novos e alterados (ver `etl.incremental`)
+
+    Returns:
+        Quantidade de registros inseridos
+    """
+    carregador = criar_carregador(db, tipo, incremental=incremental)
+    try:
+        return carregador.carregar(df_transformado) + carregador.finalizar()
+    finally:
+        carregador.fechar()
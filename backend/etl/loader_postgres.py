@@ -0,0 +1,230 @@
+"""
+Carga em massa para PostgreSQL: COPY em tabela de staging + merge.
+
+Os lotes transformados são gravados em transações do tamanho escolhido
+por `TamanhoLoteAdaptativo`, como no carregador ORM: em cada uma, as
+linhas vão com `COPY FROM STDIN` para uma tabela UNLOGGED, um INSERT ...
+SELECT deduplica pela chave natural e grava em `documentos`/`arquivos`,
+ignorando o que já existe, e a staging é descartada antes do commit. Os
+locks ficam presos só durante uma transação, e não durante a importação
+inteira; em caso de erro, o rollback também descarta a staging.
+"""
+import io
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from models import Documento, Arquivo
+from .loader import BATCH_SIZE, CHAVE_DOCUMENTO, CHAVE_ARQUIVO
+from .lote_adaptativo import TamanhoLoteAdaptativo, limites_padrao
+from .transformer import CAMPOS_DOCUMENTO, CAMPOS_ARQUIVO_DOCUMENTO, CAMPOS_ARQUIVO
+
+# Marcador de nulo no CSV do COPY (string vazia continua sendo string vazia)
+_NULO_COPY = r"\N"
+
+
+def _lista(colunas, prefixo: str = "") -> str:
+    return ", ".join(f"{prefixo}{c}" for c in colunas)
+
+
+def _condicao_chave(chave, a: str, b: str) -> str:
+    """Igualdade da chave natural (usa os índices únicos)."""
+    return " AND ".join(f"{a}.{c} = {b}.{c}" for c in chave)
+
+
+def _condicao_chave_nula(chave, a: str, b: str) -> str:
+    """Chave com algum valor nulo: comparada com IS NOT DISTINCT FROM, como no carregador ORM."""
+    return " AND ".join(f"{a}.{c} IS NOT DISTINCT FROM {b}.{c}" for c in chave)
+
+
+def _staging_inexistentes(stg: str, tabela: str, chave) -> str:
+    """
+    Subconsulta com as linhas da staging cuja chave ainda não existe na tabela.
+
+    As linhas com a chave completa usam só a igualdade, que o planner
+    resolve com o índice único (ou um anti-join por hash). A comparação
+    nula, que não usa índice, fica num ramo à parte só para as linhas com
+    alguma parte da chave nula.
+    """
+    completa = " AND ".join(f"s.{c} IS NOT NULL" for c in chave)
+    algum_nulo = " OR ".join(f"s.{c} IS NULL" for c in chave)
+    return f"""(
+        SELECT s.* FROM {stg} s
+        WHERE {completa}
+          AND NOT EXISTS (SELECT 1 FROM {tabela} t WHERE {_condicao_chave(chave, 't', 's')})
+        UNION ALL
+        SELECT s.* FROM {stg} s
+        WHERE ({algum_nulo})
+          AND NOT EXISTS (SELECT 1 FROM {tabela} t WHERE {_condicao_chave_nula(chave, 't', 's')})
+    )"""
+
+
+class CarregadorPostgresCopy:
+    """
+    Carregador de uma importação via COPY + merge.
+
+    `carregar` grava o lote em sub-lotes (COPY + merge + commit cada um),
+    com o tamanho ajustado pela duração de cada transação.
+    """
+
+    # Cada `carregar` termina com os registros gravados (serve de checkpoint)
+    confirma_por_lote = True
+
+    def __init__(self, db: Session, tipo: str, tamanho_inicial: Optional[int] = None):
+        self.db = db
+        self.tipo = tipo
+        self.tabela_staging = f"stg_importacao_{uuid.uuid4().hex[:12]}"
+        self.ordem = 0
+        self.lote = TamanhoLoteAdaptativo(
+            **limites_padrao(db.get_bind().dialect.name),
+            inicial=tamanho_inicial or BATCH_SIZE,
+        )
+
+        if tipo == "documentos":
+            self.colunas = [(c, Documento.__table__.c[c]) for c in CAMPOS_DOCUMENTO]
+            self.colunas += [(c, Arquivo.__table__.c[c]) for c in CAMPOS_ARQUIVO_DOCUMENTO]
+        else:
+            self.colunas = [(c, Arquivo.__table__.c[c]) for c in CAMPOS_ARQUIVO]
+
+    @property
+    def tamanho_lote(self) -> int:
+        return self.lote.tamanho
+
+    def metricas(self) -> Dict[str, Any]:
+        return self.lote.metricas()
+
+    @property
+    def nomes(self) -> List[str]:
+        return [nome for nome, _ in self.colunas]
+
+    def _criar_staging(self):
+        dialect = self.db.get_bind().dialect
+        definicoes = ", ".join(
+            f"{nome} {coluna.type.compile(dialect=dialect)}" for nome, coluna in self.colunas
+        )
+        self.db.execute(text(
+            f"CREATE UNLOGGED TABLE {self.tabela_staging} (ordem BIGINT, {definicoes})"
+        ))
+
+    def _para_csv(self, df: pd.DataFrame) -> io.StringIO:
+        """Monta o CSV do COPY com as colunas da staging, na ordem da importação."""
+        dados = {"ordem": range(self.ordem, self.ordem + len(df))}
+        for nome in self.nomes:
+            if nome in df.columns:
+                dados[nome] = df[nome].to_numpy()
+            elif nome == "nome_arquivo" and "nome_original" in df.columns:
+                dados[nome] = df["nome_original"].to_numpy()
+            else:
+                dados[nome] = None
+
+        buffer = io.StringIO()
+        pd.DataFrame(dados).to_csv(buffer, index=False, header=False, na_rep=_NULO_COPY)
+        buffer.seek(0)
+        return buffer
+
+    def _copiar(self, df: pd.DataFrame):
+        """Copia as linhas para a staging."""
+        buffer = self._para_csv(df)
+        self.ordem += len(df)
+
+        conexao = self.db.connection().connection.driver_connection
+        with conexao.cursor() as cursor:
+            cursor.copy_expert(
+                f"COPY {self.tabela_staging} (ordem, {_lista(self.nomes)}) "
+                f"FROM STDIN WITH (FORMAT csv, NULL '{_NULO_COPY}')",
+                buffer,
+            )
+
+    def _gravar_parte(self, parte: pd.DataFrame) -> int:
+        """Grava um sub-lote pela staging (sem commit) e retorna a quantidade inserida."""
+        self._criar_staging()
+        self._copiar(parte)
+
+        self.db.execute(text(f"ANALYZE {self.tabela_staging}"))
+        if self.tipo == "documentos":
+            inseridos = self._merge_documentos()
+        else:
+            inseridos = self._merge_arquivos()
+
+        self.db.execute(text(f"DROP TABLE {self.tabela_staging}"))
+        return inseridos
+
+    def carregar(self, df_transformado: pd.DataFrame) -> int:
+        """Grava um lote transformado e retorna a quantidade inserida."""
+        registros_inseridos = 0
+        inicio = 0
+
+        while inicio < len(df_transformado):
+            parte = df_transformado.iloc[inicio:inicio + self.lote.tamanho]
+            inicio += len(parte)
+
+            # Mede a transação inteira (COPY, merge e commit): é o tempo em que os locks ficam presos
+            inicio_transacao = time.perf_counter()
+            registros_inseridos += self._gravar_parte(parte)
+            self.db.commit()
+            self.lote.registrar(len(parte), time.perf_counter() - inicio_transacao)
+
+        return registros_inseridos
+
+    def _merge_documentos(self) -> int:
+        """
+        Grava os documentos novos e os arquivos ligados a eles.
+
+        Os ids são reservados na sequence antes do INSERT para que os
+        arquivos possam ser ligados ao documento sem reconsultar a chave.
+        """
+        stg = self.tabela_staging
+        selecionados = f"{stg}_sel"
+        chave = _lista(CHAVE_DOCUMENTO, "s.")
+
+        self.db.execute(text(f"""
+            CREATE UNLOGGED TABLE {selecionados} AS
+            SELECT nextval(pg_get_serial_sequence('documentos', 'id')) AS novo_id, x.*
+            FROM (
+                SELECT DISTINCT ON ({chave}) s.*
+                FROM {_staging_inexistentes(stg, 'documentos', CHAVE_DOCUMENTO)} s
+                ORDER BY {chave}, s.ordem
+            ) x
+        """))
+
+        inseridos = self.db.execute(text(f"""
+            INSERT INTO documentos (id, {_lista(CAMPOS_DOCUMENTO)})
+            SELECT novo_id, {_lista(CAMPOS_DOCUMENTO)} FROM {selecionados}
+            ON CONFLICT DO NOTHING
+        """)).rowcount
+
+        # Só os documentos que ficaram com o id reservado (sem conflito concorrente)
+        self.db.execute(text(f"""
+            INSERT INTO arquivos (documento_id, {_lista(CAMPOS_ARQUIVO_DOCUMENTO)})
+            SELECT s.novo_id, {_lista(CAMPOS_ARQUIVO_DOCUMENTO, 's.')}
+            FROM {selecionados} s
+            JOIN documentos d ON d.id = s.novo_id
+            WHERE s.nome_arquivo IS NOT NULL AND s.nome_arquivo <> ''
+            ON CONFLICT DO NOTHING
+        """))
+
+        self.db.execute(text(f"DROP TABLE {selecionados}"))
+        return inseridos
+
+    def _merge_arquivos(self) -> int:
+        stg = self.tabela_staging
+        chave = _lista(CHAVE_ARQUIVO, "s.")
+
+        return self.db.execute(text(f"""
+            INSERT INTO arquivos ({_lista(CAMPOS_ARQUIVO)})
+            SELECT DISTINCT ON ({chave}) {_lista(CAMPOS_ARQUIVO, 's.')}
+            FROM {_staging_inexistentes(stg, 'arquivos', CHAVE_ARQUIVO)} s
+            ORDER BY {chave}, s.ordem
+            ON CONFLICT DO NOTHING
+        """)).rowcount
+
+    def finalizar(self) -> int:
+        """Nada pendente: cada lote já foi gravado em `carregar`."""
+        return 0
+
+    def fechar(self):
+        """Nada a liberar: em caso de erro, o rollback da sessão descarta a staging."""
@@ -0,0 +1,110 @@
+"""
+Tamanho adaptativo dos lotes gravados no banco.
+
+Cada lote é uma transação: lotes maiores diminuem o custo fixo de cada
+commit (muito vantajoso no SQLite local), mas seguram locks por mais tempo
+(ruim num PostgreSQL remoto sob carga). Em vez de um tamanho fixo, o
+tamanho é recalculado após cada lote a partir da vazão medida (registros/s),
+buscando que a transação dure `tempo_alvo_s`, sempre entre os limites
+configurados.
+"""
+import os
+from typing import Any, Dict, Optional
+
+# Limites por banco: SQLite local aguenta lotes bem maiores
+_PADROES = {
+    "sqlite": {"minimo": 500, "maximo": 20_000, "tempo_alvo_s": 0.5},
+    "padrao": {"minimo": 100, "maximo": 5_000, "tempo_alvo_s": 0.2},
+}
+
+# Peso da última medida na média da vazão (suaviza oscilações pontuais)
+_PESO_MEDIDA = 0.5
+
+# Maior variação do tamanho entre um lote e o seguinte
+_FATOR_MAXIMO = 2.0
+
+
+def limites_padrao(dialeto: str) -> Dict[str, Any]:
+    """
+    Limites do lote adaptativo para o banco, com ajuste por variável de ambiente
+    (ETL_LOTE_MIN, ETL_LOTE_MAX e ETL_LOTE_TEMPO_ALVO_MS).
+
+    Args:
+        dialeto: Nome do dialeto do SQLAlchemy (ex: 'sqlite', 'postgresql')
+
+    Returns:
+        Dict com minimo, maximo e tempo_alvo_s
+    """
+    limites = dict(_PADROES.get(dialeto, _PADROES["padrao"]))
+    if os.getenv("ETL_LOTE_MIN"):
+        limites["minimo"] = int(os.environ["ETL_LOTE_MIN"])
+    if os.getenv("ETL_LOTE_MAX"):
+        limites["maximo"] = int(os.environ["ETL_LOTE_MAX"])
+    if os.getenv("ETL_LOTE_TEMPO_ALVO_MS"):
+        limites["tempo_alvo_s"] = int(os.environ["ETL_LOTE_TEMPO_ALVO_MS"]) / 1000
+    return limites
+
+
+class TamanhoLoteAdaptativo:
+    """
+    Escolhe o tamanho do próximo lote pela vazão dos anteriores.
+
+    Uso: gravar `tamanho` registros, medir a duração da transação (até o
+    commit) e chamar `registrar`.
+    """
+
+    def __init__(self, minimo: int, maximo: int, tempo_alvo_s: float, inicial: Optional[int] = None):
+        if not 0 < minimo <= maximo:
+            raise ValueError(f"Limites de lote inválidos: mínimo {minimo}, máximo {maximo}")
+        if tempo_alvo_s <= 0:
+            raise ValueError("Tempo alvo do lote deve ser positivo")
+
+        self.minimo = minimo
+        self.maximo = maximo
+        self.tempo_alvo_s = tempo_alvo_s
+        self.tamanho = self._limitar(inicial if inicial is not None else minimo)
+        self.registros_por_s: Optional[float] = None
+        self.ultima_duracao_s: Optional[float] = None
+
+    def _limitar(self, tamanho: float) -> int:
+        return int(min(max(tamanho, self.minimo), self.maximo))
+
+    def registrar(self, registros: int, duracao_s: float) -> int:
+        """
+        Registra a gravação de um lote e recalcula o tamanho do próximo.
+
+        Lotes menores que o tamanho pedido (fim do arquivo) só entram na
+        vazão; o tamanho não cresce por causa deles.
+
+        Args:
+            registros: Registros gravados no lote
+            duracao_s: Duração da transação do lote, até o fim do commit
+
+        Returns:
+            Tamanho do próximo lote
+        """
+        if registros <= 0 or duracao_s <= 0:
+            return self.tamanho
+
+        self.ultima_duracao_s = duracao_s
+        vazao = registros / duracao_s
+        if self.registros_por_s is None:
+            self.registros_por_s = vazao
+        else:
+            self.registros_por_s = _PESO_MEDIDA * vazao + (1 - _PESO_MEDIDA) * self.registros_por_s
+
+        ideal = self.registros_por_s * self.tempo_alvo_s
+        ideal = min(max(ideal, self.tamanho / _FATOR_MAXIMO), self.tamanho * _FATOR_MAXIMO)
+        if registros < self.tamanho:
+            ideal = min(ideal, self.tamanho)
+
+        self.tamanho = self._limitar(ideal)
+        return self.tamanho
+
+    def metricas(self) -> Dict[str, Any]:
+        """Tamanho atual e últimas medidas, para o progresso da importação."""
+        return {
+            "tamanho_lote": self.tamanho,
+            "registros_por_s": round(self.registros_por_s, 1) if self.registros_por_s else None,
+            "duracao_lote_ms": round(self.ultima_duracao_s * 1000, 1) if self.ultima_duracao_s else None,
+        }
@@ -0,0 +1,124 @@
+"""
+Manifesto da restauração, gravado na pasta de destino.
+
+Cada arquivo restaurado gera uma linha JSON (hex, origem com tamanho e
+mtime, destino, status) acrescentada assim que a cópia termina: se a
+restauração parar no meio, o manifesto já tem tudo o que foi copiado.
+Ao repetir a restauração para a mesma pasta, os arquivos que continuam
+corretos no lugar são pulados e só o que falta ou mudou é copiado.
+"""
+import json
+import os
+import threading
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from .cache import calcular_sha256
+
+NOME_MANIFESTO = ".etl_restauracao.jsonl"
+
+# Como confirmar que um arquivo já restaurado continua correto
+VERIFICACOES = ("tamanho", "checksum", "nenhuma")
+
+
+class ManifestoRestauracao:
+    """
+    Manifesto JSONL de uma pasta de destino (uma linha por cópia; vale a
+    última de cada destino).
+
+    Verificação 'tamanho': o arquivo está em dia se a origem tem o mesmo
+    tamanho e mtime registrados e o destino o mesmo tamanho e mtime de
+    quando foi copiado. 'checksum': além disso, o SHA-256 do destino
+    confere com o registrado (calculado na cópia, o que lê cada arquivo
+    copiado mais uma vez). 'nenhuma': tudo é copiado de novo.
+
+    Uso: `with ManifestoRestauracao(pasta, verificacao) as manifesto`; os
+    métodos podem ser chamados por várias threads de cópia.
+    """
+
+    def __init__(self, pasta: str, verificacao: str = "tamanho"):
+        if verificacao not in VERIFICACOES:
+            raise ValueError(f"Verificação inválida: {verificacao}. Use uma de: {', '.join(VERIFICACOES)}")
+
+        self.caminho = os.path.join(pasta, NOME_MANIFESTO)
+        self.verificacao = verificacao
+        self.entradas: Dict[str, Dict[str, Any]] = {}
+        self._arquivo = None
+        self._trava = threading.Lock()
+
+    def __enter__(self) -> "ManifestoRestauracao":
+        if os.path.exists(self.caminho):
+            with open(self.caminho, encoding="utf-8") as f:
+                for linha in f:
+                    try:
+                        entrada = json.loads(linha)
+                        self.entradas[entrada["destino"]] = entrada
+                    except (ValueError, KeyError, TypeError):
+                        # Linha truncada (restauração interrompida no meio da gravação)
+                        continue
+        self._arquivo = open(self.caminho, "a", encoding="utf-8")
+        return self
+
+    def __exit__(self, *exc):
+        self._arquivo.close()
+        self._compactar()
+
+    def _compactar(self):
+        """Reescreve o manifesto com uma linha por destino."""
+        temporario = self.caminho + ".tmp"
+        with open(temporario, "w", encoding="utf-8") as f:
+            for entrada in self.entradas.values():
+                f.write(json.dumps(entrada, ensure_ascii=False) + "\n")
+        os.replace(temporario, self.caminho)
+
+    def em_dia(self, plano: Dict[str, Any], stat_origem: os.stat_result) -> bool:
+        """Indica se o destino do plano já tem a cópia correta da origem."""
+        if self.verificacao == "nenhuma":
+            return False
+
+        entrada = self.entradas.get(plano["destino"])
+        if (
+            not entrada
+            or entrada["status"] != "copiado"
+            or entrada["origem"] != plano["origem"]
+            or entrada["tamanho"] != stat_origem.st_size
+            or entrada["mtime_ns"] != stat_origem.st_mtime_ns
+        ):
+            return False
+
+        try:
+            stat_destino = os.stat(plano["destino"])
+        except OSError:
+            return False
+        if stat_destino.st_size != entrada["tamanho"] or stat_destino.st_mtime_ns != entrada["destino_mtime_ns"]:
+            return False
+
+        if self.verificacao == "checksum":
+            return entrada.get("sha256") is not None and calcular_sha256(plano["destino"]) == entrada["sha256"]
+        return True
+
+    def registrar(self, plano: Dict[str, Any], stat_origem: Optional[os.stat_result]):
+        """Acrescenta a linha do arquivo (copiado ou com erro) ao manifesto."""
+        entrada = {
+            "hex": plano.get("nome_hex"),
+            "origem": plano["origem"],
+            "tamanho": stat_origem.st_size if stat_origem else None,
+            "mtime_ns": stat_origem.st_mtime_ns if stat_origem else None,
+            "destino": plano["destino"],
+            "destino_mtime_ns": None,
+            "status": plano["status"],
+            "modo": plano.get("modo"),
+            "sha256": None,
+            "erro": plano.get("erro"),
+            "em": datetime.utcnow().isoformat(),
+        }
+        if plano["status"] == "copiado":
+            entrada["destino_mtime_ns"] = os.stat(plano["destino"]).st_mtime_ns
+            if self.verificacao == "checksum":
+                entrada["sha256"] = calcular_sha256(plano["destino"])
+
+        linha = json.dumps(entrada, ensure_ascii=False) + "\n"
+        with self._trava:
+            self.entradas[plano["destino"]] = entrada
+            self._arquivo.write(linha)
+            self._arquivo.flush()
@@ -0,0 +1,136 @@
+"""
+Pipeline de importação em estágios sobrepostos.
+
+Uma thread de leitura consome os lotes do importador (parse do arquivo),
+threads de transformação aplicam a transformação e quem itera o pipeline
+recebe os lotes transformados, na ordem original, para gravar no banco.
+As filas entre os estágios são limitadas: se o banco ficar para trás, a
+leitura e a transformação esperam (backpressure) em vez de acumular o
+arquivo inteiro em memória.
+"""
+import queue
+import threading
+from typing import Callable, Iterable, Iterator
+
+import pandas as pd
+
+# Threads de transformação (o pandas libera o GIL em boa parte das operações)
+NUM_TRANSFORMADORES = 2
+
+# Lotes em espera entre cada par de estágios
+TAMANHO_FILA = 4
+
+# Intervalo para as threads conferirem se o pipeline foi interrompido
+_INTERVALO_ESPERA = 0.1
+
+_FIM = object()
+
+
+class _Falha:
+    """Erro de um estágio, repassado para quem consome o pipeline."""
+
+    def __init__(self, erro: BaseException):
+        self.erro = erro
+
+
+def transformar_em_pipeline(
+    lotes: Iterable[pd.DataFrame],
+    transformar: Callable[[pd.DataFrame], pd.DataFrame],
+    num_transformadores: int = NUM_TRANSFORMADORES,
+    tamanho_fila: int = TAMANHO_FILA,
+) -> Iterator[pd.DataFrame]:
+    """
+    Lê e transforma os lotes em threads, entregando-os na ordem de leitura.
+
+    A gravação fica com quem itera (um único escritor no banco), enquanto os
+    próximos lotes já estão sendo lidos e transformados. Um erro em qualquer
+    estágio é relançado na iteração; interromper a iteração encerra as threads.
+
+    Args:
+        lotes: Lotes lidos (ex: `importar_arquivo_em_lotes`), consumidos na thread de leitura
+        transformar: Função aplicada a cada lote; chamada em várias threads ao mesmo tempo
+        num_transformadores: Quantidade de threads de transformação
+        tamanho_fila: Lotes em espera entre os estágios
+
+    Returns:
+        Iterator dos lotes transformados
+    """
+    fila_lidos: queue.Queue = queue.Queue(tamanho_fila)
+    fila_transformados: queue.Queue = queue.Queue(tamanho_fila)
+    parar = threading.Event()
+
+    def colocar(fila: queue.Queue, item) -> bool:
+        while not parar.is_set():
+            try:
+                fila.put(item, timeout=_INTERVALO_ESPERA)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def ler():
+        try:
+            for seq, df in enumerate(lotes):
+                if not colocar(fila_lidos, (seq, df)):
+                    return
+        except BaseException as e:
+            colocar(fila_transformados, _Falha(e))
+        finally:
+            for _ in range(num_transformadores):
+                colocar(fila_lidos, _FIM)
+
+    def transformar_lotes():
+        while not parar.is_set():
+            try:
+                item = fila_lidos.get(timeout=_INTERVALO_ESPERA)
+            except queue.Empty:
+                continue
+
+            if item is _FIM:
+                colocar(fila_transformados, _FIM)
+                return
+
+            seq, df = item
+            try:
+                resultado = transformar(df)
+            except BaseException as e:
+                colocar(fila_transformados, _Falha(e))
+                return
+
+            if not colocar(fila_transformados, (seq, resultado)):
+                return
+
+    threads = [threading.Thread(target=ler, name="importacao-leitura", daemon=True)]
+    threads += [
+        threading.Thread(target=transformar_lotes, name=f"importacao-transformacao-{i}", daemon=True)
+        for i in range(num_transformadores)
+    ]
+    for thread in threads:
+        thread.start()
+
+    # Os transformadores terminam fora de ordem: segura os lotes até chegar a vez de cada um
+    pendentes = {}
+    proximo = 0
+    finalizados = 0
+
+    try:
+        while True:
+            if proximo in pendentes:
+                yield pendentes.pop(proximo)
+                proximo += 1
+                continue
+            if finalizados == num_transformadores:
+                break
+
+            item = fila_transformados.get()
+            if item is _FIM:
+                finalizados += 1
+            elif isinstance(item, _Falha):
+                raise item.erro
+            else:
+                seq, df = item
+                pendentes[seq] = df
+    finally:
+        parar.set()
+        for thread in threads:
+            thread.join()
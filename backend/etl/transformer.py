@@ -1,5 +1,7 @@
 import pandas as pd
-from typing import List, Dict, Any, Optional
+import numpy as np
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Callable, Iterator
 from sqlalchemy.orm import Session
 
 from .utils import (
@@ -7,17 +9,80 @@ from .utils import (
     parse_data_windchill,
     construir_caminho_vault,
     extrair_nome_hex_de_caminho,
-    limpar_string
+    limpar_string,
+    FORMATOS_DATA_WINDCHILL,
 )
 
+# Versão das regras de transformação. Incrementar sempre que a saída de
+# `transformar_dados` mudar, para invalidar o cache de importações.
+VERSAO_TRANSFORMER = "2"
 
-def transformar_dados(df: pd.DataFrame, tipo: str) -> pd.DataFrame:
+
+class MemoTransformacao:
+    """
+    Cache limitado (LRU) dos resultados das funções de transformação por valor.
+
+    Uma mesma instância deve ser reutilizada em todos os lotes de uma
+    importação: datas, raízes de vault e tipos se repetem entre lotes, e
+    cada valor distinto é calculado uma única vez.
+    """
+
+    # Tamanho da amostra e fração máxima de valores distintos para memoizar
+    TAMANHO_AMOSTRA = 1_000
+    MAX_FRACAO_DISTINTOS = 0.2
+
+    def __init__(self, max_itens: int = 100_000):
+        self.max_itens = max_itens
+        self._caches: Dict[str, "OrderedDict[Any, Any]"] = {}
+        self.acertos = 0
+        self.calculados = 0
+
+    def compensa(self, serie: pd.Series) -> bool:
+        """
+        Indica se a coluna repete valores o bastante para valer a memoização.
+
+        Colunas quase únicas (ex: nome hex) são mais rápidas na forma vetorizada.
+        """
+        amostra = serie.head(self.TAMANHO_AMOSTRA)
+        return amostra.nunique(dropna=True) <= max(1, len(amostra) * self.MAX_FRACAO_DISTINTOS)
+
+    def aplicar(self, serie: pd.Series, funcao: Callable[[Any], Any]) -> pd.Series:
+        """
+        Aplica `funcao` uma vez por valor distinto da série e espalha o resultado.
+
+        Valores nulos resultam em None sem chamar a função.
+        """
+        codigos, unicos = pd.factorize(serie)
+        cache = self._caches.setdefault(funcao.__qualname__, OrderedDict())
+
+        resultados = []
+        for valor in unicos:
+            if valor in cache:
+                cache.move_to_end(valor)
+                self.acertos += 1
+            else:
+                cache[valor] = funcao(valor)
+                self.calculados += 1
+                if len(cache) > self.max_itens:
+                    cache.popitem(last=False)
+            resultados.append(cache[valor])
+
+        # O código -1 (nulo) aponta para o None acrescentado no fim
+        valores = np.array(resultados + [None], dtype=object)[codigos]
+        return pd.Series(valores, index=serie.index, dtype=object)
+
+
+def transformar_dados(df: pd.DataFrame, tipo: str, memo: Optional[MemoTransformacao] = None) -> pd.DataFrame:
     """
     Aplica transformações nos dados conforme o tipo.
 
     Args:
         df: DataFrame com dados brutos
         tipo: 'documentos' ou 'arquivos'
+        memo: Se informado, as conversões célula a célula (datas, nome hex,
+            caminho do vault) são feitas uma vez por valor distinto, com os
+            resultados guardados no memo para os próximos lotes. Caso
+            contrário, usa as versões vetorizadas.
 
     Returns:
         DataFrame transformado
@@ -25,14 +90,14 @@ def transformar_dados(df: pd.DataFrame, tipo: str) -> pd.DataFrame:
     df = df.copy()
 
     if tipo == "documentos":
-        df = _transformar_documentos(df)
+        df = _transformar_documentos(df, memo)
     elif tipo == "arquivos":
-        df = _transformar_arquivos(df)
+        df = _transformar_arquivos(df, memo)
 
     return df
 
 
-def _transformar_documentos(df: pd.DataFrame) -> pd.DataFrame:
+def _transformar_documentos(df: pd.DataFrame, memo: Optional[MemoTransformacao] = None) -> pd.DataFrame:
     """Transforma dados de documentos."""
 
     # Mapeamento de colunas
@@ -58,11 +123,11 @@ def _transformar_documentos(df: pd.DataFrame) -> pd.DataFrame:
     # Converte datas
     for col in ["data_criacao", "data_modificacao"]:
         if col in df.columns:
-            df[col] = df[col].apply(lambda x: parse_data_windchill(str(x)) if pd.notna(x) else None)
+            df[col] = converter_datas(df[col], memo)
 
     # Extrai nome_hex do caminho se disponível
     if "caminho_completo_estimado" in df.columns:
-        df["nome_hex"] = df["caminho_completo_estimado"].apply(extrair_nome_hex_de_caminho)
+        df["nome_hex"] = extrair_nome_hex_de_caminhos(df["caminho_completo_estimado"], memo)
 
     # Converte iteracao para int
     if "iteracao" in df.columns:
@@ -75,7 +140,7 @@ def _transformar_documentos(df: pd.DataFrame) -> pd.DataFrame:
     return df
 
 
-def _transformar_arquivos(df: pd.DataFrame) -> pd.DataFrame:
+def _transformar_arquivos(df: pd.DataFrame, memo: Optional[MemoTransformacao] = None) -> pd.DataFrame:
     """Transforma dados de arquivos CAD."""
 
     # Mapeamento de colunas
@@ -109,22 +174,131 @@ def _transformar_arquivos(df: pd.DataFrame) -> pd.DataFrame:
 
     # Limpa nome_hex
     if "nome_hex" in df.columns:
-        df["nome_hex"] = df["nome_hex"].apply(lambda x: limpar_string(str(x)).upper() if pd.notna(x) else None)
+        df["nome_hex"] = limpar_strings(df["nome_hex"], memo).str.upper()
 
     # Reconstrói caminho se necessário
     if "caminho_completo_estimado" not in df.columns or df["caminho_completo_estimado"].isna().all():
         if "caminho_raiz_vault" in df.columns and "nome_hex" in df.columns:
-            df["caminho_completo_estimado"] = df.apply(
-                lambda row: reconstruir_caminho_vault(
-                    row.get("caminho_raiz_vault", ""),
-                    row.get("nome_hex", "")
-                ) if pd.notna(row.get("nome_hex")) else None,
-                axis=1
+            df["caminho_completo_estimado"] = reconstruir_caminhos_vault(
+                df["caminho_raiz_vault"],
+                df["nome_hex"],
+                memo
             )
 
     return df
 
 
+# === VERSÕES POR COLUNA DAS FUNÇÕES DE utils ===
+# Sem memo, usam operações vetorizadas; com memo, chamam a função de utils
+# uma vez por valor distinto.
+
+def converter_datas(serie: pd.Series, memo: Optional[MemoTransformacao] = None) -> pd.Series:
+    """
+    Versão por coluna de `parse_data_windchill`.
+
+    Na forma vetorizada, cada formato de FORMATOS_DATA_WINDCHILL é aplicado
+    de uma vez apenas às células que os formatos anteriores não conseguiram
+    converter. Valores inválidos ou vazios viram NaT. O resultado fica em
+    microssegundos, e não nanossegundos, para aceitar datas como
+    '31/12/9999' (o "sem data de término" do Windchill), que
+    `parse_data_windchill` também aceita.
+    """
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        return serie
+
+    if memo is not None and memo.compensa(serie):
+        return pd.to_datetime(memo.aplicar(serie, _parse_data_celula)).astype("datetime64[us]")
+
+    texto = serie.astype("string").str.strip()
+    resultado = pd.Series(pd.NaT, index=serie.index, dtype="datetime64[us]")
+    pendentes = texto.notna() & (texto != "")
+
+    for fmt in FORMATOS_DATA_WINDCHILL:
+        if not pendentes.any():
+            break
+
+        convertidos = pd.to_datetime(texto[pendentes], format=fmt, errors="coerce").astype("datetime64[us]")
+        convertidos = convertidos[convertidos.notna()]
+
+        resultado[convertidos.index] = convertidos
+        pendentes[convertidos.index] = False
+
+    return resultado
+
+
+def limpar_strings(serie: pd.Series, memo: Optional[MemoTransformacao] = None) -> pd.Series:
+    """Versão por coluna de `limpar_string`: colapsa espaços e remove os das bordas."""
+    if memo is not None and memo.compensa(serie):
+        return memo.aplicar(serie, _limpar_string_celula).astype("string")
+
+    return serie.astype("string").str.replace(r"\s+", " ", regex=True).str.strip()
+
+
+def extrair_nome_hex_de_caminhos(serie: pd.Series, memo: Optional[MemoTransformacao] = None) -> pd.Series:
+    """
+    Versão por coluna de `extrair_nome_hex_de_caminho`.
+
+    Aceita separadores Windows e POSIX, já que os caminhos do vault vêm do
+    servidor Windchill (Windows) independentemente de onde a API roda.
+    """
+    if memo is not None and memo.compensa(serie):
+        return memo.aplicar(serie, _extrair_nome_hex_celula).astype("string")
+
+    caminhos = serie.astype("string")
+
+    nome = caminhos.str.replace(r"^.*[\\/]", "", regex=True)
+    nome = nome.str.replace(r"(?i)\.fv$", "", regex=True)
+    nome = nome.str.lstrip("0").mask(nome.str.lstrip("0") == "", "0")
+
+    valido = caminhos.str.len().gt(0) & nome.str.fullmatch(r"[A-Fa-f0-9]+")
+    return nome.str.upper().where(valido.fillna(False))
+
+
+def reconstruir_caminhos_vault(
+    caminhos_raiz: pd.Series,
+    nomes_hex: pd.Series,
+    memo: Optional[MemoTransformacao] = None
+) -> pd.Series:
+    """
+    Versão por coluna de `reconstruir_caminho_vault` (padding de 14 dígitos, sem extensão).
+
+    Retorna NA onde a raiz ou o nome hex estiverem vazios.
+    """
+    raiz = caminhos_raiz.astype("string")
+    nome_hex = nomes_hex.astype("string")
+
+    if memo is not None and memo.compensa(raiz):
+        raiz_normalizada = memo.aplicar(raiz, _normalizar_raiz_celula).astype("string")
+    else:
+        raiz_normalizada = raiz.str.rstrip("\\").str.rstrip("/")
+
+    if memo is not None and memo.compensa(nome_hex):
+        hex_padded = memo.aplicar(nome_hex, hex_to_padded).astype("string")
+    else:
+        hex_padded = nome_hex.str.strip().str.upper().str.zfill(14)
+
+    caminho = raiz_normalizada + "\\" + hex_padded
+
+    valido = raiz.fillna("").str.len().gt(0) & nome_hex.fillna("").str.len().gt(0)
+    return caminho.where(valido)
+
+
+def _parse_data_celula(valor: Any):
+    return parse_data_windchill(str(valor))
+
+
+def _limpar_string_celula(valor: Any) -> str:
+    return limpar_string(str(valor))
+
+
+def _extrair_nome_hex_celula(valor: Any) -> Optional[str]:
+    return extrair_nome_hex_de_caminho(str(valor))
+
+
+def _normalizar_raiz_celula(valor: Any) -> str:
+    return str(valor).rstrip("\\").rstrip("/")
+
+
 def reconstruir_caminho_vault(
     caminho_raiz: str,
     nome_hex: str,
@@ -152,51 +326,74 @@ def reconstruir_caminho_vault(
     return construir_caminho_vault(caminho_raiz, nome_hex, extensao, padding)
 
 
-def preparar_para_insercao_documentos(df: pd.DataFrame) -> List[Dict[str, Any]]:
-    """Prepara dados de documentos para inserção no banco."""
-    registros = []
-
-    for _, row in df.iterrows():
-        doc = {
-            "numero_doc": row.get("numero_doc"),
-            "nome_doc": row.get("nome_doc"),
-            "versao": row.get("versao"),
-            "iteracao": row.get("iteracao"),
-            "estado": row.get("estado"),
-            "criado_por": row.get("criado_por"),
-            "data_criacao": row.get("data_criacao"),
-            "data_modificacao": row.get("data_modificacao"),
-        }
-
-        arquivo = {
-            "nome_arquivo": row.get("nome_arquivo"),
-            "tamanho_mb": row.get("tamanho_mb"),
-            "tipo_conteudo": row.get("tipo_conteudo"),
-            "nome_hex": row.get("nome_hex"),
-            "caminho_completo_estimado": row.get("caminho_completo_estimado"),
-        }
-
-        registros.append({"documento": doc, "arquivo": arquivo})
-
-    return registros
-
-
-def preparar_para_insercao_arquivos(df: pd.DataFrame) -> List[Dict[str, Any]]:
-    """Prepara dados de arquivos para inserção no banco."""
-    registros = []
-
-    for _, row in df.iterrows():
-        arquivo = {
-            "nome_arquivo": row.get("nome_arquivo", row.get("nome_original")),
-            "nome_original": row.get("nome_original"),
-            "tipo_doc": row.get("tipo_doc"),
-            "nome_interno_app": row.get("nome_interno_app"),
-            "seq_decimal": row.get("seq_decimal"),
-            "nome_hex": row.get("nome_hex"),
-            "caminho_raiz_vault": row.get("caminho_raiz_vault"),
-            "caminho_completo_estimado": row.get("caminho_completo_estimado"),
-        }
-
-        registros.append(arquivo)
-
-    return registros
+# Campos gravados em cada tabela, na ordem das colunas do modelo
+CAMPOS_DOCUMENTO = [
+    "numero_doc", "nome_doc", "versao", "iteracao", "estado",
+    "criado_por", "data_criacao", "data_modificacao",
+]
+CAMPOS_ARQUIVO_DOCUMENTO = [
+    "nome_arquivo", "tamanho_mb", "tipo_conteudo", "nome_hex", "caminho_completo_estimado",
+]
+CAMPOS_ARQUIVO = [
+    "nome_arquivo", "nome_original", "tipo_doc", "nome_interno_app", "seq_decimal",
+    "nome_hex", "caminho_raiz_vault", "caminho_completo_estimado",
+]
+
+
+def _coluna_para_insercao(df: pd.DataFrame, campo: str) -> np.ndarray:
+    """
+    Converte uma coluna em array de objetos Python prontos para o banco.
+
+    NaN/NaT/NA viram None e datas viram `datetime`, tudo de forma vetorizada.
+    Colunas ausentes viram um array de None.
+    """
+    if campo not in df.columns:
+        return np.full(len(df), None, dtype=object)
+
+    serie = df[campo]
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        valores = np.array(serie.dt.to_pydatetime(), dtype=object)
+    else:
+        valores = serie.to_numpy(dtype=object, copy=True)
+
+    valores[pd.isna(valores)] = None
+    return valores
+
+
+def _iterar_registros(df: pd.DataFrame, colunas: Dict[str, np.ndarray], tamanho_lote: int) -> Iterator[List[Dict[str, Any]]]:
+    """Monta os dicts de cada lote direto dos arrays das colunas."""
+    campos = list(colunas)
+
+    for inicio in range(0, len(df), tamanho_lote):
+        fatias = [colunas[c][inicio:inicio + tamanho_lote] for c in campos]
+        yield [dict(zip(campos, valores)) for valores in zip(*fatias)]
+
+
+def preparar_para_insercao_documentos(df: pd.DataFrame, tamanho_lote: int = 500) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Prepara dados de documentos para inserção no banco.
+
+    Gera lotes de até `tamanho_lote` itens {"documento": {...}, "arquivo": {...}}.
+    """
+    colunas_doc = {c: _coluna_para_insercao(df, c) for c in CAMPOS_DOCUMENTO}
+    colunas_arq = {c: _coluna_para_insercao(df, c) for c in CAMPOS_ARQUIVO_DOCUMENTO}
+
+    for docs, arquivos in zip(
+        _iterar_registros(df, colunas_doc, tamanho_lote),
+        _iterar_registros(df, colunas_arq, tamanho_lote),
+    ):
+        yield [{"documento": doc, "arquivo": arq} for doc, arq in zip(docs, arquivos)]
+
+
+def preparar_para_insercao_arquivos(df: pd.DataFrame, tamanho_lote: int = 500) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Prepara dados de arquivos para inserção no banco.
+
+    Gera lotes de até `tamanho_lote` registros. Sem a coluna nome_arquivo,
+    usa nome_original.
+    """
+    colunas = {c: _coluna_para_insercao(df, c) for c in CAMPOS_ARQUIVO}
+    if "nome_arquivo" not in df.columns:
+        colunas["nome_arquivo"] = _coluna_para_insercao(df, "nome_original")
+
+    yield from _iterar_registros(df, colunas, tamanho_lote)
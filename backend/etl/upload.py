@@ -0,0 +1,234 @@
+"""
+Recebimento de uploads em streaming.
+
+O corpo do upload é lido em blocos de tamanho fixo e gravado em disco à
+medida que chega, calculando o SHA-256 e a quantidade de bytes no
+caminho. Uploads compactados com gzip (.gz) ou zstd (.zst) são
+descompactados também em blocos, então a memória usada não depende do
+tamanho do arquivo.
+"""
+import asyncio
+import gzip
+import hashlib
+import os
+import zlib
+from typing import Any, Dict, Optional, Tuple
+
+import aiofiles
+import zstandard
+from fastapi import UploadFile
+
+# Bloco lido do upload por vez
+TAMANHO_BLOCO_UPLOAD = 1 << 20
+
+_ASSINATURAS = {
+    b"\x1f\x8b": "gzip",
+    b"\x28\xb5\x2f\xfd": "zstd",
+}
+_MAGIC_ZSTD = 0xFD2FB528
+_MAGIC_ZSTD_PULAVEL_MIN = 0x184D2A50
+_MAGIC_ZSTD_PULAVEL_MAX = 0x184D2A5F
+
+_EXTENSOES = {
+    ".gz": "gzip",
+    ".gzip": "gzip",
+    ".zst": "zstd",
+    ".zstd": "zstd",
+}
+
+
+def detectar_compressao(filename: str, inicio: bytes = b"") -> Optional[str]:
+    """
+    Detecta a compressão do upload pelos primeiros bytes ou, sem eles, pela extensão.
+
+    Returns:
+        'gzip', 'zstd' ou None (não compactado)
+    """
+    for assinatura, compressao in _ASSINATURAS.items():
+        if inicio.startswith(assinatura):
+            return compressao
+    if inicio:
+        return None
+    return _EXTENSOES.get(os.path.splitext(filename)[1].lower())
+
+
+def nome_sem_compressao(filename: str) -> str:
+    """Nome do arquivo sem a extensão de compressão (ex: 'dump.csv.gz' -> 'dump.csv')."""
+    base, ext = os.path.splitext(filename)
+    return base if ext.lower() in _EXTENSOES else filename
+
+
+def _verificar_zstd_completo(caminho: str):
+    """
+    Percorre os cabeçalhos de frames e blocos do zstd (RFC 8878) sem descompactar.
+
+    O leitor do zstandard devolve os dados parciais de um arquivo truncado
+    sem erro; aqui o arquivo só é aceito se todo frame termina no último bloco.
+
+    Raises:
+        ValueError: Se o arquivo não for zstd ou estiver incompleto
+    """
+    with open(caminho, "rb") as f:
+        tamanho_total = os.fstat(f.fileno()).st_size
+
+        while f.tell() < tamanho_total:
+            magic = int.from_bytes(f.read(4), "little")
+
+            if _MAGIC_ZSTD_PULAVEL_MIN <= magic <= _MAGIC_ZSTD_PULAVEL_MAX:
+                f.seek(int.from_bytes(f.read(4), "little"), os.SEEK_CUR)
+                continue
+            if magic != _MAGIC_ZSTD:
+                raise ValueError("Arquivo zstd inválido: frame desconhecido")
+
+            descritor = f.read(1)[0]
+            segmento_unico = (descritor >> 5) & 1
+            f.seek(
+                (0 if segmento_unico else 1)  # Window_Descriptor
+                + (0, 1, 2, 4)[descritor & 3]  # Dictionary_ID
+                + ((1 if segmento_unico else 0), 2, 4, 8)[descritor >> 6],  # Frame_Content_Size
+                os.SEEK_CUR,
+            )
+
+            ultimo = False
+            while not ultimo:
+                cabecalho = f.read(3)
+                if len(cabecalho) < 3:
+                    raise ValueError("Arquivo zstd incompleto")
+                valor = int.from_bytes(cabecalho, "little")
+                ultimo = bool(valor & 1)
+                tipo_bloco = (valor >> 1) & 3
+                # Bloco RLE guarda um único byte, repetido Block_Size vezes
+                f.seek(1 if tipo_bloco == 1 else valor >> 3, os.SEEK_CUR)
+
+            if (descritor >> 2) & 1:
+                f.seek(4, os.SEEK_CUR)  # Content_Checksum
+
+        if f.tell() > tamanho_total:
+            raise ValueError("Arquivo zstd incompleto")
+
+
+def _abrir_descompactado(caminho: str, compressao: str):
+    if compressao == "gzip":
+        return gzip.open(caminho, "rb")
+    return zstandard.ZstdDecompressor().stream_reader(open(caminho, "rb"), read_across_frames=True)
+
+
+def _descompactar(origem: str, destino: str, compressao: str, tamanho_bloco: int) -> Tuple[str, int]:
+    """
+    Descompacta `origem` em `destino` bloco a bloco.
+
+    Returns:
+        Tuple de (sha256, tamanho) do conteúdo descompactado
+    """
+    if compressao == "zstd":
+        _verificar_zstd_completo(origem)
+
+    sha256 = hashlib.sha256()
+    tamanho = 0
+
+    with _abrir_descompactado(origem, compressao) as entrada, open(destino, "wb") as saida:
+        while bloco := entrada.read(tamanho_bloco):
+            sha256.update(bloco)
+            tamanho += len(bloco)
+            saida.write(bloco)
+
+    return sha256.hexdigest(), tamanho
+
+
+async def salvar_upload(
+    arquivo: UploadFile,
+    destino: str,
+    tamanho_bloco: int = TAMANHO_BLOCO_UPLOAD,
+) -> Dict[str, Any]:
+    """
+    Grava o upload em disco em blocos, calculando o SHA-256 no caminho.
+
+    Uploads gzip/zstd são gravados compactados e descompactados em seguida,
+    em blocos e fora do event loop, para `destino`. Descompactar direto do
+    corpo da requisição não limita a memória no zstd: um único bloco muito
+    comprimível pode gerar centenas de MB de uma vez.
+
+    Args:
+        arquivo: Upload recebido pelo endpoint
+        destino: Caminho do arquivo gravado (conteúdo já descompactado)
+        tamanho_bloco: Bytes lidos e gravados por vez
+
+    Returns:
+        Dict com sha256 e tamanho do conteúdo descompactado, tamanho_recebido
+        (bytes do upload), compressao e filename sem a extensão de compressão
+
+    Raises:
+        ValueError: Se o conteúdo compactado estiver corrompido ou incompleto
+    """
+    sha256 = hashlib.sha256()
+    tamanho_recebido = 0
+
+    bloco = await arquivo.read(tamanho_bloco)
+    compressao = detectar_compressao(arquivo.filename or "", bloco)
+    gravado = destino if compressao is None else f"{destino}.compactado"
+
+    async with aiofiles.open(gravado, "wb") as saida:
+        while bloco:
+            tamanho_recebido += len(bloco)
+            if compressao is None:
+                sha256.update(bloco)
+            await saida.write(bloco)
+            bloco = await arquivo.read(tamanho_bloco)
+
+    if compressao is None:
+        hash_conteudo, tamanho = sha256.hexdigest(), tamanho_recebido
+    else:
+        try:
+            hash_conteudo, tamanho = await asyncio.to_thread(
+                _descompactar, gravado, destino, compressao, tamanho_bloco
+            )
+        except (OSError, EOFError, IndexError, zlib.error, zstandard.ZstdError) as e:
+            raise ValueError(f"Arquivo {compressao} inválido ou incompleto: {e}") from e
+        finally:
+            os.unlink(gravado)
+
+    return {
+        "filename": nome_sem_compressao(arquivo.filename or ""),
+        "sha256": hash_conteudo,
+        "tamanho": tamanho,
+        "tamanho_recebido": tamanho_recebido,
+        "compressao": compressao,
+    }
+
+
+def preparar_arquivo_recebido(
+    origem: str,
+    destino: str,
+    tamanho_bloco: int = TAMANHO_BLOCO_UPLOAD,
+) -> Dict[str, Any]:
+    """
+    Equivalente a `salvar_upload` para um arquivo já gravado por inteiro
+    (ex: upload em partes): descompacta gzip/zstd ou só move para `destino`,
+    calculando o SHA-256 do conteúdo. `origem` é removido.
+
+    Returns:
+        Dict com sha256, tamanho e compressao
+
+    Raises:
+        ValueError: Se o conteúdo compactado estiver corrompido ou incompleto
+    """
+    with open(origem, "rb") as f:
+        compressao = detectar_compressao("", f.read(4))
+
+    if compressao:
+        try:
+            hash_conteudo, tamanho = _descompactar(origem, destino, compressao, tamanho_bloco)
+        except (OSError, EOFError, IndexError, zlib.error, zstandard.ZstdError) as e:
+            raise ValueError(f"Arquivo {compressao} inválido ou incompleto: {e}") from e
+        os.unlink(origem)
+    else:
+        sha256 = hashlib.sha256()
+        tamanho = 0
+        with open(origem, "rb") as f:
+            while bloco := f.read(tamanho_bloco):
+                sha256.update(bloco)
+                tamanho += len(bloco)
+        hash_conteudo = sha256.hexdigest()
+        os.replace(origem, destino)
+
+    return {"sha256": hash_conteudo, "tamanho": tamanho, "compressao": compressao}
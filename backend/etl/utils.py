@@ -1,7 +1,18 @@
 from datetime import datetime
 from typing import Optional
+import ntpath
 import re
 
+# Formatos de data dos exports Windchill, na ordem de tentativa
+FORMATOS_DATA_WINDCHILL = [
+    "%d/%m/%Y %H:%M:%S",
+    "%Y-%m-%dT%H:%M:%S",
+    "%Y-%m-%d",
+    "%d/%m/%Y",
+    "%d-%b-%y",
+    "%d-%b-%Y",
+]
+
 
 def hex_to_padded(hex_value: str, total_digits: int = 14) -> str:
     """
@@ -27,18 +38,12 @@ def parse_data_windchill(data_str: str) -> Optional[datetime]:
     - '20/12/2021 00:00:00'
     - '2021-12-20T00:00:00'
     - '2021-12-20'
+    - '19-DEC-07' (Oracle, dumps brutos das tabelas)
     """
     if not data_str or data_str.strip() == "":
         return None
 
-    formatos = [
-        "%d/%m/%Y %H:%M:%S",
-        "%Y-%m-%dT%H:%M:%S",
-        "%Y-%m-%d",
-        "%d/%m/%Y",
-    ]
-
-    for fmt in formatos:
+    for fmt in FORMATOS_DATA_WINDCHILL:
         try:
             return datetime.strptime(data_str.strip(), fmt)
         except ValueError:
@@ -94,9 +99,8 @@ def extrair_nome_hex_de_caminho(caminho: str) -> Optional[str]:
     if not caminho:
         return None
 
-    # Pega o nome do arquivo
-    import os
-    nome = os.path.basename(caminho)
+    # Pega o nome do arquivo (caminhos do vault usam separador Windows)
+    nome = ntpath.basename(caminho)
 
     # Remove extensão .fv se existir
     if nome.lower().endswith('.fv'):
@@ -1,15 +1,30 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from database import engine, Base
-from routers import documentos, arquivos, etl, config
+from routers import documentos, arquivos, etl, config, uploads
+from etl import jobs as etl_jobs
+from etl.carga_em_massa import recriar_indices_ausentes
 
 # Cria as tabelas
 Base.metadata.create_all(bind=engine)
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Recria índices ausentes, inicia os workers da fila de jobs (importação e restauração) e os libera ao encerrar."""
+    # Índices suspensos por uma carga em massa interrompida (queda do processo)
+    recriar_indices_ausentes(engine)
+    etl_jobs.iniciar_workers(etl.executar_job)
+    yield
+    etl_jobs.parar_workers()
+
+
 app = FastAPI(
     title="ETL Manager PLM",
     description="API para migração de dados Windchill → Teamcenter",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 # CORS para frontend
@@ -26,6 +41,7 @@ app.include_router(documentos.router)
 app.include_router(arquivos.router)
 app.include_router(etl.router)
 app.include_router(config.router)
+app.include_router(uploads.router)
 
 @app.get("/")
 def root():
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Text, ForeignKey
+from sqlalchemy import Column, Integer, BigInteger, String, Float, DateTime, Text, ForeignKey, Index, Boolean
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from database import Base
@@ -20,6 +20,11 @@ class Documento(Base):
 
     arquivos = relationship("Arquivo", back_populates="documento")
 
+    __table_args__ = (
+        # Chave natural usada na deduplicação das importações
+        Index("uq_documentos_chave", "numero_doc", "versao", "iteracao", unique=True),
+    )
+
 
 class Arquivo(Base):
     """Informações dos arquivos físicos no vault."""
@@ -41,6 +46,11 @@ class Arquivo(Base):
     documento = relationship("Documento", back_populates="arquivos")
     metadados = relationship("Metadado", back_populates="arquivo")
 
+    __table_args__ = (
+        # Chave natural usada na deduplicação das importações
+        Index("uq_arquivos_chave", "nome_hex", "nome_original", unique=True),
+    )
+
 
 class Metadado(Base):
     """Atributos flexíveis chave-valor."""
@@ -67,6 +77,16 @@ class ETLLog(Base):
     severity = Column(String(10), default="INFO")  # INFO, WARN, ERROR
 
 
+class ImpressaoRegistro(Base):
+    """Hash do conteúdo de cada registro importado, pela chave natural (importação incremental)."""
+    __tablename__ = "impressoes_registros"
+
+    tabela = Column(String(20), primary_key=True)  # documentos, arquivos
+    chave = Column(BigInteger, primary_key=True)  # Hash da chave natural
+    impressao = Column(BigInteger)  # Hash das colunas gravadas
+    registro_id = Column(Integer)  # id em documentos/arquivos
+
+
 class MissingItem(Base):
     """Registro de itens não encontrados durante verificação."""
     __tablename__ = "missing_items"
@@ -90,3 +110,69 @@ class Configuracao(Base):
     valor = Column(Text)
     descricao = Column(String(255), nullable=True)
     atualizado_em = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class ImportJob(Base):
+    """Importação em background (fila persistente de jobs)."""
+    __tablename__ = "import_jobs"
+
+    id = Column(String(36), primary_key=True)
+    tipo_job = Column(String(20), default="arquivo")  # arquivo, lote, restore
+    filename = Column(String(255))
+    caminho = Column(String(500))
+    manter_arquivo = Column(Boolean, default=False)  # Arquivo do servidor (importação por caminho): não é removido
+    incremental = Column(Boolean, default=False)  # Grava só registros novos e alterados
+    sha256 = Column(String(64), nullable=True)
+    status = Column(String(20), default="queued", index=True)  # queued, processing, completed, error, cancelled
+    prioridade = Column(Integer, default=0)
+    cancelar = Column(Boolean, default=False)
+    progress = Column(Float, default=0)
+    total = Column(Integer, default=0)
+    processed = Column(Integer, default=0)
+    inserted = Column(Integer, default=0)
+    tipo = Column(String(20), nullable=True)
+    formato = Column(String(20), nullable=True)
+    checkpoint = Column(Text, nullable=True)  # JSON com o último lote gravado
+    resultado = Column(Text, nullable=True)  # JSON com o resultado de cada tabela (lote) ou da restauração
+    error = Column(Text, nullable=True)
+    log_id = Column(Integer, nullable=True)
+    worker = Column(String(100), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    completed_at = Column(DateTime, nullable=True)
+    atualizado_em = Column(DateTime, default=datetime.utcnow)
+
+
+class UploadSessao(Base):
+    """Upload em partes (retomável) de um arquivo grande."""
+    __tablename__ = "upload_sessoes"
+
+    id = Column(String(36), primary_key=True)
+    filename = Column(String(255))
+    caminho = Column(String(500))
+    tamanho_total = Column(BigInteger)
+    tamanho_parte = Column(Integer)
+    status = Column(String(20), default="aberta")  # aberta, finalizando, finalizada, cancelada
+    job_id = Column(String(36), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    atualizado_em = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    partes = relationship("UploadParte", back_populates="sessao", cascade="all, delete-orphan")
+
+
+class UploadParte(Base):
+    """Parte já recebida de um upload em partes."""
+    __tablename__ = "upload_partes"
+
+    id = Column(Integer, primary_key=True, index=True)
+    sessao_id = Column(String(36), ForeignKey("upload_sessoes.id"))
+    numero = Column(Integer)
+    tamanho = Column(Integer)
+    sha256 = Column(String(64))
+    recebida_em = Column(DateTime, default=datetime.utcnow)
+
+    sessao = relationship("UploadSessao", back_populates="partes")
+
+    __table_args__ = (
+        Index("uq_upload_partes_numero", "sessao_id", "numero", unique=True),
+    )
@@ -1,198 +1,334 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File
 from sqlalchemy.orm import Session
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Callable, Tuple, Iterator
+import pandas as pd
+import contextlib
+import itertools
+import json
 import os
+import threading
 import tempfile
+import time
 import uuid
+import zipfile
 from datetime import datetime
 from database import get_db, SessionLocal
 from models import Documento, Arquivo, ETLLog
 from schemas import (
     ImportResponse,
+    ImportCaminhoRequest,
     RestoreRequest,
     RestoreResponse,
     RestoreResponse,
+    RestoreFalha,
     ETLLog as ETLLogSchema,
     VerifyRequest,
     VerifyResponse,
 )
 from models import Documento, Arquivo, ETLLog, MissingItem
-from etl.importer import importar_arquivo, identificar_tipo_dados
-from etl.transformer import (
-    transformar_dados,
-    preparar_para_insercao_documentos,
-    preparar_para_insercao_arquivos,
-)
-from etl.exporter import restaurar_arquivos, construir_caminho_real_vault
+from etl.importer import importar_arquivo_em_lotes, identificar_tipo_dados
+from etl.transformer import transformar_dados, MemoTransformacao
+from etl.loader import criar_carregador
+from etl.carga_paralela import processos_carga_paralela
+from etl.carga_em_massa import TABELAS_POR_TIPO, usar_carga_em_massa, indices_suspensos
+from etl.pipeline import transformar_em_pipeline
+from etl.upload import salvar_upload, nome_sem_compressao
+from etl.importacao_lote import importar_lote
+from etl import cache as etl_cache
+from etl import jobs as etl_jobs
+from etl.exporter import executar_restauracao, construir_caminho_real_vault
+from etl.copia import MODOS_COPIA
+from etl.manifesto import VERIFICACOES
+from etl import indice_vault
 from core.config_manager import obter_valor_configuracao
 
-# Armazenamento em memória do progresso das importações
-import_jobs: Dict[str, Dict[str, Any]] = {}
-
-# Constante para tamanho do lote
-BATCH_SIZE = 500
-
 router = APIRouter(
     tags=["etl"]
 )
 
 # === FUNÇÕES AUXILIARES DE PROCESSAMENTO EM LOTES ===
 
-def processar_lote_documentos(dados_lote: List[Dict], db: Session) -> int:
-    """Processa um lote de documentos e retorna quantidade inserida."""
-    inseridos = 0
-    for item in dados_lote:
-        doc_existente = db.query(Documento).filter(
-            Documento.numero_doc == item["documento"]["numero_doc"],
-            Documento.versao == item["documento"]["versao"],
-            Documento.iteracao == item["documento"]["iteracao"],
-        ).first()
-
-        if not doc_existente:
-            doc = Documento(**item["documento"])
-            db.add(doc)
-            db.flush()
-
-            if item["arquivo"]["nome_arquivo"]:
-                arq = Arquivo(documento_id=doc.id, **item["arquivo"])
-                db.add(arq)
-
-            inseridos += 1
-    return inseridos
-
-
-def processar_lote_arquivos(dados_lote: List[Dict], db: Session) -> int:
-    """Processa um lote de arquivos e retorna quantidade inserida."""
-    inseridos = 0
-    for item in dados_lote:
-        arq_existente = db.query(Arquivo).filter(
-            Arquivo.nome_hex == item.get("nome_hex"),
-            Arquivo.nome_original == item.get("nome_original"),
-        ).first()
-
-        if not arq_existente:
-            arq = Arquivo(**item)
-            db.add(arq)
-            inseridos += 1
-    return inseridos
-
-
-def executar_importacao_background(job_id: str, tmp_path: str, filename: str):
-    """Executa a importação em background com processamento em lotes."""
-    db = SessionLocal()
+def ler_e_transformar_lotes(
+    tmp_path: str,
+    sha256: Optional[str] = None,
+    filename: Optional[str] = None,
+    pular_lotes: int = 0,
+) -> Tuple[Iterator[pd.DataFrame], str, str, bool]:
+    """
+    Lê e transforma o arquivo lote a lote.
 
-    try:
-        import_jobs[job_id]["status"] = "processing"
-        import_jobs[job_id]["started_at"] = datetime.now().isoformat()
+    Leitura e transformação rodam em threads (`transformar_em_pipeline`),
+    adiantando os próximos lotes enquanto o atual é gravado. O tipo dos
+    dados é detectado pelas colunas do primeiro lote. Se `sha256` for
+    informado, os lotes transformados são lidos do cache quando o mesmo
+    conteúdo já foi importado, ou gravados nele durante esta importação.
 
-        # Importa e transforma
-        df, formato = importar_arquivo(tmp_path)
-        tipo = identificar_tipo_dados(df)
-        df_transformado = transformar_dados(df, tipo)
+    Com `pular_lotes` (retomada de um job), os primeiros lotes são lidos
+    mas não transformados nem devolvidos, e o cache não é gravado.
 
-        import_jobs[job_id]["tipo"] = tipo
-        import_jobs[job_id]["formato"] = formato
+    Returns:
+        Tuple de (lotes transformados, formato, tipo, veio_do_cache)
+    """
+    chave = etl_cache.chave_cache(sha256) if sha256 else None
+    entrada = etl_cache.obter_entrada(chave) if chave else None
 
-        registros_inseridos = 0
+    if entrada:
+        lotes = itertools.islice(etl_cache.ler_lotes(chave), pular_lotes, None)
+        return lotes, entrada["formato"], entrada["tipo"], True
 
-        if tipo == "documentos":
-            dados = preparar_para_insercao_documentos(df_transformado)
-        elif tipo == "arquivos":
-            dados = preparar_para_insercao_arquivos(df_transformado)
-        else:
-            dados = []
+    lotes, formato = importar_arquivo_em_lotes(tmp_path)
+    primeiro = next(lotes, None)
+    tipo = identificar_tipo_dados(primeiro) if primeiro is not None else "desconhecido"
 
-        total_registros = len(dados)
-        import_jobs[job_id]["total"] = total_registros
+    # Um memo por thread de transformação, compartilhado entre os lotes que
+    # ela processa: datas e raízes se repetem no arquivo todo
+    locais = threading.local()
 
-        # Processa em lotes
-        for i in range(0, total_registros, BATCH_SIZE):
-            lote = dados[i:i + BATCH_SIZE]
+    def transformar(df: pd.DataFrame) -> pd.DataFrame:
+        if not hasattr(locais, "memo"):
+            locais.memo = MemoTransformacao()
+        return transformar_dados(df, tipo, locais.memo)
 
-            if tipo == "documentos":
-                inseridos = processar_lote_documentos(lote, db)
-            else:
-                inseridos = processar_lote_arquivos(lote, db)
+    lotes_transformados = transformar_em_pipeline(
+        itertools.islice(itertools.chain([primeiro] if primeiro is not None else [], lotes), pular_lotes, None),
+        transformar,
+    )
 
-            registros_inseridos += inseridos
+    if chave and not pular_lotes:
+        lotes_transformados = etl_cache.gravar_lotes(
+            chave,
+            lotes_transformados,
+            {"sha256": sha256, "tipo": tipo, "formato": formato, "filename": filename},
+        )
+
+    return lotes_transformados, formato, tipo, False
+
+
+def importar_em_lotes(
+    tmp_path: str,
+    db: Session,
+    ao_progredir: Optional[Callable[[Dict[str, Any]], None]] = None,
+    sha256: Optional[str] = None,
+    filename: Optional[str] = None,
+    checkpoint: Optional[Dict[str, int]] = None,
+    incremental: bool = False,
+) -> Tuple[int, str, str, Dict[str, Any]]:
+    """
+    Importa o arquivo lote a lote. Esta função é o único escritor no banco:
+    grava cada lote transformado enquanto os seguintes são lidos e
+    transformados em paralelo. O progresso conta os registros já gravados.
+
+    O progresso inclui um `checkpoint` ({"lote", "processados", "inseridos"})
+    com o último lote confirmado no banco. Passando esse checkpoint de volta,
+    a importação continua dali, sem gravar de novo os lotes anteriores. O
+    checkpoint também leva o tamanho de lote adaptativo em uso
+    (`tamanho_lote`) e a vazão medida; a retomada começa desse tamanho.
+
+    Com `incremental`, só os registros novos e alterados desde a última
+    importação incremental são gravados (ver `etl.incremental`).
+
+    Returns:
+        Tuple de (registros_inseridos, formato, tipo, metricas do carregador;
+        no modo incremental inclui `atualizados` e `inalterados`)
+    """
+    checkpoint = checkpoint or {}
+    lotes_gravados = checkpoint.get("lote", 0)
+    registros_gravados = checkpoint.get("processados", 0)
+    registros_inseridos = checkpoint.get("inseridos", 0)
+
+    lotes, formato, tipo, veio_do_cache = ler_e_transformar_lotes(
+        tmp_path, sha256, filename, pular_lotes=lotes_gravados
+    )
+    tamanho_arquivo = os.path.getsize(tmp_path) or 1
 
-            # Commit do lote
-            db.commit()
+    if ao_progredir:
+        ao_progredir({"tipo": tipo, "formato": formato, "cache": veio_do_cache})
+
+    # Arquivo grande no PostgreSQL: lotes particionados entre processos de carga
+    processos = 0 if incremental else processos_carga_paralela(db, tamanho_arquivo)
+
+    carregador = criar_carregador(db, tipo, checkpoint.get("tamanho_lote"), incremental, processos)
+    if incremental:
+        # Contagens acumuladas desde o início do job, como `inseridos`
+        carregador.atualizados = checkpoint.get("atualizados", 0)
+        carregador.inalterados = checkpoint.get("inalterados", 0)
+    ultimo_checkpoint = dict(checkpoint)
+
+    # Arquivo grande no SQLite: índices secundários recriados só no fim (ver `etl.carga_em_massa`)
+    suspender_indices = not incremental and tipo in TABELAS_POR_TIPO and usar_carga_em_massa(db, tamanho_arquivo)
+
+    try:
+        with indices_suspensos(db, TABELAS_POR_TIPO[tipo]) if suspender_indices else contextlib.nullcontext():
+            for df_transformado in lotes:
+                registros_inseridos += carregador.carregar(df_transformado)
+                registros_gravados += len(df_transformado)
+                lotes_gravados += 1
+
+                if carregador.confirma_por_lote:
+                    ultimo_checkpoint = {
+                        "lote": lotes_gravados,
+                        "processados": registros_gravados,
+                        "inseridos": registros_inseridos,
+                        **carregador.metricas(),
+                    }
+
+                if ao_progredir:
+                    ao_progredir({
+                        "total": registros_gravados,
+                        "processed": registros_gravados,
+                        "inserted": registros_inseridos,
+                        "progress": round(min(df_transformado.attrs.get("bytes_lidos", 0) / tamanho_arquivo, 1) * 100, 1),
+                        "checkpoint": ultimo_checkpoint,
+                    })
+
+            # Carga paralela: os processos terminam de gravar as partições aqui
+            registros_inseridos += carregador.finalizar()
+    finally:
+        carregador.fechar()
+
+    return registros_inseridos, formato, tipo, carregador.metricas()
+
+
+def descrever_incremental(metricas: Dict[str, Any]) -> str:
+    """Trecho do log/mensagem com as contagens do modo incremental."""
+    return f", Atualizados: {metricas.get('atualizados', 0)}, Inalterados: {metricas.get('inalterados', 0)}"
+
+
+def executar_job(job: Dict[str, Any]):
+    """Executa um job reservado da fila (`etl.jobs`), conforme o tipo."""
+    if job["tipo_job"] == "restore":
+        executar_job_restauracao(job)
+    else:
+        executar_job_importacao(job)
+
+
+def executar_job_importacao(job: Dict[str, Any]):
+    """
+    Executa um job reservado da fila de importação (`etl.jobs`).
+
+    Jobs de arquivo continuam do checkpoint do último lote gravado; jobs de
+    lote (zip) pulam as tabelas lógicas que já foram gravadas.
+    """
+    job_id = job["job_id"]
+    checkpoint = job["checkpoint"]
+    db = SessionLocal()
 
-            # Atualiza progresso
-            import_jobs[job_id]["processed"] = min(i + BATCH_SIZE, total_registros)
-            import_jobs[job_id]["inserted"] = registros_inseridos
-            import_jobs[job_id]["progress"] = round((i + BATCH_SIZE) / total_registros * 100, 1)
+    try:
+        if job["tipo_job"] == "lote":
+            tabelas_gravadas = checkpoint.get("tabelas", [])
+
+            def ao_gravar_tabela(resultado: Dict[str, Any]):
+                tabelas_gravadas.append(resultado)
+                etl_jobs.atualizar_job(job_id, {"checkpoint": {"tabelas": tabelas_gravadas}})
+
+            # As tabelas gravadas já chegaram por `ao_gravar_tabela`; do retorno só faltam as com erro
+            tabelas = tabelas_gravadas + [
+                t for t in importar_lote(
+                    job["caminho"],
+                    db,
+                    ao_progredir=lambda dados: etl_jobs.atualizar_job(job_id, dados),
+                    ao_gravar_tabela=ao_gravar_tabela,
+                    ignorar_tabelas=[t["tabela"] for t in tabelas_gravadas],
+                    incremental=job["incremental"],
+                )
+                if t["erro"]
+            ]
+            registros_inseridos = sum(t["inseridos"] for t in tabelas)
+            registros_afetados = registros_inseridos + sum(t.get("atualizados", 0) for t in tabelas)
+            falhas = [t["tabela"] for t in tabelas if t["erro"]]
+            detalhes = f"Lote: {job['filename']}, Tabelas: {len(tabelas)}, Com erro/ignoradas: {len(falhas)}"
+            campos = {"resultado": json.dumps(tabelas)}
+            severity = "WARN" if falhas else "INFO"
+        else:
+            registros_inseridos, formato, tipo, metricas = importar_em_lotes(
+                job["caminho"],
+                db,
+                ao_progredir=lambda dados: etl_jobs.atualizar_job(job_id, dados),
+                sha256=job["sha256"],
+                filename=job["filename"],
+                checkpoint=checkpoint,
+                incremental=job["incremental"],
+            )
+            registros_afetados = registros_inseridos + metricas.get("atualizados", 0)
+            detalhes = f"Arquivo: {job['filename']}, Formato: {formato}, Tipo: {tipo}"
+            if job["incremental"]:
+                detalhes += descrever_incremental(metricas)
+            campos = {}
+            if "processos_carga" in metricas:
+                # Vazão por processo da carga paralela, exibida no status do job
+                detalhes += f", Processos de carga: {metricas['processos_carga']}, {metricas.get('registros_por_s')} registros/s"
+                campos["resultado"] = json.dumps(metricas)
+            severity = "INFO"
 
         # Log da operação
         log = ETLLog(
             tipo="import",
-            detalhes=f"Arquivo: {filename}, Formato: {formato}, Tipo: {tipo}",
-            registros_afetados=registros_inseridos,
+            detalhes=detalhes,
+            registros_afetados=registros_afetados,
+            severity=severity,
         )
         db.add(log)
         db.commit()
 
-        import_jobs[job_id]["status"] = "completed"
-        import_jobs[job_id]["inserted"] = registros_inseridos
-        import_jobs[job_id]["progress"] = 100
-        import_jobs[job_id]["log_id"] = log.id
-        import_jobs[job_id]["completed_at"] = datetime.now().isoformat()
+        etl_jobs.finalizar_job(
+            job_id, "completed", inserted=registros_inseridos, progress=100, log_id=log.id, **campos
+        )
+
+    except etl_jobs.ImportacaoCancelada:
+        db.rollback()
+        etl_jobs.finalizar_job(job_id, "cancelled")
 
     except Exception as e:
         db.rollback()
-        import_jobs[job_id]["status"] = "error"
-        import_jobs[job_id]["error"] = str(e)
+        etl_jobs.finalizar_job(job_id, "error", error=str(e))
 
     finally:
         db.close()
-        # Remove arquivo temporário
-        if os.path.exists(tmp_path):
-            os.unlink(tmp_path)
 
 
 # === ENDPOINTS DE IMPORTAÇÃO ===
 
+async def receber_upload(file: UploadFile, destino: str) -> Dict[str, Any]:
+    """Grava o upload em disco em streaming (ver `salvar_upload`); conteúdo inválido vira 400."""
+    try:
+        return await salvar_upload(file, destino)
+    except ValueError as e:
+        if os.path.exists(destino):
+            os.unlink(destino)
+        raise HTTPException(status_code=400, detail=str(e))
+
+
 @router.post("/import", response_model=ImportResponse)
 async def importar_dados(
     file: UploadFile = File(...),
-    background_tasks: BackgroundTasks = None,
     async_mode: bool = Query(False, description="Executar em background para arquivos grandes"),
+    prioridade: int = Query(0, description="Prioridade na fila de jobs (maior primeiro; > 0 usa os workers prioritários)"),
+    incremental: bool = Query(False, description="Gravar só registros novos e alterados desde a última importação incremental"),
     db: Session = Depends(get_db)
 ):
     """
     Importa arquivo CSV, JSON ou MD para o banco de dados.
 
     O sistema detecta automaticamente se são dados de documentos ou arquivos CAD.
+    Aceita também os arquivos compactados com gzip (.gz) ou zstd (.zst).
 
     Parâmetros:
     - async_mode: Se True, executa em background e retorna job_id para consulta de progresso
+    - prioridade: Prioridade do job na fila (apenas async_mode)
+    - incremental: Compara cada registro com a impressão (hash) gravada na
+      última importação incremental: insere os novos, atualiza os alterados
+      e ignora os inalterados
     """
-    # Salva arquivo temporário
-    suffix = os.path.splitext(file.filename)[1]
-    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-        content = await file.read()
-        tmp.write(content)
-        tmp_path = tmp.name
-
-    # Modo assíncrono para arquivos grandes
-    if async_mode and background_tasks:
-        job_id = str(uuid.uuid4())
-        import_jobs[job_id] = {
-            "status": "queued",
-            "filename": file.filename,
-            "progress": 0,
-            "total": 0,
-            "processed": 0,
-            "inserted": 0,
-            "created_at": datetime.now().isoformat(),
-        }
+    nome_arquivo = nome_sem_compressao(file.filename)
 
-        background_tasks.add_task(
-            executar_importacao_background,
-            job_id,
-            tmp_path,
-            file.filename
+    # Modo assíncrono para arquivos grandes: entra na fila persistente de jobs
+    if async_mode:
+        job_id = str(uuid.uuid4())
+        caminho = etl_jobs.caminho_arquivo_job(job_id, nome_arquivo)
+        upload = await receber_upload(file, caminho)
+        etl_jobs.criar_job(
+            db, job_id, file.filename, caminho,
+            sha256=upload["sha256"], prioridade=prioridade, incremental=incremental,
         )
 
         return ImportResponse(
@@ -203,39 +339,162 @@ async def importar_dados(
             job_id=job_id,
         )
 
+    # Salva arquivo temporário
+    fd, tmp_path = tempfile.mkstemp(suffix=os.path.splitext(nome_arquivo)[1])
+    os.close(fd)
+    upload = await receber_upload(file, tmp_path)
+    sha256 = upload["sha256"]
+
     # Modo síncrono com processamento em lotes
     try:
-        df, formato = importar_arquivo(tmp_path)
-        tipo = identificar_tipo_dados(df)
-        df_transformado = transformar_dados(df, tipo)
+        registros_inseridos, formato, tipo, metricas = importar_em_lotes(
+            tmp_path, db, sha256=sha256, filename=file.filename, incremental=incremental
+        )
+        detalhes = f"Arquivo: {file.filename}, Formato: {formato}, Tipo: {tipo}"
+        if incremental:
+            detalhes += descrever_incremental(metricas)
+
+        # Log da operação
+        log = ETLLog(
+            tipo="import",
+            detalhes=detalhes,
+            registros_afetados=registros_inseridos + metricas.get("atualizados", 0),
+        )
+        db.add(log)
+        db.commit()
+
+        return ImportResponse(
+            success=True,
+            message=f"Importação concluída. Tipo detectado: {tipo}",
+            registros_importados=registros_inseridos,
+            log_id=log.id,
+        )
+
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
 
-        registros_inseridos = 0
+    finally:
+        os.unlink(tmp_path)
 
-        if tipo == "documentos":
-            dados = preparar_para_insercao_documentos(df_transformado)
-            total = len(dados)
 
-            for i in range(0, total, BATCH_SIZE):
-                lote = dados[i:i + BATCH_SIZE]
-                inseridos = processar_lote_documentos(lote, db)
-                registros_inseridos += inseridos
-                db.commit()
+@router.post("/import/lote", response_model=ImportResponse)
+async def importar_lote_zip(
+    file: UploadFile = File(...),
+    prioridade: int = Query(0, description="Prioridade na fila de jobs (maior primeiro)"),
+    incremental: bool = Query(False, description="Gravar só registros novos e alterados desde a última importação incremental"),
+    db: Session = Depends(get_db),
+):
+    """
+    Importa um arquivo .zip com vários dumps do Windchill (CSV, JSON ou MD).
+
+    Os arquivos são lidos e transformados em paralelo; dumps divididos em
+    várias partes são mesclados como uma única tabela. Executa sempre em
+    background: use GET /import/status/{job_id} para acompanhar.
+    """
+    if not nome_sem_compressao(file.filename).lower().endswith(".zip"):
+        raise HTTPException(status_code=400, detail="Envie um arquivo .zip com os dumps")
+
+    job_id = str(uuid.uuid4())
+    caminho = etl_jobs.caminho_arquivo_job(job_id, "lote.zip")
+    await receber_upload(file, caminho)
+
+    etl_jobs.criar_job(
+        db, job_id, file.filename, caminho,
+        tipo_job="lote", prioridade=prioridade, incremental=incremental,
+    )
+
+    return ImportResponse(
+        success=True,
+        message=f"Importação em lote iniciada. Use GET /import/status/{job_id} para acompanhar.",
+        registros_importados=0,
+        log_id=None,
+        job_id=job_id,
+    )
+
 
-        elif tipo == "arquivos":
-            dados = preparar_para_insercao_arquivos(df_transformado)
-            total = len(dados)
+def resolver_caminho_servidor(db: Session, caminho: str) -> str:
+    """
+    Resolve um caminho do servidor, aceitando só o que estiver dentro das
+    pastas configuradas em `raizes_importacao` (links simbólicos resolvidos).
+
+    Raises:
+        HTTPException: 403 fora das pastas permitidas, 404 se não existir
+    """
+    raizes = [
+        r.strip() for r in (obter_valor_configuracao(db, "raizes_importacao") or "").split(";")
+        if r.strip()
+    ]
+    if not raizes:
+        raise HTTPException(status_code=403, detail="Importação por caminho desabilitada: configure raizes_importacao")
+
+    real = os.path.realpath(caminho)
+    for raiz in raizes:
+        raiz_real = os.path.realpath(raiz)
+        try:
+            if os.path.commonpath([real, raiz_real]) == raiz_real:
+                break
+        except ValueError:
+            # Drives diferentes no Windows
+            continue
+    else:
+        raise HTTPException(status_code=403, detail="Caminho fora das pastas permitidas para importação")
+
+    if not os.path.exists(real):
+        raise HTTPException(status_code=404, detail=f"Caminho não encontrado: {caminho}")
+
+    return real
+
+
+@router.post("/import/caminho", response_model=ImportResponse)
+def importar_caminho(
+    request: ImportCaminhoRequest,
+    db: Session = Depends(get_db),
+):
+    """
+    Importa um arquivo que já está no servidor, sem upload nem cópia temporária.
+
+    O caminho precisa estar dentro de uma das pastas da configuração
+    `raizes_importacao`. O arquivo é lido no lugar (mapeado em memória para
+    JSON/CSV) e nunca é removido. Pastas e arquivos .zip viram uma
+    importação em lote, sempre em background. Com `incremental`, uma
+    recarga noturna do mesmo dump grava só o que mudou.
+    """
+    caminho = resolver_caminho_servidor(db, request.caminho)
+    nome = os.path.basename(caminho)
+    lote = os.path.isdir(caminho) or zipfile.is_zipfile(caminho)
+
+    if request.async_mode or lote:
+        job_id = str(uuid.uuid4())
+        etl_jobs.criar_job(
+            db, job_id, nome, caminho,
+            tipo_job="lote" if lote else "arquivo",
+            prioridade=request.prioridade,
+            manter_arquivo=True,
+            incremental=request.incremental,
+        )
+
+        return ImportResponse(
+            success=True,
+            message=f"Importação iniciada em background. Use GET /import/status/{job_id} para acompanhar.",
+            registros_importados=0,
+            log_id=None,
+            job_id=job_id,
+        )
 
-            for i in range(0, total, BATCH_SIZE):
-                lote = dados[i:i + BATCH_SIZE]
-                inseridos = processar_lote_arquivos(lote, db)
-                registros_inseridos += inseridos
-                db.commit()
+    try:
+        registros_inseridos, formato, tipo, metricas = importar_em_lotes(
+            caminho, db, incremental=request.incremental
+        )
+        detalhes = f"Arquivo do servidor: {caminho}, Formato: {formato}, Tipo: {tipo}"
+        if request.incremental:
+            detalhes += descrever_incremental(metricas)
 
         # Log da operação
         log = ETLLog(
             tipo="import",
-            detalhes=f"Arquivo: {file.filename}, Formato: {formato}, Tipo: {tipo}",
-            registros_afetados=registros_inseridos,
+            detalhes=detalhes,
+            registros_afetados=registros_inseridos + metricas.get("atualizados", 0),
         )
         db.add(log)
         db.commit()
@@ -251,56 +510,131 @@ async def importar_dados(
         db.rollback()
         raise HTTPException(status_code=400, detail=str(e))
 
-    finally:
-        os.unlink(tmp_path)
+
+def _obter_job_ou_404(db: Session, job_id: str):
+    job = etl_jobs.obter_job(db, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job não encontrado")
+    return job
 
 
 @router.get("/import/status/{job_id}")
-def status_importacao(job_id: str):
+def status_importacao(job_id: str, db: Session = Depends(get_db)):
     """
     Retorna o status de uma importação em background.
     """
-    if job_id not in import_jobs:
-        raise HTTPException(status_code=404, detail="Job não encontrado")
-
-    return import_jobs[job_id]
+    return etl_jobs.job_para_dict(_obter_job_ou_404(db, job_id))
 
 
 @router.get("/import/jobs")
-def listar_jobs():
+def listar_jobs(
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db),
+):
     """
     Lista todos os jobs de importação recentes.
     """
     return {
-        "jobs": [
-            {"job_id": k, **v}
-            for k, v in import_jobs.items()
-        ]
+        "jobs": [etl_jobs.job_para_dict(job) for job in etl_jobs.listar_jobs(db, limit)]
     }
 
 
-# === ENDPOINTS DE RESTAURAÇÃO ===
+@router.post("/import/jobs/{job_id}/cancelar")
+def cancelar_job(job_id: str, db: Session = Depends(get_db)):
+    """
+    Cancela um job. Na fila é cancelado na hora; em processamento, para no
+    próximo lote (o que já foi gravado permanece no banco).
+    """
+    _obter_job_ou_404(db, job_id)
+    return etl_jobs.job_para_dict(etl_jobs.cancelar_job(db, job_id))
 
-@router.post("/restore", response_model=RestoreResponse)
-def restaurar(
-    request: RestoreRequest,
+
+@router.post("/import/jobs/{job_id}/retomar")
+def retomar_job(job_id: str, db: Session = Depends(get_db)):
+    """
+    Devolve para a fila um job que terminou com erro; ele continua do último lote gravado.
+    """
+    _obter_job_ou_404(db, job_id)
+    try:
+        return etl_jobs.job_para_dict(etl_jobs.retomar_job(db, job_id))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.put("/import/jobs/{job_id}/prioridade")
+def alterar_prioridade_job(
+    job_id: str,
+    prioridade: int = Query(..., description="Nova prioridade (maior primeiro)"),
     db: Session = Depends(get_db),
 ):
     """
-    Copia arquivos do vault Windchill para pasta destino com nomes originais.
+    Altera a prioridade de um job na fila.
     """
-    # Obtém configurações
-    vault_raiz_config = obter_valor_configuracao(db, "vault_raiz")
-    usar_padding = obter_valor_configuracao(db, "usar_padding_hex") == "true"
-    adicionar_fv = obter_valor_configuracao(db, "adicionar_extensao_fv") == "true"
+    _obter_job_ou_404(db, job_id)
+    return etl_jobs.job_para_dict(etl_jobs.alterar_prioridade(db, job_id, prioridade))
 
-    # Busca arquivos selecionados
-    arquivos = db.query(Arquivo).filter(Arquivo.id.in_(request.arquivo_ids)).all()
 
-    if not arquivos:
-        raise HTTPException(status_code=404, detail="Nenhum arquivo encontrado")
+# === ENDPOINTS DO CACHE DE IMPORTAÇÃO ===
+
+@router.get("/cache")
+def listar_cache():
+    """
+    Lista as entradas do cache de uploads já transformados.
+    """
+    entradas = etl_cache.listar_entradas()
+    return {
+        "entradas": entradas,
+        "total_bytes": sum(e["bytes"] for e in entradas),
+        "limite_bytes": etl_cache.CACHE_MAX_BYTES,
+    }
+
+
+@router.delete("/cache")
+def limpar_cache():
+    """
+    Remove todas as entradas do cache de importação.
+    """
+    return {"removidas": etl_cache.limpar_cache()}
+
+
+@router.delete("/cache/{chave}")
+def remover_entrada_cache(chave: str):
+    """
+    Remove uma entrada do cache de importação.
+    """
+    try:
+        removida = etl_cache.remover_entrada(chave)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not removida:
+        raise HTTPException(status_code=404, detail="Entrada não encontrada no cache")
+
+    return {"removidas": 1}
+
+
+# === ENDPOINTS DE RESTAURAÇÃO ===
+
+def _modo_restauracao(db: Session, request: RestoreRequest) -> str:
+    """Modo de cópia pedido ou o da configuração; modo ou verificação inválidos viram 400."""
+    modo = request.modo or obter_valor_configuracao(db, "restauracao_modo") or "auto"
+    if modo not in MODOS_COPIA:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Modo de cópia inválido: {modo}. Use um de: {', '.join(MODOS_COPIA)}"
+        )
+    if request.verificacao not in VERIFICACOES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Verificação inválida: {request.verificacao}. Use uma de: {', '.join(VERIFICACOES)}"
+        )
+    return modo
+
+
+def _dados_restauracao(db: Session, arquivo_ids: List[int]) -> List[Dict[str, Any]]:
+    """Arquivos selecionados no formato de `executar_restauracao`, aplicando a configuração de vault_raiz."""
+    vault_raiz_config = obter_valor_configuracao(db, "vault_raiz")
+    arquivos = db.query(Arquivo).filter(Arquivo.id.in_(arquivo_ids)).all()
 
-    # Prepara dados para restauração, aplicando configuração de vault_raiz
     dados_arquivos = []
     for arq in arquivos:
         # PRIORIDADE: Usa configuração global se existir, senão usa do arquivo
@@ -314,32 +648,247 @@ def restaurar(
             "nome_interno_app": arq.nome_interno_app,
             "caminho_raiz_vault": caminho_raiz,
             "caminho_completo_estimado": arq.caminho_completo_estimado,
+            "tamanho_mb": arq.tamanho_mb,
         })
+    return dados_arquivos
 
-    # Executa restauração com configurações
-    copiados, erros = restaurar_arquivos(
+
+def _restaurar(
+    db: Session,
+    dados_arquivos: List[Dict[str, Any]],
+    destino: str,
+    modo: str,
+    verificacao: str = "tamanho",
+    ao_progredir: Optional[Callable[[Dict[str, Any]], None]] = None,
+) -> Dict[str, Any]:
+    """
+    Executa a restauração com as configurações (cópias em paralelo, limitadas
+    por dispositivo de origem) e resume o resultado.
+
+    Returns:
+        Dict com resultados (um por arquivo), copiados, inalterados (já em
+        dia no destino), bytes_copiados, falhas, modos (arquivos por modo
+        efetivamente usado) e segundos
+    """
+    inicio = time.perf_counter()
+    resultados = executar_restauracao(
         dados_arquivos,
-        request.destino,
-        usar_padding=usar_padding
+        destino,
+        max_workers=int(obter_valor_configuracao(db, "restauracao_workers")),
+        limite_por_dispositivo=int(obter_valor_configuracao(db, "restauracao_limite_por_dispositivo")),
+        modo=modo,
+        ao_progredir=ao_progredir,
+        verificacao=verificacao,
+    )
+
+    # Modo efetivamente usado por arquivo (cada modo cai para o seguinte quando não é suportado)
+    modos: Dict[str, int] = {}
+    for r in resultados:
+        if r["modo"]:
+            modos[r["modo"]] = modos.get(r["modo"], 0) + 1
+
+    return {
+        "resultados": resultados,
+        "copiados": sum(1 for r in resultados if r["status"] == "copiado"),
+        "inalterados": sum(1 for r in resultados if r["status"] == "inalterado"),
+        "bytes_copiados": sum(r["bytes"] for r in resultados),
+        "falhas": [
+            {"arquivo_id": r["arquivo_id"], "origem": r["origem"], "destino": r["destino"], "erro": r["erro"]}
+            for r in resultados if r["erro"]
+        ],
+        "modos": modos,
+        "segundos": round(time.perf_counter() - inicio, 2),
+    }
+
+
+def _detalhes_restauracao(destino: str, solicitados: int, modo: str, resumo: Dict[str, Any]) -> str:
+    """Texto do ETLLog de uma restauração, com tempo e vazão."""
+    segundos = resumo["segundos"]
+    mb_por_s = round(resumo["bytes_copiados"] / 1024 / 1024 / segundos, 1) if segundos else 0
+    modos = ", ".join(f"{m}: {n}" for m, n in resumo["modos"].items()) or "-"
+    return (
+        f"Destino: {destino}, Solicitados: {solicitados}, Inalterados: {resumo['inalterados']}, "
+        f"Bytes: {resumo['bytes_copiados']}, Tempo: {segundos}s, {mb_por_s} MB/s, "
+        f"Modo: {modo} ({modos})"
     )
 
+
+def executar_job_restauracao(job: Dict[str, Any]):
+    """
+    Executa um job de restauração reservado da fila (`etl.jobs`).
+
+    O pedido (arquivo_ids, destino, modo e verificacao) fica no arquivo JSON do job. O
+    progresso (arquivos e bytes copiados, vazão atual e ETA) é gravado a
+    cada segundo; o cancelamento interrompe as cópias ainda não iniciadas.
+    """
+    job_id = job["job_id"]
+    db = SessionLocal()
+    inicio = time.perf_counter()
+    ultimo_progresso: Dict[str, Any] = {}
+
+    def ao_progredir(progresso: Dict[str, Any]):
+        ultimo_progresso.update(progresso)
+        etl_jobs.atualizar_job(job_id, {
+            "total": progresso["total"],
+            "processed": progresso["concluidos"],
+            "inserted": progresso["copiados"],
+            "progress": progresso["progresso"],
+            "checkpoint": progresso,
+        })
+
+    try:
+        with open(job["caminho"], encoding="utf-8") as f:
+            pedido = json.load(f)
+
+        dados_arquivos = _dados_restauracao(db, pedido["arquivo_ids"])
+        if not dados_arquivos:
+            raise ValueError("Nenhum arquivo encontrado")
+
+        resumo = _restaurar(
+            db, dados_arquivos, pedido["destino"], pedido["modo"], pedido.get("verificacao", "tamanho"), ao_progredir
+        )
+
+        # Log da operação
+        log = ETLLog(
+            tipo="restore",
+            detalhes=f"Job: {job_id}, " + _detalhes_restauracao(
+                pedido["destino"], len(pedido["arquivo_ids"]), pedido["modo"], resumo
+            ),
+            registros_afetados=resumo["copiados"],
+            severity="WARN" if resumo["falhas"] else "INFO",
+        )
+        db.add(log)
+        db.commit()
+
+        resultado = {campo: valor for campo, valor in resumo.items() if campo != "resultados"}
+        etl_jobs.finalizar_job(
+            job_id, "completed", inserted=resumo["copiados"], progress=100, log_id=log.id,
+            resultado=json.dumps(resultado),
+        )
+
+    except etl_jobs.ImportacaoCancelada:
+        db.rollback()
+        log = ETLLog(
+            tipo="restore",
+            detalhes=(
+                f"Job: {job_id}, Cancelada: {ultimo_progresso.get('copiados', 0)} de "
+                f"{ultimo_progresso.get('total', 0)} arquivos copiados, "
+                f"Bytes: {ultimo_progresso.get('bytes_copiados', 0)}, "
+                f"Tempo: {round(time.perf_counter() - inicio, 2)}s"
+            ),
+            registros_afetados=ultimo_progresso.get("copiados", 0),
+            severity="WARN",
+        )
+        db.add(log)
+        db.commit()
+        etl_jobs.finalizar_job(job_id, "cancelled", log_id=log.id)
+
+    except Exception as e:
+        db.rollback()
+        etl_jobs.finalizar_job(job_id, "error", error=str(e))
+
+    finally:
+        db.close()
+
+
+@router.post("/restore", response_model=RestoreResponse)
+def restaurar(
+    request: RestoreRequest,
+    db: Session = Depends(get_db),
+):
+    """
+    Copia arquivos do vault Windchill para pasta destino com nomes originais.
+
+    Repetir a restauração para a mesma pasta só copia o que falta ou mudou:
+    o manifesto gravado no destino registra cada cópia, e `verificacao`
+    define como confirmar que um arquivo já copiado está em dia ('tamanho',
+    'checksum' ou 'nenhuma' para copiar tudo de novo).
+
+    Com `async_mode`, a restauração vira um job em background: acompanhe
+    por GET /restore/status/{job_id} (arquivos e bytes copiados, vazão e
+    ETA) e cancele por POST /restore/jobs/{job_id}/cancelar.
+    """
+    modo = _modo_restauracao(db, request)
+
+    # Busca arquivos selecionados
+    dados_arquivos = _dados_restauracao(db, request.arquivo_ids)
+
+    if not dados_arquivos:
+        raise HTTPException(status_code=404, detail="Nenhum arquivo encontrado")
+
+    if request.async_mode:
+        job_id = str(uuid.uuid4())
+        caminho = etl_jobs.caminho_arquivo_job(job_id, "restore.json")
+        with open(caminho, "w", encoding="utf-8") as f:
+            json.dump({
+                "arquivo_ids": request.arquivo_ids,
+                "destino": request.destino,
+                "modo": modo,
+                "verificacao": request.verificacao,
+            }, f)
+        etl_jobs.criar_job(db, job_id, request.destino[:255], caminho, tipo_job="restore")
+
+        return RestoreResponse(
+            success=True,
+            message=f"Restauração iniciada em background. Use GET /restore/status/{job_id} para acompanhar.",
+            arquivos_copiados=0,
+            erros=[],
+            job_id=job_id,
+        )
+
+    resumo = _restaurar(db, dados_arquivos, request.destino, modo, request.verificacao)
+
     # Log da operação
     log = ETLLog(
         tipo="restore",
-        detalhes=f"Destino: {request.destino}, Solicitados: {len(request.arquivo_ids)}",
-        registros_afetados=copiados,
+        detalhes=_detalhes_restauracao(request.destino, len(request.arquivo_ids), modo, resumo),
+        registros_afetados=resumo["copiados"],
     )
     db.add(log)
     db.commit()
 
     return RestoreResponse(
-        success=len(erros) == 0,
-        message=f"Restauração concluída: {copiados} arquivos copiados",
-        arquivos_copiados=copiados,
-        erros=erros,
+        success=len(resumo["falhas"]) == 0,
+        message=(
+            f"Restauração concluída: {resumo['copiados']} arquivos copiados, "
+            f"{resumo['inalterados']} já em dia no destino"
+        ),
+        arquivos_copiados=resumo["copiados"],
+        arquivos_inalterados=resumo["inalterados"],
+        erros=[falha["erro"] for falha in resumo["falhas"]],
+        falhas=[RestoreFalha(**falha) for falha in resumo["falhas"]],
+        bytes_copiados=resumo["bytes_copiados"],
+        segundos=resumo["segundos"],
+        modos=resumo["modos"],
     )
 
 
+def _obter_job_restauracao_ou_404(db: Session, job_id: str):
+    job = etl_jobs.obter_job(db, job_id)
+    if not job or job.tipo_job != "restore":
+        raise HTTPException(status_code=404, detail="Job de restauração não encontrado")
+    return job
+
+
+@router.get("/restore/status/{job_id}")
+def status_restauracao(job_id: str, db: Session = Depends(get_db)):
+    """
+    Retorna o status de uma restauração em background, com arquivos e
+    bytes copiados, vazão atual e ETA em `restauracao`.
+    """
+    return etl_jobs.job_para_dict(_obter_job_restauracao_ou_404(db, job_id))
+
+
+@router.post("/restore/jobs/{job_id}/cancelar")
+def cancelar_restauracao(job_id: str, db: Session = Depends(get_db)):
+    """
+    Cancela uma restauração. As cópias em andamento terminam; os arquivos
+    já copiados permanecem no destino.
+    """
+    _obter_job_restauracao_ou_404(db, job_id)
+    return etl_jobs.job_para_dict(etl_jobs.cancelar_job(db, job_id))
+
+
 
 # === ENDPOINTS DE VERIFICAÇÃO ===
 
@@ -350,6 +899,9 @@ def verificar_integridade(
 ):
     """
     Verifica se os arquivos físicos existem no vault.
+
+    Raízes já indexadas (POST /vault/indice) são consultadas no índice, em
+    memória, em vez de um acesso ao vault por arquivo.
     """
     vault_raiz_config = obter_valor_configuracao(db, "vault_raiz")
     
@@ -358,6 +910,17 @@ def verificar_integridade(
     if not arquivos:
         raise HTTPException(status_code=404, detail="Nenhum arquivo encontrado para verificação")
 
+    stat = indice_vault.stat_vault({
+        vault_raiz_config if vault_raiz_config else arq.caminho_raiz_vault for arq in arquivos
+    })
+
+    def existe(caminho: str) -> bool:
+        try:
+            stat(caminho)
+            return True
+        except (OSError, ValueError):
+            return False
+
     verificados = 0
     falhas = 0
     itens_ausentes_response = []
@@ -371,7 +934,7 @@ def verificar_integridade(
         
         verificados += 1
         
-        if not caminho_real or not os.path.exists(caminho_real):
+        if not caminho_real or not existe(caminho_real):
             falhas += 1
             
             # Registra item ausente no banco
@@ -406,6 +969,68 @@ def verificar_integridade(
     )
 
 
+# === ENDPOINTS DO ÍNDICE DO VAULT ===
+
+@router.get("/vault/indice")
+def listar_indices_vault():
+    """
+    Lista os índices das raízes do vault (pastas, arquivos, bytes e última atualização).
+    """
+    return {"indices": indice_vault.listar_indices()}
+
+
+@router.post("/vault/indice")
+def atualizar_indice_vault(
+    raiz: Optional[str] = Query(None, description="Raiz do vault (padrão: configuração vault_raiz)"),
+    completo: bool = Query(False, description="Reler todas as pastas, e não só as alteradas"),
+    db: Session = Depends(get_db),
+):
+    """
+    Cria ou atualiza o índice de uma raiz do vault, usado por /verify e /restore.
+
+    A primeira vez varre a raiz inteira (subpastas em paralelo); depois, só
+    as pastas cujo mtime mudou são lidas de novo.
+    """
+    raiz = raiz or obter_valor_configuracao(db, "vault_raiz")
+    if not raiz:
+        raise HTTPException(status_code=400, detail="Raiz do vault não informada nem configurada")
+
+    try:
+        estatisticas = indice_vault.atualizar_indice(raiz, completo)
+    except OSError as e:
+        raise HTTPException(status_code=400, detail=f"Não foi possível ler a raiz do vault {raiz}: {e}")
+
+    # Log da operação
+    log = ETLLog(
+        tipo="verify",
+        detalhes=(
+            f"Índice do vault: {raiz}, Pastas: {estatisticas['pastas']} "
+            f"(lidas: {estatisticas['ultima_atualizacao']['pastas_lidas']}), "
+            f"Arquivos: {estatisticas['arquivos']}, Tempo: {estatisticas['ultima_atualizacao']['segundos']}s"
+        ),
+        registros_afetados=estatisticas["arquivos"],
+    )
+    db.add(log)
+    db.commit()
+
+    return estatisticas
+
+
+@router.delete("/vault/indice")
+def remover_indice_vault(
+    raiz: Optional[str] = Query(None, description="Raiz do vault (padrão: configuração vault_raiz)"),
+    db: Session = Depends(get_db),
+):
+    """
+    Remove o índice de uma raiz; /verify e /restore voltam a consultar o vault arquivo a arquivo.
+    """
+    raiz = raiz or obter_valor_configuracao(db, "vault_raiz")
+    if not raiz or not indice_vault.remover_indice(raiz):
+        raise HTTPException(status_code=404, detail="Índice não encontrado")
+
+    return {"removidos": 1}
+
+
 # === ENDPOINTS DE EXPORTAÇÃO ===
 
 @router.get("/export")
@@ -0,0 +1,245 @@
+import asyncio
+import hashlib
+import os
+import uuid
+from typing import Optional
+
+import aiofiles
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from database import get_db
+from models import UploadSessao, UploadParte
+from schemas import ImportResponse, UploadSessaoCreate, UploadSessaoResponse
+from etl import jobs as etl_jobs
+from etl.upload import preparar_arquivo_recebido, nome_sem_compressao
+
+# Tamanho padrão de cada parte do upload
+TAMANHO_PARTE_PADRAO = 8 << 20
+
+# Maior parte aceita (o corpo de cada PUT é gravado em streaming, mas é
+# reenviado inteiro se a conexão cair)
+TAMANHO_PARTE_MAXIMO = 256 << 20
+
+router = APIRouter(
+    prefix="/uploads",
+    tags=["uploads"]
+)
+
+
+def _total_partes(sessao: UploadSessao) -> int:
+    return -(-sessao.tamanho_total // sessao.tamanho_parte)
+
+
+def _sessao_para_resposta(sessao: UploadSessao) -> UploadSessaoResponse:
+    recebidas = sorted(parte.numero for parte in sessao.partes)
+    recebidas_set = set(recebidas)
+    total_partes = _total_partes(sessao)
+
+    return UploadSessaoResponse(
+        upload_id=sessao.id,
+        filename=sessao.filename,
+        status=sessao.status,
+        tamanho_total=sessao.tamanho_total,
+        tamanho_parte=sessao.tamanho_parte,
+        total_partes=total_partes,
+        bytes_recebidos=sum(parte.tamanho for parte in sessao.partes),
+        partes_recebidas=recebidas,
+        partes_faltantes=[n for n in range(total_partes) if n not in recebidas_set],
+        job_id=sessao.job_id,
+    )
+
+
+def _obter_sessao(db: Session, upload_id: str, somente_aberta: bool = False) -> UploadSessao:
+    sessao = db.get(UploadSessao, upload_id)
+    if not sessao:
+        raise HTTPException(status_code=404, detail="Upload não encontrado")
+    if somente_aberta and sessao.status != "aberta":
+        raise HTTPException(status_code=409, detail=f"Upload já está {sessao.status}")
+    return sessao
+
+
+def _remover_arquivo(caminho: Optional[str]):
+    if caminho and os.path.exists(caminho):
+        os.unlink(caminho)
+
+
+@router.post("", response_model=UploadSessaoResponse)
+def criar_upload(request: UploadSessaoCreate, db: Session = Depends(get_db)):
+    """
+    Abre uma sessão de upload em partes.
+
+    O arquivo é dividido em partes de `tamanho_parte` bytes (a última pode
+    ser menor), numeradas a partir de 0. Cada parte é enviada com
+    PUT /uploads/{upload_id}/partes/{numero}, em qualquer ordem e em
+    paralelo; GET /uploads/{upload_id} mostra as partes que faltam.
+    """
+    tamanho_parte = request.tamanho_parte or TAMANHO_PARTE_PADRAO
+    if request.tamanho_total < 0:
+        raise HTTPException(status_code=400, detail="tamanho_total inválido")
+    if not 0 < tamanho_parte <= TAMANHO_PARTE_MAXIMO:
+        raise HTTPException(status_code=400, detail=f"tamanho_parte deve estar entre 1 e {TAMANHO_PARTE_MAXIMO}")
+
+    upload_id = str(uuid.uuid4())
+    os.makedirs(etl_jobs.JOBS_DIR, exist_ok=True)
+    caminho = os.path.join(etl_jobs.JOBS_DIR, f"upload_{upload_id}.parcial")
+
+    # Arquivo já no tamanho final: cada parte é gravada direto no seu offset
+    with open(caminho, "wb") as f:
+        f.truncate(request.tamanho_total)
+
+    sessao = UploadSessao(
+        id=upload_id,
+        filename=request.filename,
+        caminho=caminho,
+        tamanho_total=request.tamanho_total,
+        tamanho_parte=tamanho_parte,
+        status="aberta",
+    )
+    db.add(sessao)
+    db.commit()
+
+    return _sessao_para_resposta(sessao)
+
+
+@router.get("/{upload_id}", response_model=UploadSessaoResponse)
+def status_upload(upload_id: str, db: Session = Depends(get_db)):
+    """
+    Retorna as partes recebidas e as que faltam (para retomar o envio).
+    """
+    return _sessao_para_resposta(_obter_sessao(db, upload_id))
+
+
+@router.put("/{upload_id}/partes/{numero}")
+async def enviar_parte(
+    upload_id: str,
+    numero: int,
+    request: Request,
+    offset: Optional[int] = Query(None, description="Offset da parte no arquivo (conferido com numero × tamanho_parte)"),
+    sha256: Optional[str] = Query(None, description="SHA-256 da parte, conferido após o recebimento"),
+    db: Session = Depends(get_db),
+):
+    """
+    Recebe uma parte (corpo da requisição em bytes) e grava no seu offset.
+
+    Reenviar uma parte já recebida a substitui: ela volta a faltar até o
+    reenvio chegar inteiro (e conferir com `sha256`, se informado).
+    """
+    sessao = _obter_sessao(db, upload_id, somente_aberta=True)
+
+    inicio = numero * sessao.tamanho_parte
+    if numero < 0 or numero >= _total_partes(sessao):
+        raise HTTPException(status_code=400, detail=f"Parte {numero} fora do arquivo")
+    if offset is not None and offset != inicio:
+        raise HTTPException(status_code=400, detail=f"Offset da parte {numero} deve ser {inicio}")
+
+    esperado = min(sessao.tamanho_parte, sessao.tamanho_total - inicio)
+    hash_parte = hashlib.sha256()
+    recebido = 0
+
+    # A parte deixa de contar como recebida antes de os bytes antigos serem
+    # sobrescritos: um reenvio interrompido ou inválido fica como faltante
+    db.query(UploadParte).filter(
+        UploadParte.sessao_id == upload_id, UploadParte.numero == numero
+    ).delete()
+    db.commit()
+
+    async with aiofiles.open(sessao.caminho, "r+b") as f:
+        await f.seek(inicio)
+        async for pedaco in request.stream():
+            if recebido + len(pedaco) > esperado:
+                # Não invade a parte seguinte
+                raise HTTPException(status_code=400, detail=f"Parte {numero} maior que {esperado} bytes")
+            hash_parte.update(pedaco)
+            recebido += len(pedaco)
+            await f.write(pedaco)
+
+    if recebido != esperado:
+        raise HTTPException(status_code=400, detail=f"Parte {numero} incompleta: {recebido} de {esperado} bytes")
+    if sha256 and sha256.lower() != hash_parte.hexdigest():
+        raise HTTPException(status_code=400, detail=f"SHA-256 da parte {numero} não confere")
+
+    db.add(UploadParte(sessao_id=upload_id, numero=numero, tamanho=recebido, sha256=hash_parte.hexdigest()))
+    try:
+        db.commit()
+    except IntegrityError:
+        # Mesma parte enviada ao mesmo tempo por duas conexões: vale a que gravou primeiro
+        db.rollback()
+
+    return {"upload_id": upload_id, "numero": numero, "tamanho": recebido, "sha256": hash_parte.hexdigest()}
+
+
+@router.post("/{upload_id}/finalizar", response_model=ImportResponse)
+async def finalizar_upload(
+    upload_id: str,
+    prioridade: int = Query(0, description="Prioridade do job de importação (maior primeiro)"),
+    incremental: bool = Query(False, description="Gravar só registros novos e alterados desde a última importação incremental"),
+    db: Session = Depends(get_db),
+):
+    """
+    Confere se todas as partes chegaram e cria o job de importação.
+
+    Arquivos .zip viram uma importação em lote; gzip/zstd são descompactados.
+    Acompanhe com GET /import/status/{job_id}.
+    """
+    sessao = _obter_sessao(db, upload_id, somente_aberta=True)
+    resposta = _sessao_para_resposta(sessao)
+
+    if resposta.partes_faltantes:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Faltam {len(resposta.partes_faltantes)} partes: {resposta.partes_faltantes[:20]}",
+        )
+
+    # Reserva a finalização: duas chamadas simultâneas não processam o mesmo arquivo
+    reservada = db.query(UploadSessao).filter(
+        UploadSessao.id == upload_id, UploadSessao.status == "aberta"
+    ).update({"status": "finalizando"})
+    db.commit()
+    if not reservada:
+        raise HTTPException(status_code=409, detail="Upload já está sendo finalizado")
+
+    nome_arquivo = nome_sem_compressao(sessao.filename)
+    tipo_job = "lote" if nome_arquivo.lower().endswith(".zip") else "arquivo"
+    job_id = str(uuid.uuid4())
+    caminho = etl_jobs.caminho_arquivo_job(job_id, nome_arquivo)
+
+    try:
+        arquivo = await asyncio.to_thread(preparar_arquivo_recebido, sessao.caminho, caminho)
+    except ValueError as e:
+        # Partes continuam gravadas: podem ser reenviadas antes de finalizar de novo
+        _remover_arquivo(caminho)
+        sessao.status = "aberta"
+        db.commit()
+        raise HTTPException(status_code=400, detail=str(e))
+
+    sessao.status = "finalizada"
+    sessao.job_id = job_id
+    etl_jobs.criar_job(
+        db, job_id, sessao.filename, caminho,
+        tipo_job=tipo_job, sha256=arquivo["sha256"], prioridade=prioridade, incremental=incremental,
+    )
+
+    return ImportResponse(
+        success=True,
+        message=f"Upload concluído. Use GET /import/status/{job_id} para acompanhar a importação.",
+        registros_importados=0,
+        log_id=None,
+        job_id=job_id,
+    )
+
+
+@router.delete("/{upload_id}")
+def cancelar_upload(upload_id: str, db: Session = Depends(get_db)):
+    """
+    Cancela um upload em andamento e remove as partes já recebidas.
+    """
+    sessao = _obter_sessao(db, upload_id, somente_aberta=True)
+
+    _remover_arquivo(sessao.caminho)
+    sessao.status = "cancelada"
+    sessao.partes.clear()
+    db.commit()
+
+    return {"upload_id": upload_id, "status": sessao.status}
@@ -1,6 +1,6 @@
 from pydantic import BaseModel
 from datetime import datetime
-from typing import Optional, List
+from typing import Optional, List, Dict
 
 
 # === Documento ===
@@ -93,9 +93,45 @@ class ImportResponse(BaseModel):
     job_id: Optional[str] = None  # Para importações em background
 
 
+class ImportCaminhoRequest(BaseModel):
+    caminho: str
+    async_mode: bool = False
+    prioridade: int = 0
+    incremental: bool = False
+
+
+class UploadSessaoCreate(BaseModel):
+    filename: str
+    tamanho_total: int
+    tamanho_parte: Optional[int] = None  # Default: TAMANHO_PARTE_PADRAO
+
+
+class UploadSessaoResponse(BaseModel):
+    upload_id: str
+    filename: str
+    status: str
+    tamanho_total: int
+    tamanho_parte: int
+    total_partes: int
+    bytes_recebidos: int
+    partes_recebidas: List[int]
+    partes_faltantes: List[int]
+    job_id: Optional[str] = None
+
+
 class RestoreRequest(BaseModel):
     arquivo_ids: List[int]
     destino: str
+    modo: Optional[str] = None  # auto, copia, kernel, reflink, hardlink ou symlink (None: configuração)
+    async_mode: bool = False  # Executa em background e retorna job_id
+    verificacao: str = "tamanho"  # Arquivos já restaurados: tamanho (e mtime), checksum ou nenhuma (copia tudo)
+
+
+class RestoreFalha(BaseModel):
+    arquivo_id: Optional[int] = None
+    origem: Optional[str] = None
+    destino: Optional[str] = None
+    erro: str
 
 
 class RestoreResponse(BaseModel):
@@ -104,6 +140,12 @@ class RestoreResponse(BaseModel):
     arquivos_copiados: int
     arquivos_copiados: int
     erros: List[str]
+    falhas: List[RestoreFalha] = []
+    bytes_copiados: int = 0
+    segundos: float = 0
+    modos: Dict[str, int] = {}
+    arquivos_inalterados: int = 0  # Já em dia no destino (não copiados de novo)
+    job_id: Optional[str] = None  # Para restaurações em background
 
 
 class VerifyRequest(BaseModel):
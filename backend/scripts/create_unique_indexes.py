@@ -0,0 +1,86 @@
+import sys
+import os
+from sqlalchemy import text
+
+# Adiciona o diretório pai ao path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import engine
+from models import Documento, Arquivo
+
+# Remove duplicatas (mantendo o menor id) e aponta as referências para o registro mantido.
+# Necessário em bancos criados antes dos índices únicos das chaves naturais.
+DEDUPLICACAO_SQL = [
+    """
+    UPDATE arquivos SET documento_id = (
+        SELECT MIN(o.id) FROM documentos d JOIN documentos o
+          ON o.numero_doc = d.numero_doc AND o.versao = d.versao AND o.iteracao = d.iteracao
+        WHERE d.id = arquivos.documento_id
+    )
+    WHERE documento_id IN (
+        SELECT d.id FROM documentos d WHERE EXISTS (
+            SELECT 1 FROM documentos o
+            WHERE o.numero_doc = d.numero_doc AND o.versao = d.versao AND o.iteracao = d.iteracao AND o.id < d.id
+        )
+    );
+    """,
+    """
+    DELETE FROM documentos WHERE EXISTS (
+        SELECT 1 FROM documentos o
+        WHERE o.numero_doc = documentos.numero_doc AND o.versao = documentos.versao
+          AND o.iteracao = documentos.iteracao AND o.id < documentos.id
+    );
+    """,
+    *[
+        f"""
+        UPDATE {tabela} SET arquivo_id = (
+            SELECT MIN(o.id) FROM arquivos a JOIN arquivos o
+              ON o.nome_hex = a.nome_hex AND o.nome_original = a.nome_original
+            WHERE a.id = {tabela}.arquivo_id
+        )
+        WHERE arquivo_id IN (
+            SELECT a.id FROM arquivos a WHERE EXISTS (
+                SELECT 1 FROM arquivos o
+                WHERE o.nome_hex = a.nome_hex AND o.nome_original = a.nome_original AND o.id < a.id
+            )
+        );
+        """
+        for tabela in ("missing_items", "metadados")
+    ],
+    """
+    DELETE FROM arquivos WHERE EXISTS (
+        SELECT 1 FROM arquivos o
+        WHERE o.nome_hex = arquivos.nome_hex AND o.nome_original = arquivos.nome_original
+          AND o.id < arquivos.id
+    );
+    """,
+]
+
+
+def create_unique_indexes():
+    print("Removendo duplicatas e criando índices únicos das chaves naturais...")
+
+    indices = [
+        idx
+        for modelo in (Documento, Arquivo)
+        for idx in modelo.__table__.indexes
+        if idx.unique
+    ]
+
+    try:
+        with engine.begin() as conn:
+            for sql in DEDUPLICACAO_SQL:
+                resultado = conn.execute(text(sql))
+                print(f"{sql.strip().splitlines()[0]}... {resultado.rowcount} linha(s)")
+
+            for idx in indices:
+                print(f"Criando índice {idx.name}...")
+                idx.create(conn, checkfirst=True)
+
+        print("Índices únicos criados com sucesso!")
+
+    except Exception as e:
+        print(f"Erro ao criar índices únicos: {str(e)}")
+
+if __name__ == "__main__":
+    create_unique_indexes()
@@ -0,0 +1,47 @@
+import sys
+import os
+import argparse
+import logging
+
+# Adiciona o diretório pai ao path para importar modulos do backend
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import engine, Base, SessionLocal
+from etl.importacao_lote import importar_lote
+
+# Configuração de Log
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Importa todos os dumps do Windchill de uma pasta ou arquivo .zip")
+    parser.add_argument("origem", help="Pasta com os dumps ou arquivo .zip")
+    parser.add_argument("--workers", type=int, default=None, help="Processos de leitura/transformação (default: núcleos da CPU)")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+
+    try:
+        tabelas = importar_lote(
+            args.origem,
+            db,
+            max_workers=args.workers,
+            ao_progredir=lambda p: logger.info(f"Arquivos processados: {p['arquivos_processados']}/{p['arquivos_total']}"),
+        )
+    finally:
+        db.close()
+
+    for t in tabelas:
+        if t["erro"]:
+            logger.warning(f"{t['tabela']} ({len(t['arquivos'])} arquivo(s)): {t['erro']}")
+        else:
+            logger.info(f"{t['tabela']} ({len(t['arquivos'])} arquivo(s), {t['tipo']}): "
+                        f"{t['registros_lidos']} lidos, {t['inseridos']} inseridos")
+
+    logger.info(f"Total inserido: {sum(t['inseridos'] for t in tabelas)}")
+
+
+if __name__ == "__main__":
+    main()